@@ -1,9 +1,17 @@
 import os
 import json
-from flask import Flask, render_template, request, jsonify, send_file
+import time
+from flask import Flask, Response, render_template, request, jsonify, send_file, stream_with_context
 from werkzeug.utils import secure_filename
-from utils.clickhouse import ClickHouseManager
-from utils.flatfile import FlatFileManager
+from utils.columnar import COLUMNAR_EXPORT_FORMATS, ROW_GROUP_SIZE
+from utils.compression import CODEC_SUFFIXES
+from utils.flatfile import FlatFileManager, list_input_files
+from utils.jobs import JobManager
+from utils.metrics import MetricsRegistry, TransferMetrics
+from utils.pool import ClickHousePool
+from utils.rowindex import set_index_dir
+from utils.state import Checkpoint, StateStore
+from utils.uploads import ChunkedUploadManager
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = os.path.join(os.getcwd(), 'uploads')
@@ -12,6 +20,75 @@ app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB limit for uploads
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# ClickHouse connections shared across requests
+ch_pool = ClickHousePool(max_size=8, idle_timeout=300)
+
+# Background runner for long ingestion jobs
+job_manager = JobManager(max_workers=4)
+
+# Per-stage timings and throughput of finished transfers, served at /metrics
+metrics_registry = MetricsRegistry()
+
+# File extension and content type of each streamed export format
+STREAM_FORMATS = {
+    'CSVWithNames': ('.csv', 'text/csv'),
+    'TSVWithNames': ('.tsv', 'text/tab-separated-values'),
+    'Parquet': ('.parquet', 'application/vnd.apache.parquet'),
+    'Arrow': ('.arrow', 'application/vnd.apache.arrow.file'),
+}
+
+# Resumable uploads for files beyond MAX_CONTENT_LENGTH, sent in chunks
+upload_manager = ChunkedUploadManager(app.config['UPLOAD_FOLDER'])
+
+# Export watermarks, import offsets and resume checkpoints kept between runs
+state_store = StateStore(os.path.join(app.config['UPLOAD_FOLDER'], '.state', 'keys'),
+                         legacy_path=os.path.join(app.config['UPLOAD_FOLDER'], '.state', 'state.json'))
+
+# Row indexes of uploaded files live with the app's state, not beside the files
+set_index_dir(os.path.join(app.config['UPLOAD_FOLDER'], '.state', 'rowidx'))
+
+def connection_options(data):
+    """
+    Optional ClickHouse connection settings carried in a request payload.
+    """
+    options = {'http_port': int(data.get('http_port', 8123))}
+    if data.get('wire_compression'):
+        # Compress native protocol traffic, e.g. 'lz4' or 'zstd'
+        options['compression'] = data.get('wire_compression')
+    return options
+
+def segment_path(path):
+    """
+    Stamp path with the current time (out.csv -> out.20240101T120000.csv),
+    keeping a compression suffix last and never reusing an existing file.
+    """
+    codec_suffix = next((suffix for suffix in CODEC_SUFFIXES.values() if path.endswith(suffix)), '')
+    root, ext = os.path.splitext(path[:len(path) - len(codec_suffix)])
+    stamp = time.strftime('%Y%m%dT%H%M%S')
+    candidate = f"{root}.{stamp}{ext}{codec_suffix}"
+    n = 1
+    while os.path.exists(candidate):
+        candidate = f"{root}.{stamp}-{n}{ext}{codec_suffix}"
+        n += 1
+    return candidate
+
+def describe_flatfile(filepath, delimiter, build_index=True):
+    """
+    Inspect a newly uploaded file: inferred columns and, optionally, its row index.
+    """
+    ff_manager = FlatFileManager(filepath, delimiter)
+    columns = ff_manager.get_columns()
+    
+    # Index row offsets once so counts and preview pages are instant later
+    row_index = ff_manager.row_index() if build_index else None
+    
+    return {
+        'filename': os.path.basename(filepath),
+        'filepath': filepath,
+        'columns': columns,
+        'total_rows': row_index.row_count if row_index else None
+    }
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -26,8 +103,8 @@ def connect_clickhouse():
         user = data.get('user')
         jwt_token = data.get('jwt_token')
         
-        ch_manager = ClickHouseManager(host, port, database, user, jwt_token)
-        tables = ch_manager.get_tables()
+        with ch_pool.connection(host, port, database, user, jwt_token) as ch_manager:
+            tables = ch_manager.get_tables()
         
         return jsonify({
             'status': 'success',
@@ -51,8 +128,8 @@ def get_table_columns():
         jwt_token = data.get('jwt_token')
         table = data.get('table')
         
-        ch_manager = ClickHouseManager(host, port, database, user, jwt_token)
-        columns = ch_manager.get_columns(table)
+        with ch_pool.connection(host, port, database, user, jwt_token) as ch_manager:
+            columns = ch_manager.get_columns(table)
         
         return jsonify({
             'status': 'success',
@@ -75,11 +152,8 @@ def get_join_tables():
         jwt_token = data.get('jwt_token')
         tables = data.get('tables', [])
         
-        ch_manager = ClickHouseManager(host, port, database, user, jwt_token)
-        result = {}
-        
-        for table in tables:
-            result[table] = ch_manager.get_columns(table)
+        with ch_pool.connection(host, port, database, user, jwt_token) as ch_manager:
+            result = ch_manager.get_columns_batch(tables)
         
         return jsonify({
             'status': 'success',
@@ -114,15 +188,11 @@ def upload_flatfile():
         file.save(filepath)
         
         try:
-            ff_manager = FlatFileManager(filepath, delimiter)
-            columns = ff_manager.get_columns()
-            
+            build_index = request.form.get('build_index', 'true').lower() != 'false'
             return jsonify({
                 'status': 'success',
                 'message': 'File uploaded successfully',
-                'filename': filename,
-                'filepath': filepath,
-                'columns': columns
+                **describe_flatfile(filepath, delimiter, build_index)
             })
         except Exception as e:
             return jsonify({
@@ -130,6 +200,113 @@ def upload_flatfile():
                 'message': f'Failed to process file: {str(e)}'
             }), 400
 
+@app.route('/api/upload/flatfile/chunked', methods=['POST'])
+def init_chunked_upload():
+    try:
+        data = request.json
+        filename = secure_filename(data.get('filename', ''))
+        if filename == '':
+            raise ValueError("No file name given")
+        
+        state = upload_manager.init(filename, int(data.get('total_size')), int(data.get('chunk_size')))
+        
+        return jsonify({
+            'status': 'success',
+            'message': 'Upload started',
+            **state
+        })
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to start upload: {str(e)}'
+        }), 400
+
+@app.route('/api/upload/flatfile/chunked/<upload_id>/<int:index>', methods=['PUT'])
+def upload_chunk(upload_id, index):
+    try:
+        # Read the raw body straight from the socket; nothing is buffered in memory
+        chunk = upload_manager.write_chunk(upload_id, index, request.stream,
+                                           checksum=request.headers.get('X-Chunk-SHA256'))
+        
+        return jsonify({
+            'status': 'success',
+            **chunk
+        })
+    except FileNotFoundError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 404
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Chunk upload failed: {str(e)}'
+        }), 400
+
+@app.route('/api/upload/flatfile/chunked/<upload_id>', methods=['GET'])
+def chunked_upload_status(upload_id):
+    try:
+        return jsonify({
+            'status': 'success',
+            'upload': upload_manager.status(upload_id)
+        })
+    except FileNotFoundError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 404
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to get upload status: {str(e)}'
+        }), 400
+
+@app.route('/api/upload/flatfile/chunked/<upload_id>/finalize', methods=['POST'])
+def finalize_chunked_upload(upload_id):
+    try:
+        data = request.json or {}
+        delimiter = data.get('delimiter', ',')
+        
+        state = upload_manager.status(upload_id)
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], state['filename'])
+        upload_manager.finalize(upload_id, filepath)
+        
+        return jsonify({
+            'status': 'success',
+            'message': 'File uploaded successfully',
+            **describe_flatfile(filepath, delimiter, data.get('build_index', True))
+        })
+    except FileNotFoundError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 404
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to process file: {str(e)}'
+        }), 400
+
+@app.route('/api/upload/flatfile/chunked/<upload_id>', methods=['DELETE'])
+def abort_chunked_upload(upload_id):
+    try:
+        upload_manager.abort(upload_id)
+        
+        return jsonify({
+            'status': 'success',
+            'message': 'Upload aborted'
+        })
+    except FileNotFoundError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 404
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to abort upload: {str(e)}'
+        }), 400
+
 @app.route('/api/preview/clickhouse', methods=['POST'])
 def preview_clickhouse():
     try:
@@ -142,13 +319,16 @@ def preview_clickhouse():
         table = data.get('table')
         columns = data.get('columns', [])
         join_config = data.get('join_config', None)
+        limit = int(data.get('limit', 100))
         
-        ch_manager = ClickHouseManager(host, port, database, user, jwt_token)
+        # Optional fraction of the (base) table to read, for tables with SAMPLE BY
+        sample = data.get('sample')
         
-        if join_config:
-            preview_data = ch_manager.preview_join_data(join_config, columns)
-        else:
-            preview_data = ch_manager.preview_data(table, columns)
+        with ch_pool.connection(host, port, database, user, jwt_token) as ch_manager:
+            if join_config:
+                preview_data = ch_manager.preview_join_data(join_config, columns, limit=limit, sample=sample)
+            else:
+                preview_data = ch_manager.preview_data(table, columns, limit=limit, sample=sample)
         
         return jsonify({
             'status': 'success',
@@ -167,13 +347,22 @@ def preview_flatfile():
         filepath = data.get('filepath')
         delimiter = data.get('delimiter', ',')
         columns = data.get('columns', [])
+        offset = int(data.get('offset', 0))
+        limit = int(data.get('limit', 100))
         
         ff_manager = FlatFileManager(filepath, delimiter)
-        preview_data = ff_manager.preview_data(columns)
+        preview_data = ff_manager.preview_data(columns, limit=limit, offset=offset)
+        index = ff_manager.row_index(build=False)
+        
+        # Inferred types are cached from upload, so this does not re-read the file
+        schema = [col for col in ff_manager.get_columns() if not columns or col['name'] in columns]
         
         return jsonify({
             'status': 'success',
-            'data': preview_data
+            'data': preview_data,
+            'columns': schema,
+            'offset': offset,
+            'total_rows': index.row_count if index else None
         })
     except Exception as e:
         return jsonify({
@@ -199,25 +388,181 @@ def ingest_clickhouse_to_flatfile():
         
         # Output file config
         output_filename = data.get('output_filename')
-        delimiter = data.get('delimiter', ',')
+        export_mode = data.get('export_mode', 'python')
+        output_format = data.get('output_format', 'CSVWithNames')
+        delimiter = data.get('delimiter', '\t' if output_format == 'TSVWithNames' else ',')
+        compression = data.get('compression')
+        row_group_size = int(data.get('row_group_size', ROW_GROUP_SIZE))
+        options = connection_options(data)
+        
+        # Parallel export config; each worker holds its own pooled connection
+        parallel_workers = min(int(data.get('parallel_workers', 1)), ch_pool.max_size - 1)
+        partition_by = data.get('partition_by', 'hash')
+        partition_key = data.get('partition_key')
+        concatenate = data.get('concatenate', True)
+        
+        # Incremental export config: only rows above the saved watermark of
+        # watermark_column, appended to output_filename or written as a new segment
+        watermark_column = data.get('watermark_column')
+        append = data.get('append', False)
+        watermark_source = data.get('watermark_key') or table or (join_config or {}).get('base_table')
+        watermark_key = f"export:{host}:{port}/{database}/{watermark_source}:{watermark_column}"
         
-        ch_manager = ClickHouseManager(host, port, database, user, jwt_token)
+        # Shards are CSV written in python mode; other formats are not split
+        columnar_output = output_format in COLUMNAR_EXPORT_FORMATS
+        if parallel_workers > 1 and (export_mode != 'python' or output_format != 'CSVWithNames'):
+            raise ValueError(f"Parallel export writes CSVWithNames in python mode, not {output_format} "
+                             f"in {export_mode} mode")
+        if watermark_column and (output_format != 'CSVWithNames' or parallel_workers > 1 or export_mode != 'python'):
+            raise ValueError("Incremental export writes CSVWithNames in python mode without parallel workers")
         
-        # Generate output path
+        # Resumable export: rows in resume_key order with a checkpoint per block
+        resume_key = data.get('resume_key')
+        if resume_key and (watermark_column or compression or output_format != 'CSVWithNames' or parallel_workers > 1
+                           or export_mode != 'python'):
+            raise ValueError("Resumable export writes uncompressed CSVWithNames in python mode "
+                             "without parallel workers or a watermark")
+        
+        # Generate output path; each incremental run without append gets its own segment
         output_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(output_filename))
+        if watermark_column and not append:
+            output_path = segment_path(output_path)
+        if compression and not columnar_output and not output_path.endswith(CODEC_SUFFIXES.get(compression, '')):
+            output_path += CODEC_SUFFIXES.get(compression, '')
+        
+        # Optional cProfile run, summarized in the response
+        profile = data.get('profile', False)
         
         # Execute ingestion
-        if join_config:
-            count = ch_manager.export_join_to_file(join_config, columns, output_path, delimiter)
-        else:
-            count = ch_manager.export_to_file(table, columns, output_path, delimiter)
+        def run_export(progress=None):
+            output_files = [output_path]
+            watermark = None
+            metrics = TransferMetrics('export')
+            with metrics.track(metrics_registry, profile), \
+                    ch_pool.connection(host, port, database, user, jwt_token, **options) as ch_manager:
+                if watermark_column:
+                    previous = state_store.get(watermark_key, {}).get('value')
+                    count, watermark = ch_manager.export_incremental(
+                        table, columns, output_path, watermark_column, previous, join_config=join_config,
+                        delimiter=delimiter, append=append, progress=progress, compression=compression,
+                        metrics=metrics
+                    )
+                    # Only move the watermark once the rows are safely written
+                    state_store.set(watermark_key, {
+                        'column': watermark_column,
+                        'value': watermark,
+                        'updated_at': time.time()
+                    })
+                    if count == 0 and not append:
+                        output_files = []
+                elif resume_key:
+                    checkpoint = Checkpoint(state_store, f"resume-export:{host}:{port}/{database}:{output_path}")
+                    count = ch_manager.export_resumable(table, columns, output_path, resume_key, checkpoint,
+                                                        join_config=join_config, delimiter=delimiter,
+                                                        progress=progress, metrics=metrics)
+                elif parallel_workers > 1:
+                    count, output_files = ch_manager.export_parallel(
+                        lambda: ch_pool.connection(host, port, database, user, jwt_token, **options),
+                        table, columns, output_path, join_config=join_config, delimiter=delimiter,
+                        workers=parallel_workers, partition_by=partition_by, partition_key=partition_key,
+                        concatenate=concatenate, progress=progress, compression=compression, metrics=metrics
+                    )
+                elif join_config:
+                    count = ch_manager.export_join_to_file(join_config, columns, output_path, delimiter,
+                                                           export_mode=export_mode, output_format=output_format,
+                                                           progress=progress, compression=compression,
+                                                           row_group_size=row_group_size, metrics=metrics)
+                else:
+                    count = ch_manager.export_to_file(table, columns, output_path, delimiter,
+                                                      export_mode=export_mode, output_format=output_format,
+                                                      progress=progress, compression=compression,
+                                                      row_group_size=row_group_size, metrics=metrics)
+            
+            return {
+                'count': count,
+                'output_path': output_path,
+                'output_filename': os.path.basename(output_path),
+                'output_files': [os.path.basename(path) for path in output_files],
+                'watermark': watermark,
+                'metrics': metrics.to_dict(),
+                **({'profile': metrics.profile} if profile else {})
+            }
+        
+        # Long exports can run in the background and be polled by job id
+        if data.get('async', False):
+            job = job_manager.submit('export', run_export)
+            return jsonify({
+                'status': 'success',
+                'message': 'Export started',
+                'job_id': job.id
+            }), 202
         
         return jsonify({
             'status': 'success',
             'message': 'Data exported successfully',
-            'count': count,
-            'output_path': output_path,
-            'output_filename': os.path.basename(output_path)
+            **run_export()
+        })
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Export failed: {str(e)}'
+        }), 400
+
+@app.route('/api/stream/clickhouse', methods=['POST'])
+def stream_clickhouse():
+    try:
+        data = request.json
+        # ClickHouse source config
+        host = data.get('host')
+        port = int(data.get('port'))
+        database = data.get('database')
+        user = data.get('user')
+        jwt_token = data.get('jwt_token')
+        
+        # Table and columns selection
+        table = data.get('table')
+        columns = data.get('columns', [])
+        join_config = data.get('join_config', None)
+        
+        # Response format config
+        export_mode = data.get('export_mode', 'python')
+        output_format = data.get('output_format', 'CSVWithNames')
+        delimiter = data.get('delimiter', '\t' if output_format == 'TSVWithNames' else ',')
+        compression = data.get('compression')
+        options = connection_options(data)
+        
+        if output_format not in STREAM_FORMATS:
+            raise ValueError(f"Unsupported export format: {output_format}")
+        extension, content_type = STREAM_FORMATS[output_format]
+        
+        output_filename = data.get('output_filename') or f"{table or 'join'}_export{extension}"
+        output_filename = secure_filename(output_filename)
+        if compression and output_format not in COLUMNAR_EXPORT_FORMATS:
+            output_filename += CODEC_SUFFIXES.get(compression, '')
+            content_type = 'application/octet-stream'
+        
+        # The pooled connection is held for as long as the response is streaming
+        def generate():
+            with ch_pool.connection(host, port, database, user, jwt_token, **options) as ch_manager:
+                yield from ch_manager.stream_export(
+                    table, columns, join_config=join_config, delimiter=delimiter,
+                    export_mode=export_mode, output_format=output_format, compression=compression
+                )
+        
+        # Produce the first chunk now so query errors still get a JSON error response
+        body = generate()
+        first_chunk = next(body, b'')
+        
+        def relay():
+            # Close body when the client disconnects so its connection is released
+            try:
+                yield first_chunk
+                yield from body
+            finally:
+                body.close()
+        
+        return Response(stream_with_context(relay()), mimetype=content_type, headers={
+            'Content-Disposition': f'attachment; filename="{output_filename}"'
         })
     except Exception as e:
         return jsonify({
@@ -229,8 +574,9 @@ def ingest_clickhouse_to_flatfile():
 def ingest_flatfile_to_clickhouse():
     try:
         data = request.json
-        # Flat file source config
+        # Flat file source config; filepaths may list several files or directories
         filepath = data.get('filepath')
+        filepaths = data.get('filepaths') or [filepath]
         delimiter = data.get('delimiter', ',')
         columns = data.get('columns', [])
         
@@ -242,19 +588,125 @@ def ingest_flatfile_to_clickhouse():
         jwt_token = data.get('jwt_token')
         target_table = data.get('target_table')
         create_table = data.get('create_table', False)
+        insert_mode = data.get('insert_mode', 'python')
+        options = connection_options(data)
+        
+        # Rows per insert; without it batches are sized by bytes and insert time
+        batch_size = int(data['batch_size']) if data.get('batch_size') else None
+        
+        # Server settings for every INSERT, e.g. {"async_insert": 1}
+        insert_settings = data.get('insert_settings') or {}
+        
+        # Parallel import config; each insert worker holds its own pooled connection
+        parallel_workers = min(int(data.get('parallel_workers', 1)), ch_pool.max_size - 1)
+        preserve_order = data.get('preserve_order', False)
+        
+        # Worker processes parsing each large uncompressed file
+        parse_workers = max(int(data.get('parse_workers', 1)), 1)
+        
+        # Compact dtypes: narrow, typed columns from the inferred schema, also
+        # used for the types of a created table
+        compact_dtypes = data.get('compact_dtypes', False)
+        
+        # Incremental import: only rows appended since the saved byte offset
+        incremental = data.get('incremental', False)
+        
+        # Resumable import: checkpoint per batch, continuing an interrupted run
+        resumable = data.get('resumable', False)
+        
+        # Server-side import: ClickHouse parses the file, optionally reading it
+        # itself from server_path when it shares the file's storage
+        server_path = data.get('server_path')
         
         # Initialize managers
-        ff_manager = FlatFileManager(filepath, delimiter)
-        ch_manager = ClickHouseManager(host, port, database, user, jwt_token)
+        ff_managers = [FlatFileManager(path, delimiter, parse_workers=parse_workers, compact=compact_dtypes)
+                       for path in list_input_files(filepaths)]
+        if not ff_managers:
+            raise ValueError("No input files found")
+        if incremental and len(ff_managers) > 1:
+            raise ValueError("Incremental import takes a single file")
+        if resumable and (incremental or parallel_workers > 1 or len(ff_managers) > 1):
+            raise ValueError("Resumable import takes a single file without parallel workers or incremental mode")
+        if insert_mode == 'server' and (incremental or resumable or len(ff_managers) > 1):
+            raise ValueError("Server-side import takes a single file without incremental or resumable mode")
+        if server_path and insert_mode != 'server':
+            raise ValueError("server_path requires insert_mode 'server'")
+        if compact_dtypes and insert_mode == 'numpy':
+            raise ValueError("Compact dtypes are inserted with insert_mode 'python'")
+        if resumable and insert_settings:
+            raise ValueError("Resumable import does not take insert settings")
+        source_key = f"{os.path.abspath(ff_managers[0].filepath)}:{database}.{target_table}"
+        
+        # Fail fast on unknown columns using the cached file schema
+        known_columns = {col['name'] for col in ff_managers[0].get_columns()}
+        missing = [col for col in columns if col not in known_columns]
+        if missing:
+            raise ValueError(f"Columns not found in file: {', '.join(missing)}")
+        
+        # Optional cProfile run, summarized in the response
+        profile = data.get('profile', False)
         
         # Execute ingestion
-        count = ch_manager.import_from_file(ff_manager, columns, target_table, create_table)
+        def run_import(progress=None):
+            result = {}
+            metrics = TransferMetrics('import')
+            with metrics.track(metrics_registry, profile), \
+                    ch_pool.connection(host, port, database, user, jwt_token, **options) as ch_manager:
+                if incremental:
+                    previous = state_store.get(f"import:{source_key}")
+                    byte_range, checkpoint, reset = ff_managers[0].appended_range(previous)
+                    count = ch_manager.import_from_file(ff_managers[0], columns, target_table, create_table,
+                                                        batch_size, insert_mode=insert_mode, progress=progress,
+                                                        byte_range=byte_range, metrics=metrics,
+                                                        insert_settings=insert_settings)
+                    # Only move the offset once the rows are inserted
+                    state_store.set(f"import:{source_key}", checkpoint)
+                    result = {'offset': checkpoint['offset'], 'reset': reset}
+                elif resumable:
+                    checkpoint = Checkpoint(state_store, f"resume-import:{source_key}")
+                    previous = checkpoint.load()
+                    count = ch_manager.import_resumable(ff_managers[0], columns, target_table, checkpoint,
+                                                        create_table, batch_size or 10000, insert_mode=insert_mode,
+                                                        progress=progress, metrics=metrics)
+                    result = {'resumed_rows': previous['rows'] if previous else 0}
+                elif insert_mode == 'server':
+                    count = ch_manager.import_server_side(ff_managers[0], columns, target_table, create_table,
+                                                          server_path=server_path, batch_size=batch_size,
+                                                          progress=progress, metrics=metrics,
+                                                          insert_settings=insert_settings)
+                elif parallel_workers > 1 or len(ff_managers) > 1:
+                    count = ch_manager.import_parallel(
+                        lambda: ch_pool.connection(host, port, database, user, jwt_token, **options),
+                        ff_managers, columns, target_table, create_table, batch_size,
+                        workers=max(parallel_workers, 1), insert_mode=insert_mode, preserve_order=preserve_order,
+                        progress=progress, metrics=metrics, insert_settings=insert_settings
+                    )
+                else:
+                    count = ch_manager.import_from_file(ff_managers[0], columns, target_table, create_table,
+                                                        batch_size, insert_mode=insert_mode, progress=progress,
+                                                        metrics=metrics, insert_settings=insert_settings)
+            
+            return {
+                'count': count,
+                'table': target_table,
+                **result,
+                'metrics': metrics.to_dict(),
+                **({'profile': metrics.profile} if profile else {})
+            }
+        
+        # Long imports can run in the background and be polled by job id
+        if data.get('async', False):
+            job = job_manager.submit('import', run_import)
+            return jsonify({
+                'status': 'success',
+                'message': 'Import started',
+                'job_id': job.id
+            }), 202
         
         return jsonify({
             'status': 'success',
             'message': 'Data imported successfully',
-            'count': count,
-            'table': target_table
+            **run_import()
         })
     except Exception as e:
         return jsonify({
@@ -262,6 +714,146 @@ def ingest_flatfile_to_clickhouse():
             'message': f'Import failed: {str(e)}'
         }), 400
 
+@app.route('/api/ingest/clickhouse-to-clickhouse', methods=['POST'])
+def ingest_clickhouse_to_clickhouse():
+    try:
+        data = request.json
+        # ClickHouse source config
+        host = data.get('host')
+        port = int(data.get('port'))
+        database = data.get('database')
+        user = data.get('user')
+        jwt_token = data.get('jwt_token')
+        options = connection_options(data)
+        
+        # Table and columns selection
+        table = data.get('table')
+        columns = data.get('columns', [])
+        join_config = data.get('join_config', None)
+        
+        # ClickHouse target config, with the same keys as the source
+        target = data.get('target', {})
+        target_args = (target.get('host'), int(target.get('port')), target.get('database'), target.get('user'),
+                       target.get('jwt_token'))
+        target_options = connection_options(target)
+        target_table = data.get('target_table')
+        create_table = data.get('create_table', False)
+        
+        # Rows per block; without it blocks are sized from the result's row width
+        batch_size = int(data['batch_size']) if data.get('batch_size') else None
+        insert_settings = data.get('insert_settings') or {}
+        
+        # Parallel copy config; each partition holds a source and a target connection
+        parallel_workers = min(int(data.get('parallel_workers', 1)), (ch_pool.max_size - 1) // 2)
+        partition_by = data.get('partition_by', 'hash')
+        partition_key = data.get('partition_key')
+        
+        # Optional cProfile run, summarized in the response
+        profile = data.get('profile', False)
+        
+        # Execute the copy
+        def run_copy(progress=None):
+            metrics = TransferMetrics('copy')
+            with metrics.track(metrics_registry, profile), \
+                    ch_pool.connection(host, port, database, user, jwt_token, **options) as ch_manager:
+                count = ch_manager.copy_to_clickhouse(
+                    lambda: ch_pool.connection(*target_args, **target_options),
+                    table, columns, target_table, join_config=join_config, create_table=create_table,
+                    batch_size=batch_size, workers=max(parallel_workers, 1),
+                    source_factory=lambda: ch_pool.connection(host, port, database, user, jwt_token, **options),
+                    partition_by=partition_by, partition_key=partition_key, insert_settings=insert_settings,
+                    progress=progress, metrics=metrics
+                )
+            
+            return {
+                'count': count,
+                'table': target_table,
+                'metrics': metrics.to_dict(),
+                **({'profile': metrics.profile} if profile else {})
+            }
+        
+        # Long copies can run in the background and be polled by job id
+        if data.get('async', False):
+            job = job_manager.submit('copy', run_copy)
+            return jsonify({
+                'status': 'success',
+                'message': 'Copy started',
+                'job_id': job.id
+            }), 202
+        
+        return jsonify({
+            'status': 'success',
+            'message': 'Data copied successfully',
+            **run_copy()
+        })
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Copy failed: {str(e)}'
+        }), 400
+
+@app.route('/api/incremental/state', methods=['GET'])
+def list_incremental_state():
+    return jsonify({
+        'status': 'success',
+        'state': [{'key': key, **value} for key, value in state_store.items(request.args.get('prefix', ''))]
+    })
+
+@app.route('/api/incremental/state/<path:key>', methods=['DELETE'])
+def reset_incremental_state(key):
+    # Forgetting a watermark or offset makes the next run start from scratch
+    if not state_store.delete(key):
+        return jsonify({
+            'status': 'error',
+            'message': 'State not found'
+        }), 404
+    
+    return jsonify({
+        'status': 'success',
+        'message': 'State reset'
+    })
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Prometheus text exposition format
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify({
+        'status': 'success',
+        'jobs': [job.to_dict() for job in job_manager.list()]
+    })
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Job not found'
+        }), 404
+    
+    return jsonify({
+        'status': 'success',
+        'job': job.to_dict()
+    })
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Job not found'
+        }), 404
+    
+    return jsonify({
+        'status': 'success',
+        'message': 'Cancellation requested',
+        'job': job.to_dict()
+    })
+
 @app.route('/api/download/<filename>')
 def download_file(filename):
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
@@ -0,0 +1,80 @@
+"""
+Measure bytes on disk and write/read time for each flat-file compression codec.
+
+Writes a synthetic CSV through each codec, then reads it back with
+FlatFileManager.iter_chunks. With --host, also times a ClickHouse export
+per codec.
+
+Usage:
+    python benchmarks/bench_codecs.py --rows 1000000 [--host localhost --table my_table]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_insert import generate_csv
+from utils.clickhouse import ClickHouseManager
+from utils.compression import CODECS, CODEC_SUFFIXES, wrap_writer
+from utils.flatfile import FlatFileManager
+
+
+def compress_file(source, target, codec):
+    with open(source, 'rb') as src, open(target, 'wb') as raw, wrap_writer(raw, codec) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--host')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--database', default='default')
+    parser.add_argument('--user', default='default')
+    parser.add_argument('--table', help='table to export when --host is given')
+    args = parser.parse_args()
+
+    ch_manager = None
+    if args.host:
+        ch_manager = ClickHouseManager(args.host, args.port, args.database, args.user)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = os.path.join(tmp_dir, 'bench.csv')
+        generate_csv(source, args.rows)
+
+        for codec in (None,) + CODECS:
+            label = codec or 'none'
+            path = source + CODEC_SUFFIXES.get(codec, '')
+
+            try:
+                start = time.perf_counter()
+                if codec:
+                    compress_file(source, path, codec)
+                write_time = time.perf_counter() - start
+            except ValueError as e:
+                print(f'{label:>5}: skipped ({e})')
+                continue
+
+            start = time.perf_counter()
+            rows = sum(len(chunk) for chunk in FlatFileManager(path).iter_chunks(chunk_size=100000))
+            read_time = time.perf_counter() - start
+
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            line = (f'{label:>5}: {size_mb:8.1f}MB on disk, write {write_time:.2f}s, '
+                    f'read {rows} rows in {read_time:.2f}s')
+
+            if ch_manager and args.table:
+                export_path = os.path.join(tmp_dir, f'export.csv{CODEC_SUFFIXES.get(codec, "")}')
+                start = time.perf_counter()
+                ch_manager.export_to_file(args.table, [], export_path, compression=codec)
+                line += f', export {time.perf_counter() - start:.2f}s'
+
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Compare ClickHouse -> flat-file export throughput of the Python CSV writer
+against server-side native formats streamed over the HTTP interface.
+
+Usage:
+    python benchmarks/bench_export.py --host localhost --port 9000 --http-port 8123 --rows 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.clickhouse import ClickHouseManager, NATIVE_EXPORT_FORMATS
+
+TABLE = 'bench_export_source'
+
+
+def create_source_table(ch_manager, rows):
+    """
+    Create and fill a synthetic source table on the server.
+    """
+    ch_manager.client.execute(f'DROP TABLE IF EXISTS {TABLE}')
+    ch_manager.client.execute(
+        f'CREATE TABLE {TABLE} (id UInt64, amount Float64, category String, comment String) '
+        f'ENGINE = MergeTree() ORDER BY id'
+    )
+    ch_manager.client.execute(
+        f"INSERT INTO {TABLE} SELECT number, number / 3, "
+        f"['alpha', 'beta', 'gamma', 'delta'][number % 4 + 1], concat('row-', toString(number)) "
+        f"FROM numbers({rows})"
+    )
+
+
+def run(label, export):
+    start = time.perf_counter()
+    count, path = export()
+    elapsed = time.perf_counter() - start
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    print(f'{label:>22}: {count} rows, {size_mb:.1f}MB in {elapsed:.2f}s '
+          f'({size_mb / elapsed:.1f} MB/s)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--http-port', type=int, default=8123)
+    parser.add_argument('--database', default='default')
+    parser.add_argument('--user', default='default')
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    ch_manager = ClickHouseManager(args.host, args.port, args.database, args.user,
+                                   http_port=args.http_port)
+    create_source_table(ch_manager, args.rows)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        def export(mode, output_format):
+            path = os.path.join(tmp_dir, f'{mode}.{output_format}')
+            count = ch_manager.export_to_file(TABLE, [], path, export_mode=mode,
+                                              output_format=output_format)
+            return count, path
+
+        run('python CSV', lambda: export('python', 'CSVWithNames'))
+        for output_format in NATIVE_EXPORT_FORMATS:
+            run(f'native {output_format}', lambda: export('native', output_format))
+
+    ch_manager.client.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Compare flat-file -> ClickHouse insert throughput for each insert mode.
+
+Usage:
+    python benchmarks/bench_insert.py --host localhost --port 9000 --rows 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.clickhouse import ClickHouseManager, INSERT_MODES
+from utils.flatfile import FlatFileManager
+
+
+def generate_csv(path, rows, seed=0):
+    """
+    Write a synthetic CSV with integer, float and string columns.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'id': np.arange(rows, dtype='int64'),
+        'amount': rng.random(rows) * 1000,
+        'quantity': rng.integers(0, 1000, rows),
+        'category': rng.choice(['alpha', 'beta', 'gamma', 'delta'], rows),
+        'comment': [f'row-{i}' for i in range(rows)],
+    })
+    df.to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--database', default='default')
+    parser.add_argument('--user', default='default')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    ch_manager = ClickHouseManager(args.host, args.port, args.database, args.user)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, 'bench.csv')
+        generate_csv(csv_path, args.rows)
+        ff_manager = FlatFileManager(csv_path)
+
+        for mode in INSERT_MODES:
+            table = f'bench_insert_{mode}'
+            ch_manager.client.execute(f'DROP TABLE IF EXISTS {table}')
+
+            start = time.perf_counter()
+            count = ch_manager.import_from_file(ff_manager, [], table, create_table=True,
+                                                batch_size=args.batch_size, insert_mode=mode)
+            elapsed = time.perf_counter() - start
+
+            print(f'{mode:>8}: {count} rows in {elapsed:.2f}s ({count / elapsed:,.0f} rows/s)')
+            ch_manager.client.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,418 @@
+"""
+Benchmark imports, exports, schema detection and previews across data shapes,
+and compare the results against a stored baseline.
+
+Synthetic CSVs are generated for each shape (narrow, wide, string-heavy,
+numeric) and row count. Every case runs in a fresh process so its peak RSS
+is its own. Targets:
+    --host                 an already running ClickHouse server
+    --clickhouse-binary    a local ClickHouse binary, started on free ports
+    (neither)              an in-process sink standing in for the driver; it
+                           measures parsing, conversion and file writing but
+                           not wire encoding or the server
+
+Usage:
+    python benchmarks/bench_suite.py --rows 1000000 --shapes narrow,wide --save-baseline baseline.json
+    python benchmarks/bench_suite.py --rows 1000000 --shapes narrow,wide --compare baseline.json
+    python benchmarks/bench_suite.py --clickhouse-binary /usr/bin/clickhouse --rows 10000000
+"""
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.clickhouse import INSERT_MODES, ClickHouseManager
+from utils.flatfile import FlatFileManager, schema_cache
+from utils.metrics import TransferMetrics
+from utils.rowindex import RowIndex
+
+SHAPES = ('narrow', 'wide', 'strings', 'numeric')
+
+CASES = ('import', 'export', 'export_join', 'get_columns', 'preview')
+
+# Rows generated and written per step, so 100M-row files fit in memory
+GENERATE_CHUNK_ROWS = 500000
+
+# Rows of the dimension table joined by export_join
+DIM_ROWS = 1000
+
+# Column types reported for sink results; anything else is a string
+DTYPE_TO_CLICKHOUSE = {'int64': 'Int64', 'float64': 'Float64'}
+
+
+def make_frame(shape, rows, start=0, seed=0):
+    """
+    Build rows [start, start + rows) of a synthetic shape as a DataFrame.
+    """
+    rng = np.random.default_rng(seed + start)
+    ids = np.arange(start, start + rows, dtype='int64')
+
+    if shape == 'narrow':
+        return pd.DataFrame({
+            'id': ids,
+            'amount': rng.random(rows) * 1000,
+            'quantity': rng.integers(0, 1000, rows),
+            'category': rng.choice(['alpha', 'beta', 'gamma', 'delta'], rows),
+            'comment': [f'row-{i}' for i in ids],
+        })
+    if shape == 'wide':
+        data = {'id': ids}
+        for i in range(99):
+            data[f'c{i:03d}'] = rng.random(rows) if i % 2 else rng.integers(0, 1000000, rows)
+        return pd.DataFrame(data)
+    if shape == 'strings':
+        words = np.array([f'{word:x}' * length for word in range(64) for length in (1, 4, 16)])
+        data = {'id': ids}
+        for i in range(8):
+            data[f's{i}'] = rng.choice(words, rows)
+        return pd.DataFrame(data)
+    if shape == 'numeric':
+        data = {'id': ids}
+        for i in range(9):
+            data[f'n{i}'] = rng.random(rows) * 1e6 if i % 3 else rng.integers(-1000000, 1000000, rows)
+        return pd.DataFrame(data)
+    raise ValueError(f'Unknown shape: {shape}')
+
+
+def generate_csv(path, shape, rows, seed=0):
+    """
+    Write a synthetic CSV of the given shape in bounded-memory steps.
+    """
+    for start in range(0, max(rows, 1), GENERATE_CHUNK_ROWS):
+        df = make_frame(shape, min(GENERATE_CHUNK_ROWS, rows - start), start, seed)
+        df.to_csv(path, mode='a' if start else 'w', header=start == 0, index=False)
+
+
+class SinkClient:
+    """
+    Stand-in for clickhouse_driver.Client that needs no server.
+
+    Inserts are counted and dropped; SELECTs return rows of the benchmark
+    shape, pregenerated once so only the tool's own work is timed.
+    """
+    def __init__(self, shape, rows):
+        self.rows = rows
+        sample = make_frame(shape, 1)
+        self.columns = [(name, DTYPE_TO_CLICKHOUSE.get(str(dtype), 'String')) for name, dtype in sample.dtypes.items()]
+        self.shape = shape
+        self.inserted = 0
+
+    def execute(self, query, params=None, columnar=False, settings=None, with_column_types=False):
+        if query.startswith('INSERT'):
+            self.inserted += len(params[0]) if params else 0
+            return None
+        if query.endswith('LIMIT 0'):
+            return [], self.columns
+        if 'COUNT' in query.upper():
+            return [(self.rows,)]
+        return []
+
+    def execute_iter(self, query, settings=None, chunk_size=10000):
+        block = list(make_frame(self.shape, chunk_size).itertuples(index=False, name=None))
+        for start in range(0, self.rows, chunk_size):
+            yield block[:min(chunk_size, self.rows - start)]
+
+    def disconnect(self):
+        pass
+
+
+def connect(target, shape, rows):
+    if target['host'] is None:
+        ch_manager = ClickHouseManager('localhost', 9000, 'default', 'default')
+        ch_manager.client = SinkClient(shape, rows)
+        return ch_manager
+    return ClickHouseManager(target['host'], target['port'], target['database'], target['user'],
+                             http_port=target['http_port'])
+
+
+def percentiles(seconds):
+    return {
+        'p50': float(np.percentile(seconds, 50)),
+        'p95': float(np.percentile(seconds, 95)),
+        'p99': float(np.percentile(seconds, 99)),
+    }
+
+
+def peak_rss_mb():
+    # Linux keeps ru_maxrss across exec, so a spawned child would report the
+    # parent's peak; VmHWM belongs to this process image alone
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_case(spec):
+    """
+    Run one benchmark case in this (fresh) process and return its results.
+    """
+    case, shape, rows, path = spec['case'], spec['shape'], spec['rows'], spec['path']
+    ch_manager = connect(spec['target'], shape, rows)
+    table = f'bench_suite_{shape}'
+    seconds = []
+    metrics = None
+    moved_bytes = 0
+
+    if case == 'import':
+        for _ in range(spec['repeat']):
+            ch_manager.client.execute(f'DROP TABLE IF EXISTS {table}')
+            metrics = TransferMetrics('import')
+            start = time.perf_counter()
+            ch_manager.import_from_file(FlatFileManager(path), [], table, create_table=True,
+                                        batch_size=spec['batch_size'], insert_mode=spec['insert_mode'],
+                                        metrics=metrics)
+            seconds.append(time.perf_counter() - start)
+        moved_bytes = os.path.getsize(path)
+    elif case in ('export', 'export_join'):
+        output_path = os.path.join(spec['tmp_dir'], f'{case}-{shape}.csv')
+        join_config = {
+            'base_table': table,
+            'join_tables': ['bench_suite_dim'],
+            'join_conditions': [f'bench_suite_dim.key = {table}.id'],
+            'join_types': ['LEFT JOIN'],
+        }
+        for _ in range(spec['repeat']):
+            metrics = TransferMetrics('export')
+            start = time.perf_counter()
+            if case == 'export':
+                ch_manager.export_to_file(table, [], output_path, batch_size=spec['batch_size'], metrics=metrics)
+            else:
+                ch_manager.export_join_to_file(join_config, [], output_path, batch_size=spec['batch_size'],
+                                               metrics=metrics)
+            seconds.append(time.perf_counter() - start)
+        moved_bytes = os.path.getsize(output_path)
+        os.remove(output_path)
+    elif case == 'get_columns':
+        for _ in range(spec['iterations']):
+            # Measure cold detection, not the schema cache
+            schema_cache.clear()
+            start = time.perf_counter()
+            FlatFileManager(path).get_columns()
+            seconds.append(time.perf_counter() - start)
+    elif case == 'preview':
+        ff_manager = FlatFileManager(path)
+        ff_manager.row_index()
+        for i in range(spec['iterations']):
+            # Pages spread over the file, served through the row index
+            offset = (rows - 100) * i // max(spec['iterations'] - 1, 1)
+            start = time.perf_counter()
+            ff_manager.preview_data([], limit=100, offset=max(offset, 0))
+            seconds.append(time.perf_counter() - start)
+
+    result = {
+        'case': case,
+        'shape': shape,
+        'rows': rows,
+        'runs': len(seconds),
+        **percentiles(seconds),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    if case in ('import', 'export', 'export_join'):
+        median = result['p50']
+        result['rows_per_second'] = rows / median if median > 0 else 0
+        result['mb_per_second'] = moved_bytes / median / (1024 * 1024) if median > 0 else 0
+        result['stage_seconds'] = metrics.to_dict()['stage_seconds']
+    return result
+
+
+def run_isolated(spec):
+    # A spawned process starts without the parent's memory, so peak RSS is per case
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_case, spec).result()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(binary, data_dir, timeout=60):
+    """
+    Start a throwaway ClickHouse server from a local binary; returns the
+    process and its (tcp, http) ports once it accepts connections.
+    """
+    tcp_port, http_port = free_port(), free_port()
+    process = subprocess.Popen([
+        binary, 'server', '--',
+        f'--path={data_dir}/',
+        f'--tcp_port={tcp_port}',
+        f'--http_port={http_port}',
+        '--listen_host=127.0.0.1',
+        f'--logger.log={data_dir}/server.log',
+        f'--logger.errorlog={data_dir}/server.err.log',
+    ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'ClickHouse server exited with code {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', tcp_port), timeout=1).close()
+            return process, tcp_port, http_port
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('ClickHouse server did not start in time')
+
+
+def prepare_server(target, shapes, paths):
+    """
+    Load each shape's source table and the join dimension table.
+    """
+    for shape in shapes:
+        ch_manager = connect(target, shape, 0)
+        table = f'bench_suite_{shape}'
+        ch_manager.client.execute(f'DROP TABLE IF EXISTS {table}')
+        ch_manager.import_from_file(FlatFileManager(paths[shape]), [], table, create_table=True,
+                                    batch_size=100000, insert_mode='numpy')
+
+    ch_manager.client.execute('DROP TABLE IF EXISTS bench_suite_dim')
+    ch_manager.client.execute('CREATE TABLE bench_suite_dim (key Int64, label String) ENGINE = Memory')
+    ch_manager.client.execute(f"INSERT INTO bench_suite_dim SELECT number, concat('label-', toString(number)) "
+                              f"FROM numbers({DIM_ROWS})")
+
+
+def cleanup_server(target, shapes):
+    ch_manager = connect(target, shapes[0], 0)
+    for table in [f'bench_suite_{shape}' for shape in shapes] + ['bench_suite_dim']:
+        ch_manager.client.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+def result_key(result):
+    return f"{result['case']}/{result['shape']}/{result['rows']}"
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the change against baseline for each case; returns the regressions.
+    Throughput cases compare rows/s, latency cases compare p50.
+    """
+    regressions = []
+    for result in results:
+        base = baseline.get(result_key(result))
+        if base is None:
+            continue
+        if 'rows_per_second' in result:
+            change = result['rows_per_second'] / base['rows_per_second'] - 1 if base['rows_per_second'] else 0
+            worse = change < -threshold
+        else:
+            change = result['p50'] / base['p50'] - 1 if base['p50'] else 0
+            worse = change > threshold
+        flag = '  REGRESSION' if worse else ''
+        print(f'{result_key(result):>32}: {change:+.1%} vs baseline{flag}')
+        if worse:
+            regressions.append(result_key(result))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='100000', help='comma-separated row counts')
+    parser.add_argument('--shapes', default=','.join(SHAPES))
+    parser.add_argument('--cases', default=','.join(CASES))
+    parser.add_argument('--repeat', type=int, default=3, help='runs per import/export case')
+    parser.add_argument('--iterations', type=int, default=20, help='calls per get_columns/preview case')
+    parser.add_argument('--batch-size', type=int, help='rows per batch/block; sized adaptively when omitted')
+    parser.add_argument('--insert-mode', default='numpy', choices=INSERT_MODES)
+    parser.add_argument('--host')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--http-port', type=int, default=8123)
+    parser.add_argument('--database', default='default')
+    parser.add_argument('--user', default='default')
+    parser.add_argument('--clickhouse-binary', help='start a throwaway server from this binary')
+    parser.add_argument('--save-baseline', help='write results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change counted as a regression')
+    args = parser.parse_args()
+
+    row_counts = [int(rows) for rows in args.rows.split(',')]
+    shapes = args.shapes.split(',')
+    cases = args.cases.split(',')
+
+    target = {'host': args.host, 'port': args.port, 'http_port': args.http_port,
+              'database': args.database, 'user': args.user}
+    server = None
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        try:
+            if args.clickhouse_binary:
+                server, target['port'], target['http_port'] = start_server(
+                    args.clickhouse_binary, os.path.join(tmp_dir, 'clickhouse'))
+                target['host'] = '127.0.0.1'
+            backend = 'sink' if target['host'] is None else f"{target['host']}:{target['port']}"
+            print(f'backend: {backend}')
+
+            for rows in row_counts:
+                paths = {}
+                for shape in shapes:
+                    paths[shape] = os.path.join(tmp_dir, f'{shape}-{rows}.csv')
+                    generate_csv(paths[shape], shape, rows)
+                if target['host'] is not None and set(cases) & {'export', 'export_join'}:
+                    prepare_server(target, shapes, paths)
+
+                for shape in shapes:
+                    for case in cases:
+                        spec = {'case': case, 'shape': shape, 'rows': rows, 'path': paths[shape],
+                                'target': target, 'tmp_dir': tmp_dir, 'repeat': args.repeat,
+                                'iterations': args.iterations, 'batch_size': args.batch_size,
+                                'insert_mode': args.insert_mode}
+                        result = run_isolated(spec)
+                        result['backend'] = backend
+                        results.append(result)
+
+                        line = (f"{result_key(result):>32}: p50 {result['p50'] * 1000:9.1f}ms "
+                                f"p95 {result['p95'] * 1000:9.1f}ms, peak RSS {result['peak_rss_mb']:7.1f}MB")
+                        if 'rows_per_second' in result:
+                            line += (f", {result['rows_per_second']:,.0f} rows/s "
+                                     f"({result['mb_per_second']:.1f} MB/s)")
+                        print(line)
+
+                # Large row counts need the disk back before the next size
+                for path in paths.values():
+                    for leftover in (path, RowIndex.sidecar_path(path)):
+                        if os.path.exists(leftover):
+                            os.remove(leftover)
+
+            if target['host'] is not None:
+                cleanup_server(target, shapes)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({result_key(result): result for result in results}, f, indent=2, sort_keys=True)
+        print(f'baseline written to {args.save_baseline}')
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f'{len(regressions)} regression(s) beyond {args.threshold:.0%}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
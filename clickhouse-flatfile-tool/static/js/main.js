@@ -14,6 +14,12 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     };
     
+    // Files larger than this are sent as resumable chunks, several at a time
+    const CHUNKED_UPLOAD_THRESHOLD = 32 * 1024 * 1024;
+    const UPLOAD_CHUNK_SIZE = 16 * 1024 * 1024;
+    const PARALLEL_CHUNK_UPLOADS = 4;
+    const CHUNK_UPLOAD_ATTEMPTS = 3;
+    
     // DOM references
     const ingestionDirectionRadios = document.querySelectorAll('input[name="ingestionDirection"]');
     const connectClickhouseBtn = document.getElementById('connectClickhouse');
@@ -157,20 +163,27 @@ document.addEventListener('DOMContentLoaded', function() {
         
         const delimiter = document.getElementById('inputDelimiter').value;
         
-        // Create FormData for file upload
-        const formData = new FormData();
-        formData.append('file', file);
-        formData.append('delimiter', delimiter);
-        
         // Update status
         updateStatus('connecting', 'Uploading and parsing file...', 20);
         
         // Upload file
-        fetch('/api/upload/flatfile', {
-            method: 'POST',
-            body: formData
-        })
-        .then(response => response.json())
+        let upload;
+        if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+            upload = uploadFileInChunks(file, delimiter);
+        } else {
+            // Create FormData for file upload
+            const formData = new FormData();
+            formData.append('file', file);
+            formData.append('delimiter', delimiter);
+            
+            upload = fetch('/api/upload/flatfile', {
+                method: 'POST',
+                body: formData
+            })
+            .then(response => response.json());
+        }
+        
+        upload
         .then(data => {
             if (data.status === 'success') {
                 // Store file data
@@ -471,6 +484,102 @@ document.addEventListener('DOMContentLoaded', function() {
         document.getElementById('previewStatus').textContent = '';
     }
     
+    // Upload a large file as fixed-size chunks, PARALLEL_CHUNK_UPLOADS at a time
+    function uploadFileInChunks(file, delimiter) {
+        return fetch('/api/upload/flatfile/chunked', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                filename: file.name,
+                total_size: file.size,
+                chunk_size: UPLOAD_CHUNK_SIZE
+            })
+        })
+        .then(response => response.json())
+        .then(upload => {
+            if (upload.status !== 'success') {
+                throw new Error(upload.message);
+            }
+            
+            let nextChunk = 0;
+            let uploadedChunks = 0;
+            
+            // Each lane keeps taking the next unsent chunk until none are left
+            function uploadNextChunk() {
+                if (nextChunk >= upload.total_chunks) {
+                    return Promise.resolve();
+                }
+                
+                const index = nextChunk++;
+                const blob = file.slice(index * UPLOAD_CHUNK_SIZE, (index + 1) * UPLOAD_CHUNK_SIZE);
+                
+                return uploadChunk(upload.upload_id, index, blob, 1)
+                    .then(() => {
+                        uploadedChunks++;
+                        const progress = 20 + Math.round(60 * uploadedChunks / upload.total_chunks);
+                        updateStatus('connecting', `Uploading file... ${uploadedChunks}/${upload.total_chunks} chunks`, progress);
+                        return uploadNextChunk();
+                    });
+            }
+            
+            const lanes = [];
+            for (let i = 0; i < Math.min(PARALLEL_CHUNK_UPLOADS, upload.total_chunks); i++) {
+                lanes.push(uploadNextChunk());
+            }
+            
+            return Promise.all(lanes)
+                .then(() => {
+                    updateStatus('connecting', 'Parsing file...', 85);
+                    return fetch(`/api/upload/flatfile/chunked/${upload.upload_id}/finalize`, {
+                        method: 'POST',
+                        headers: {
+                            'Content-Type': 'application/json'
+                        },
+                        body: JSON.stringify({
+                            delimiter: delimiter
+                        })
+                    });
+                })
+                .then(response => response.json());
+        });
+    }
+    
+    function uploadChunk(uploadId, index, blob, attempt) {
+        return blob.arrayBuffer()
+            .then(buffer => sha256Hex(buffer).then(checksum => fetch(`/api/upload/flatfile/chunked/${uploadId}/${index}`, {
+                method: 'PUT',
+                headers: checksum ? { 'X-Chunk-SHA256': checksum } : {},
+                body: buffer
+            })))
+            .then(response => response.json())
+            .then(data => {
+                if (data.status !== 'success') {
+                    throw new Error(data.message);
+                }
+            })
+            .catch(error => {
+                // Retry the chunk; the server only keeps chunks that arrived intact
+                if (attempt < CHUNK_UPLOAD_ATTEMPTS) {
+                    return uploadChunk(uploadId, index, blob, attempt + 1);
+                }
+                throw error;
+            });
+    }
+    
+    function sha256Hex(buffer) {
+        // WebCrypto is only available in secure contexts; upload unchecked otherwise
+        if (!window.crypto || !window.crypto.subtle) {
+            return Promise.resolve(null);
+        }
+        
+        return window.crypto.subtle.digest('SHA-256', buffer)
+            .then(hash => Array.from(new Uint8Array(hash))
+                .map(b => b.toString(16).padStart(2, '0'))
+                .join(''));
+    }
+    
     function updateStatus(status, message, progress) {
         const statusDiv = document.getElementById('statusMessage');
         const progressBar = document.getElementById('statusProgress');
@@ -0,0 +1,18 @@
+from utils.clickhouse import ClickHouseManager
+
+class RecordingClient:
+    def __init__(self):
+        self.queries = []
+        self.inserts = []
+
+    def execute(self, query, values=None, **kwargs):
+        if values is None:
+            self.queries.append(query)
+        else:
+            self.inserts.append(values)
+
+def make_manager(client, user='u', jwt_token=None):
+    manager = ClickHouseManager.__new__(ClickHouseManager)
+    manager.client = client
+    manager.host, manager.port, manager.database, manager.user, manager.jwt_token = 'h', 9000, 'db', user, jwt_token
+    return manager
\ No newline at end of file
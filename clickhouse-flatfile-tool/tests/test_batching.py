@@ -0,0 +1,71 @@
+import pandas as pd
+
+from utils.batching import AdaptiveBatcher, block_rows, estimate_row_width
+
+def frame(rows):
+    # One int64 column: 8 bytes per row in memory
+    return pd.DataFrame({'id': range(rows)})
+
+def measured(**kwargs):
+    batcher = AdaptiveBatcher(target_bytes=8000, min_rows=100, max_rows=10000, target_seconds=(0.5, 5.0),
+                              **kwargs)
+    next(batcher.rebatch([frame(5000)]))
+    return batcher
+
+def test_batch_rows_follow_the_byte_target():
+    batcher = measured()
+    assert batcher.bytes_per_row == 8.0
+    assert batcher.batch_rows == 1000
+
+def test_rebatch_regroups_chunks_into_batches_of_batch_rows():
+    batcher = AdaptiveBatcher(target_bytes=8000, min_rows=100, max_rows=10000)
+    batches = list(batcher.rebatch([frame(300), frame(900), frame(1500)]))
+    assert [len(batch) for batch in batches] == [1000, 1000, 700]
+    assert pd.concat(batches)['id'].tolist() == list(range(300)) + list(range(900)) + list(range(1500))
+
+def test_fast_full_batches_grow_the_batch():
+    batcher = measured()
+    batcher.record(1000, 0.1)
+    assert batcher.batch_rows == 1500
+    batcher.record(1500, 0.1)
+    assert batcher.batch_rows == 2250
+
+def test_fast_short_batches_do_not_grow_the_batch():
+    batcher = measured()
+    batcher.record(10, 0.1)
+    assert batcher.batch_rows == 1000
+
+def test_slow_batches_shrink_the_batch():
+    batcher = measured()
+    batcher.record(1000, 10.0)
+    assert batcher.batch_rows == 500
+    batcher.record(500, 10.0)
+    assert batcher.batch_rows == 250
+
+def test_batches_within_the_latency_band_keep_their_size():
+    batcher = measured()
+    batcher.record(1000, 1.0)
+    assert batcher.batch_rows == 1000
+
+def test_batch_rows_stay_between_min_and_max():
+    batcher = measured()
+    for _ in range(20):
+        batcher.record(batcher.batch_rows, 0.01)
+    assert batcher.batch_rows == 10000
+
+    for _ in range(20):
+        batcher.record(batcher.batch_rows, 60.0)
+    assert batcher.batch_rows == 100
+
+    summary = batcher.summary()
+    assert summary['smallest_batch_rows'] == 100 and summary['largest_batch_rows'] == 10000
+    assert summary['batches'] == 40
+
+def test_empty_file_still_yields_its_columns():
+    batches = list(AdaptiveBatcher().rebatch([frame(0)]))
+    assert len(batches) == 1 and list(batches[0].columns) == ['id']
+
+def test_block_rows_follow_the_row_width():
+    assert estimate_row_width(['Int64', 'Nullable(Int32)', 'FixedString(10)', 'String']) == 8 + 5 + 10 + 32
+    assert block_rows(['Int64'], target_bytes=8000, min_rows=10, max_rows=10000) == 1000
+    assert block_rows(['String'] * 100, target_bytes=8000, min_rows=10, max_rows=10000) == 10
@@ -0,0 +1,53 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from fakes import RecordingClient, make_manager
+from utils.columnar import read_slice
+from utils.flatfile import FlatFileManager
+
+def write_parquet(path, rows, row_group_size):
+    pq.write_table(pa.table({'n': list(range(rows))}), path, row_group_size=row_group_size)
+
+def test_pages_within_one_row_group(tmp_path):
+    path = str(tmp_path / 'one.parquet')
+    write_parquet(path, 1000, 1000)
+
+    page = read_slice(path, 'parquet', offset=50, limit=100)
+    assert page['n'].tolist() == list(range(50, 150))
+
+def test_pages_spanning_row_groups(tmp_path):
+    path = str(tmp_path / 'many.parquet')
+    write_parquet(path, 1000, 64)
+
+    pages = [read_slice(path, 'parquet', offset=offset, limit=100)['n'].tolist() for offset in range(0, 1000, 100)]
+    assert pages == [list(range(offset, offset + 100)) for offset in range(0, 1000, 100)]
+
+    assert read_slice(path, 'parquet', offset=950, limit=100)['n'].tolist() == list(range(950, 1000))
+
+def write_typed(path):
+    pq.write_table(pa.table({
+        'id': pa.array([1, 2, 3], pa.int64()),
+        'qty': pa.array([5, None, 7], pa.int64()),
+        'flag': pa.array([True, False, None]),
+        'ok': pa.array([True, False, True]),
+        'city': pa.array(['a', None, 'a']).dictionary_encode(),
+    }), path)
+    return str(path)
+
+def test_created_table_has_the_reported_schema(tmp_path):
+    ff = FlatFileManager(write_typed(tmp_path / 'typed.parquet'))
+    reported = {column['name']: column['type'] for column in ff.get_columns()}
+    assert reported == {'id': 'Int64', 'qty': 'Nullable(Int64)', 'flag': 'Nullable(Bool)', 'ok': 'Bool',
+                        'city': 'LowCardinality(Nullable(String))'}
+
+    client = RecordingClient()
+    make_manager(client).import_from_file(ff, [], 't', create_table=True)
+    definitions = ', '.join(f'`{name}` {ch_type}' for name, ch_type in reported.items())
+    assert f'({definitions})' in client.queries[0]
+    assert client.inserts[0] == [[1, 2, 3], [5, None, 7], [True, False, None], [True, False, True], ['a', None, 'a']]
+
+def test_numpy_inserts_send_missing_values_as_none(tmp_path):
+    ff = FlatFileManager(write_typed(tmp_path / 'typed.parquet'))
+    chunk = next(ff.iter_chunks(['qty', 'flag']))
+    qty, flag = make_manager(RecordingClient())._dataframe_to_numpy_columns(chunk)
+    assert qty.tolist() == [5, None, 7] and flag.tolist() == [True, False, None]
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from fakes import RecordingClient, make_manager
+from utils.flatfile import FlatFileManager, schema_cache
+
+def test_integer_width_covers_rows_outside_the_sample(tmp_path):
+    path = tmp_path / 'ids.csv'
+    pd.DataFrame({'id': range(33000), 'label': ['x'] * 33000}).to_csv(path, index=False)
+
+    ff = FlatFileManager(str(path), compact=True)
+    assert ff.table_types()['id'] == 'Int32'
+
+    df = ff.get_data()
+    assert len(df) == 33000
+    assert df['id'].max() == 32999
+
+def test_null_outside_the_sample_makes_the_column_nullable(tmp_path):
+    path = tmp_path / 'qty.csv'
+    qty = [str(i % 100) for i in range(20000)]
+    qty[12345] = ''
+    pd.DataFrame({'qty': qty}).to_csv(path, index=False)
+
+    ff = FlatFileManager(str(path), compact=True)
+    assert ff.table_types()['qty'] == 'Nullable(Int8)'
+
+    client = RecordingClient()
+    rows = make_manager(client).import_from_file(ff, [], 't', create_table=True)
+    assert rows == 20000
+    assert '`qty` Nullable(Int8)' in client.queries[0]
+    values = [value for batch in client.inserts for value in batch[0]]
+    assert values[12345] is None
+    assert values[12346] == 46
+
+def test_values_not_matching_the_sampled_kind_fail_before_the_table_is_created(tmp_path):
+    path = tmp_path / 'bad.csv'
+    qty = [str(i % 100) for i in range(20000)]
+    qty[15000] = 'twelve'
+    pd.DataFrame({'qty': qty}).to_csv(path, index=False)
+
+    client = RecordingClient()
+    ff = FlatFileManager(str(path), compact=True)
+    with pytest.raises(ValueError, match='compact dtypes'):
+        make_manager(client).import_from_file(ff, [], 't', create_table=True)
+    assert client.queries == [] and client.inserts == []
+
+def test_schema_is_resolved_once_per_import(tmp_path, monkeypatch):
+    path = tmp_path / 'qty.csv'
+    pd.DataFrame({'qty': [i % 100 for i in range(100000)]}).to_csv(path, index=False)
+    ff = FlatFileManager(str(path), compact=True)
+
+    scans = []
+    scan = FlatFileManager._scan_compact
+    def counting_scan(self):
+        scans.append(1)
+        # An expired cache entry must not trigger another pass
+        schema_cache.clear()
+        return scan(self)
+    monkeypatch.setattr(FlatFileManager, '_scan_compact', counting_scan)
+
+    client = RecordingClient()
+    rows = make_manager(client).import_from_file(ff, [], 't', create_table=True, batch_size=10000)
+    assert rows == 100000 and len(client.inserts) == 10
+    assert len(scans) == 1
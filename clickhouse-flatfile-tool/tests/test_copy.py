@@ -0,0 +1,47 @@
+import contextlib
+
+from fakes import RecordingClient, make_manager
+from utils.clickhouse import preview_cache
+
+class SourceClient(RecordingClient):
+    last_query = None
+
+    def execute(self, query, values=None, with_column_types=False, **kwargs):
+        super().execute(query, values, **kwargs)
+        if with_column_types:
+            return [], [('id', 'Int64'), ('total', 'Float64')]
+        if query.startswith('SELECT count()'):
+            return [(3,)]
+
+    def execute_iter(self, query, **kwargs):
+        return iter([[(1, 1.0), (2, 2.0)], [(3, 3.0)]])
+
+class Progress:
+    def __init__(self):
+        self.total_rows = None
+        self.rows = 0
+
+    def start(self, total_rows=None, total_bytes=None):
+        self.total_rows = total_rows
+
+    def advance(self, rows, nbytes):
+        self.rows += rows
+
+def test_join_copy_reports_its_row_count():
+    source = make_manager(SourceClient())
+    target = make_manager(RecordingClient())
+    progress = Progress()
+    join = {
+        'base_table': 'customers AS c',
+        'join_tables': ['orders AS o'],
+        'join_conditions': ['c.id = o.customer_id'],
+    }
+
+    copied = source.copy_to_clickhouse(lambda: contextlib.nullcontext(target), None, ['c.id', 'o.total'],
+                                       'copies', join_config=join, progress=progress)
+    preview_cache.clear()
+
+    query = source._build_join_query(join, ['c.id', 'o.total'])
+    assert source.client.queries[0] == f"SELECT count() FROM ({query})"
+    assert copied == 3
+    assert progress.total_rows == progress.rows == 3
@@ -0,0 +1,78 @@
+import pytest
+
+from fakes import make_manager
+from utils.metrics import TransferMetrics
+
+class DriverClient:
+    """
+    Mimics clickhouse-driver's execute_iter, which yields lists of
+    chunk_size rows, or the rows themselves when chunk_size is 1.
+    """
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+
+    def execute(self, query, *args, **kwargs):
+        if query.startswith('SELECT COUNT(*)'):
+            return [(len(self.rows),)]
+        return [], self.columns
+
+    def execute_iter(self, query, settings=None, chunk_size=1):
+        if chunk_size == 1:
+            yield from self.rows
+            return
+        for start in range(0, len(self.rows), chunk_size):
+            yield self.rows[start:start + chunk_size]
+
+    def disconnect(self):
+        pass
+
+ROWS = [(1, 'a'), (2, 'b'), (3, 'c')]
+COLUMNS = [('id', 'Int64'), ('name', 'String')]
+
+@pytest.mark.parametrize('batch_size', [1, 2, 1000])
+def test_export_writes_every_row_at_any_block_size(tmp_path, batch_size):
+    path = str(tmp_path / 'out.csv')
+    manager = make_manager(DriverClient(COLUMNS, ROWS))
+
+    rows = manager._write_query_to_file('SELECT * FROM t', path, TransferMetrics('export'), batch_size=batch_size)
+    assert rows == 3
+    with open(path) as f:
+        assert f.read() == 'id,name\n1,a\n2,b\n3,c\n'
+
+def test_stream_export_with_one_row_blocks():
+    manager = make_manager(DriverClient(COLUMNS, ROWS))
+    assert b''.join(manager.stream_export('t', [], batch_size=1)) == b'id,name\r\n1,a\r\n2,b\r\n3,c\r\n'
+
+def test_tsv_escapes_values_instead_of_quoting(tmp_path):
+    rows = [(1, 'tab\there', 'two\nlines'), (2, 'back\\slash "quoted"', None)]
+    manager = make_manager(DriverClient([('id', 'Int64'), ('a', 'String'), ('b', 'Nullable(String)')], rows))
+    expected = 'id\ta\tb\n1\ttab\\there\ttwo\\nlines\n2\tback\\\\slash "quoted"\t\\N\n'
+
+    path = str(tmp_path / 'out.tsv')
+    manager.export_to_file('t', [], path, delimiter='\t', batch_size=10, output_format='TSVWithNames')
+    with open(path, newline='') as f:
+        assert f.read() == expected
+
+    streamed = b''.join(manager.stream_export('t', [], delimiter='\t', output_format='TSVWithNames'))
+    assert streamed.decode('utf-8') == expected
+
+def test_join_export_reports_its_row_count(tmp_path):
+    class CountingClient(DriverClient):
+        def execute(self, query, *args, **kwargs):
+            if query.startswith('SELECT count() FROM (SELECT'):
+                return [(len(self.rows),)]
+            return super().execute(query, *args, **kwargs)
+
+    class Progress:
+        total_rows, rows = None, 0
+        def start(self, total_rows=None, total_bytes=None):
+            self.total_rows = total_rows
+        def advance(self, rows, nbytes):
+            self.rows += rows
+
+    join = {'base_table': 'a', 'join_tables': ['b'], 'join_conditions': ['a.id = b.id']}
+    progress = Progress()
+    make_manager(CountingClient(COLUMNS, ROWS)).export_join_to_file(join, [], str(tmp_path / 'out.csv'),
+                                                                    batch_size=2, progress=progress)
+    assert progress.total_rows == progress.rows == 3
@@ -0,0 +1,63 @@
+import gzip
+import math
+
+import pandas as pd
+import pytest
+
+from fakes import RecordingClient, make_manager
+from utils import rowindex
+from utils.clickhouse import _server_insert_source
+from utils.flatfile import FlatFileManager
+
+@pytest.fixture(autouse=True)
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(rowindex, '_index_dir', None)
+    rowindex.set_index_dir(str(tmp_path / 'rowidx'))
+
+def write_late_values(path, rows=30000):
+    # amount gains blanks and decimals, and code letters, after the first batch
+    amount = [str(i) for i in range(rows)]
+    amount[25000], amount[25001] = '', '2.5'
+    code = [str(i % 500) for i in range(rows)]
+    code[-1] = 'A1'
+    pd.DataFrame({'id': range(rows), 'amount': amount, 'code': code}).to_csv(path, index=False)
+    return str(path)
+
+def test_table_is_created_for_values_after_the_first_batch(tmp_path):
+    path = write_late_values(tmp_path / 'late.csv')
+
+    client = RecordingClient()
+    rows = make_manager(client).import_from_file(FlatFileManager(path), [], 't', create_table=True,
+                                                 batch_size=10000)
+    assert rows == 30000
+    assert '`id` Int64, `amount` Float64, `code` String' in client.queries[0]
+
+    # Every batch carries the table's types, not its own
+    amounts = [value for batch in client.inserts for value in batch[1]]
+    codes = [value for batch in client.inserts for value in batch[2]]
+    assert amounts[0] == 0.0 and isinstance(amounts[0], float)
+    assert math.isnan(amounts[25000]) and amounts[25001] == 2.5
+    assert codes[0] == '0' and codes[-1] == 'A1'
+
+def test_whole_file_dtypes_cover_every_byte_range(tmp_path):
+    path = write_late_values(tmp_path / 'late.csv')
+    ff = FlatFileManager(path)
+    index = ff.row_index()
+    first = (index.data_start, index.offsets[10])
+
+    # A range read alone is typed by its own rows
+    assert ff.chunk_dtypes(byte_range=first)['amount'] == 'int64'
+    assert ff.chunk_dtypes()['amount'] == 'float64'
+    assert ff.chunk_dtypes(byte_range=first)['amount'] == 'float64'
+    chunk = next(ff.iter_chunks(byte_range=first))
+    assert str(chunk['amount'].dtype) == 'float64' and chunk['code'].iloc[0] == '0'
+
+def test_server_parses_single_character_delimiters_of_any_codec(tmp_path):
+    path = tmp_path / 'data.csv.gz'
+    with gzip.open(path, 'wt') as f:
+        f.write('id;name\n1;a\n')
+    assert _server_insert_source(FlatFileManager(str(path), ';')) == ('CSVWithNames', {'format_csv_delimiter': ';'})
+
+    path = tmp_path / 'data.txt'
+    path.write_text('id||name\n1||a\n')
+    assert _server_insert_source(FlatFileManager(str(path), '||')) is None
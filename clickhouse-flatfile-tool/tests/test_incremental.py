@@ -0,0 +1,86 @@
+import datetime
+import os
+
+from fakes import make_manager
+from utils.flatfile import FlatFileManager
+from utils.state import StateStore
+
+def append(path, text):
+    with open(path, 'a', newline='') as f:
+        f.write(text)
+
+def read_range(ff, byte_range):
+    return [row for chunk in ff.iter_chunks(byte_range=byte_range) for row in chunk['id'].tolist()]
+
+def test_appended_rows_are_imported_once(tmp_path):
+    path = str(tmp_path / 'log.csv')
+    append(path, 'id,name\n1,a\n2,b\n3,')
+    ff = FlatFileManager(path)
+
+    # The unterminated row is still being written and waits for the next run
+    byte_range, checkpoint, reset = ff.appended_range()
+    assert not reset
+    assert read_range(ff, byte_range) == [1, 2]
+
+    append(path, 'c\n4,d\n')
+    byte_range, checkpoint, reset = ff.appended_range(checkpoint)
+    assert not reset
+    assert read_range(ff, byte_range) == [3, 4]
+
+    byte_range, _, _ = ff.appended_range(checkpoint)
+    assert byte_range[0] == byte_range[1]
+
+def test_rewritten_file_starts_over(tmp_path):
+    path = str(tmp_path / 'log.csv')
+    append(path, 'id,name\n1,a\n2,b\n')
+    ff = FlatFileManager(path)
+    _, checkpoint, _ = ff.appended_range()
+
+    with open(path, 'w', newline='') as f:
+        f.write('id,name\n7,x\n')
+    byte_range, _, reset = ff.appended_range(checkpoint)
+    assert reset
+    assert read_range(ff, byte_range) == [7]
+
+def test_checkpoints_survive_a_restart(tmp_path):
+    path = str(tmp_path / 'log.csv')
+    append(path, 'id,name\n1,a\n')
+    _, checkpoint, _ = FlatFileManager(path).appended_range()
+
+    state_dir = str(tmp_path / 'state')
+    StateStore(state_dir).set('import:log', checkpoint)
+    append(path, '2,b\n')
+
+    ff = FlatFileManager(path)
+    byte_range, _, reset = ff.appended_range(StateStore(state_dir).get('import:log'))
+    assert not reset
+    assert read_range(ff, byte_range) == [2]
+
+class BoundsClient:
+    def __init__(self, upper, count):
+        self.bounds = (upper, count)
+        self.queries = []
+
+    def execute(self, query, *args, **kwargs):
+        self.queries.append(query)
+        return [self.bounds]
+
+def test_export_reads_only_rows_above_the_watermark(tmp_path):
+    upper = datetime.datetime(2024, 5, 1, 12, 0, 0, 250000)
+    manager = make_manager(BoundsClient(upper, 3))
+    written = []
+    manager._write_query_to_file = lambda query, *args, **kwargs: written.append(query) or 3
+
+    rows, watermark = manager.export_incremental('events', [], str(tmp_path / 'out.csv'), 'ts',
+                                                 watermark='2024-04-30 00:00:00')
+    assert (rows, watermark) == (3, '2024-05-01 12:00:00.250000')
+    assert manager.client.queries == ["SELECT max(`ts`), count() FROM events WHERE `ts` > '2024-04-30 00:00:00'"]
+    assert written == ["SELECT * FROM events WHERE `ts` > '2024-04-30 00:00:00' "
+                       "AND `ts` <= '2024-05-01 12:00:00.250000'"]
+
+def test_export_without_new_rows_keeps_the_watermark(tmp_path):
+    manager = make_manager(BoundsClient(None, 0))
+    output_path = str(tmp_path / 'out.csv')
+
+    assert manager.export_incremental('events', [], output_path, 'id', watermark=41) == (0, 41)
+    assert not os.path.exists(output_path)
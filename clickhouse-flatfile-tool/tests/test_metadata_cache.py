@@ -0,0 +1,52 @@
+import pytest
+
+from fakes import make_manager
+from utils.clickhouse import metadata_cache
+
+class TablesClient:
+    def __init__(self, tables):
+        self.tables = tables
+        self.queries = []
+
+    def execute(self, query, values=None, **kwargs):
+        self.queries.append(query)
+        if query.startswith('SHOW TABLES'):
+            return [(table,) for table in self.tables]
+        if query.startswith('DESCRIBE TABLE'):
+            return [(name, 'String', '', '') for name in self.tables]
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    metadata_cache.clear()
+    yield
+    metadata_cache.clear()
+
+def test_tables_are_cached_per_user_and_token():
+    admin = make_manager(TablesClient(['public', 'secret']), user='admin')
+    reader = make_manager(TablesClient(['public']), user='reader')
+    token_reader = make_manager(TablesClient(['public']), user='admin', jwt_token='token')
+
+    assert admin.get_tables() == ['public', 'secret']
+    assert reader.get_tables() == ['public']
+    assert token_reader.get_tables() == ['public']
+
+    # A second lookup by the same credentials is served from the cache
+    assert admin.get_tables() == ['public', 'secret']
+    assert len(admin.client.queries) == 1
+
+def test_columns_are_cached_per_user():
+    admin = make_manager(TablesClient(['a', 'b']), user='admin')
+    reader = make_manager(TablesClient(['a']), user='reader')
+
+    assert [col['name'] for col in admin.get_columns('t')] == ['a', 'b']
+    assert [col['name'] for col in reader.get_columns('t')] == ['a']
+
+def test_creating_a_table_refreshes_every_users_table_list():
+    admin = make_manager(TablesClient(['old']), user='admin')
+    reader = make_manager(TablesClient(['old']), user='reader')
+    admin.get_tables()
+    reader.get_tables()
+
+    admin._create_table_from_columns([('id', 'Int64')], 'new')
+    reader.client.tables = ['new', 'old']
+    assert reader.get_tables() == ['new', 'old']
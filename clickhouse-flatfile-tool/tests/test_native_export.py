@@ -0,0 +1,43 @@
+import io
+import os
+
+import pytest
+
+from fakes import RecordingClient, make_manager
+from utils.metrics import TransferMetrics
+
+ROWS = b'id,name\n' + b''.join(b'%d,"name %d"\n' % (i, i) for i in range(5000))
+ERROR = b'Code: 241. DB::Exception: Memory limit (total) exceeded. (MEMORY_LIMIT_EXCEEDED) (version 23.8.1.1)\n'
+
+def native_manager(body):
+    manager = make_manager(RecordingClient())
+    manager._http_query = lambda query, settings=None, **kwargs: io.BytesIO(body)
+    return manager
+
+def test_native_export_writes_the_body(tmp_path):
+    path = str(tmp_path / 'out.csv')
+    rows = native_manager(ROWS)._stream_native_to_file('SELECT 1', path, TransferMetrics('export'))
+
+    assert rows == 5000
+    with open(path, 'rb') as f:
+        assert f.read() == ROWS
+
+def test_exception_after_the_header_fails_the_export(tmp_path):
+    path = str(tmp_path / 'out.csv')
+    with pytest.raises(ValueError, match='MEMORY_LIMIT_EXCEEDED'):
+        native_manager(ROWS + ERROR)._stream_native_to_file('SELECT 1', path, TransferMetrics('export'))
+    assert not os.path.exists(path)
+
+def test_exception_is_not_relayed_to_a_streamed_response():
+    chunks = native_manager(ROWS + ERROR)._stream_native('SELECT 1')
+    with pytest.raises(ValueError, match='MEMORY_LIMIT_EXCEEDED'):
+        for chunk in chunks:
+            assert b'DB::Exception' not in chunk
+
+def test_tsv_rejects_another_delimiter(tmp_path):
+    manager = native_manager(ROWS)
+    with pytest.raises(ValueError, match='tab-delimited'):
+        manager.export_to_file('t', [], str(tmp_path / 'out.tsv'), delimiter=',', export_mode='native',
+                               output_format='TSVWithNames')
+    with pytest.raises(ValueError, match='tab-delimited'):
+        manager.stream_export('t', [], delimiter=';', output_format='TSVWithNames')
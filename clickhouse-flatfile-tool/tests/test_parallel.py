@@ -0,0 +1,31 @@
+import pandas as pd
+import pytest
+
+from utils import flatfile
+from utils.flatfile import FlatFileManager
+
+@pytest.fixture
+def parallel(monkeypatch):
+    # Parse even a small file in ranges of 5000 rows
+    monkeypatch.setattr(flatfile, 'PARALLEL_MIN_BYTES', 0)
+    monkeypatch.setattr(flatfile, 'PARALLEL_CHUNK_ROWS', 5000)
+    monkeypatch.setattr(flatfile, 'PARALLEL_RANGE_BYTES', 1)
+
+def write_csv(path, rows):
+    with open(path, 'w') as f:
+        f.write('id,flag,name,score\n')
+        for i in range(rows):
+            # Only the second half has blank flags; only the last row has a text score
+            flag = '' if i >= rows // 2 and i % 7 == 0 else ('true' if i % 2 else 'false')
+            score = 'unknown' if i == rows - 1 else str(i * 0.5)
+            f.write(f'{i},{flag},name {i},{score}\n')
+
+def test_parallel_read_matches_serial(tmp_path, parallel):
+    path = str(tmp_path / 'data.csv')
+    write_csv(path, 20000)
+
+    serial = FlatFileManager(path).get_data()
+    parallel_read = FlatFileManager(path, parse_workers=2).get_data()
+
+    pd.testing.assert_frame_equal(parallel_read, serial)
+    assert set(parallel_read['flag'].dropna().map(type)) == {bool}
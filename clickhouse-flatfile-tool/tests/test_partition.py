@@ -0,0 +1,76 @@
+import contextlib
+import os
+
+import pytest
+
+from fakes import make_manager
+
+JOIN = {
+    'base_table': 'orders AS o',
+    'join_tables': ['customers AS c'],
+    'join_conditions': ['o.customer_id = c.id'],
+}
+
+class KeyClient:
+    def __init__(self, primary_key):
+        self.primary_key = primary_key
+        self.queries = []
+
+    def execute(self, query, params=None, **kwargs):
+        self.queries.append((query, params))
+        if 'system.tables' in query:
+            return [(self.primary_key,)]
+        if query.startswith('SELECT min('):
+            return [(0, 99)]
+
+def test_join_hash_partitions_qualify_the_primary_key():
+    client = KeyClient('id, created')
+    predicates = make_manager(client)._partition_predicates('orders AS o', 'hash', None, 2, is_join=True)
+
+    assert predicates == ['cityHash64(o.id, o.created) % 2 = 0', 'cityHash64(o.id, o.created) % 2 = 1']
+    assert client.queries[0][1] == {'database': 'db', 'table': 'orders'}
+
+def test_join_range_partitions_qualify_the_primary_key():
+    client = KeyClient('id, toDate(created)')
+    predicates = make_manager(client)._partition_predicates('orders', 'range', None, 2, is_join=True)
+
+    assert predicates[0] == 'toInt64(orders.id) >= 0 AND toInt64(orders.id) < 50'
+    assert client.queries[1][0] == 'SELECT min(toInt64(orders.id)), max(toInt64(orders.id)) FROM orders'
+
+def test_join_primary_key_expressions_need_a_partition_key():
+    manager = make_manager(KeyClient('toDate(created), id'))
+    with pytest.raises(ValueError, match='partition_key'):
+        manager._partition_predicates('orders AS o', 'hash', None, 2, is_join=True)
+
+def test_failed_parallel_export_removes_its_files(tmp_path):
+    output_path = str(tmp_path / 'out.csv')
+
+    def write_shard(query, shard_path, *args, **kwargs):
+        with open(shard_path, 'w') as f:
+            f.write('1\n')
+        if query.endswith('= 1'):
+            raise ValueError('shard failed')
+        return 1
+
+    @contextlib.contextmanager
+    def connection_factory():
+        worker = make_manager(KeyClient('id'))
+        worker._write_query_to_file = write_shard
+        yield worker
+
+    manager = make_manager(KeyClient('id'))
+    with pytest.raises(ValueError, match='shard failed'):
+        manager.export_parallel(connection_factory, 't', [], output_path, batch_size=100, workers=2)
+    assert os.listdir(tmp_path) == []
+
+def test_part_partitions_group_partition_ids_that_merges_keep():
+    class PartsClient(KeyClient):
+        def execute(self, query, params=None, **kwargs):
+            super().execute(query, params, **kwargs)
+            if 'system.parts' in query:
+                return [('202401',), ('202402',), ('202403',)]
+
+    client = PartsClient('id')
+    predicates = make_manager(client)._partition_predicates('orders', 'part', None, 2)
+    assert 'DISTINCT partition_id' in client.queries[0][0]
+    assert predicates == ["_partition_id IN ('202401', '202403')", "_partition_id IN ('202402')"]
@@ -0,0 +1,143 @@
+import threading
+import time
+
+import pytest
+
+from utils import pool
+from utils.pool import ClickHousePool
+
+class FakeClient:
+    def __init__(self):
+        self.queries = []
+        self.broken = False
+        self.disconnected = False
+
+    def execute(self, query, *args, **kwargs):
+        self.queries.append(query)
+        if self.broken:
+            raise EOFError('connection closed')
+
+    def disconnect(self):
+        self.disconnected = True
+
+class FakeManager:
+    created = []
+
+    def __init__(self, host, port, database, user, jwt_token=None, **options):
+        self.key = (host, port, database, user, jwt_token)
+        self.client = FakeClient()
+        FakeManager.created.append(self)
+
+@pytest.fixture(autouse=True)
+def fake_manager(monkeypatch):
+    FakeManager.created = []
+    monkeypatch.setattr(pool, 'ClickHouseManager', FakeManager)
+
+ARGS = ('h', 9000, 'db', 'u')
+
+def test_returned_connections_are_reused_per_key():
+    ch_pool = ClickHousePool()
+    with ch_pool.connection(*ARGS) as first:
+        pass
+    with ch_pool.connection(*ARGS) as second:
+        assert second is first
+    with ch_pool.connection(*ARGS, jwt_token='token') as other:
+        assert other is not first
+    assert len(FakeManager.created) == 2
+
+def test_exhausted_pool_blocks_until_a_connection_is_returned():
+    ch_pool = ClickHousePool(max_size=2, acquire_timeout=5)
+    held = [ch_pool.acquire(*ARGS), ch_pool.acquire(*ARGS)]
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(ch_pool.acquire(*ARGS)))
+    waiter.start()
+
+    time.sleep(0.1)
+    assert acquired == []
+    ch_pool.release(held[0])
+    waiter.join(timeout=5)
+    assert acquired == [held[0]]
+    assert len(FakeManager.created) == 2
+
+def test_exhausted_pool_times_out():
+    ch_pool = ClickHousePool(max_size=1, acquire_timeout=0.1)
+    ch_pool.acquire(*ARGS)
+    with pytest.raises(TimeoutError):
+        ch_pool.acquire(*ARGS)
+
+def test_connection_that_failed_is_discarded():
+    ch_pool = ClickHousePool(max_size=1)
+    with pytest.raises(EOFError):
+        with ch_pool.connection(*ARGS) as broken:
+            broken.client.execute('SELECT 1')
+            raise EOFError('connection closed')
+    assert broken.client.disconnected
+
+    # The discarded connection frees its slot for a new one
+    with ch_pool.connection(*ARGS) as manager:
+        assert manager is not broken
+
+def test_other_errors_return_the_connection():
+    ch_pool = ClickHousePool()
+    with pytest.raises(ValueError):
+        with ch_pool.connection(*ARGS) as manager:
+            raise ValueError('bad query')
+    with ch_pool.connection(*ARGS) as again:
+        assert again is manager and not manager.client.disconnected
+
+def test_idle_connection_is_health_checked_and_replaced_when_broken():
+    ch_pool = ClickHousePool(health_check_interval=-1)
+    with ch_pool.connection(*ARGS) as healthy:
+        pass
+    with ch_pool.connection(*ARGS) as manager:
+        assert manager is healthy
+    assert healthy.client.queries == ['SELECT 1']
+
+    healthy.client.broken = True
+    with ch_pool.connection(*ARGS) as manager:
+        assert manager is not healthy
+    assert healthy.client.disconnected
+
+def test_recently_used_connection_skips_the_health_check():
+    ch_pool = ClickHousePool(health_check_interval=60)
+    with ch_pool.connection(*ARGS) as first:
+        pass
+    with ch_pool.connection(*ARGS):
+        pass
+    assert first.client.queries == []
+
+def test_connections_idle_too_long_are_closed():
+    ch_pool = ClickHousePool(idle_timeout=-1)
+    with ch_pool.connection(*ARGS) as stale:
+        pass
+    with ch_pool.connection(*ARGS) as manager:
+        assert manager is not stale
+    assert stale.client.disconnected
+
+def test_concurrent_checkouts_stay_within_max_size():
+    ch_pool = ClickHousePool(max_size=3, acquire_timeout=5)
+    lock = threading.Lock()
+    state = {'in_use': 0, 'peak': 0, 'done': 0}
+
+    def borrow():
+        for _ in range(5):
+            with ch_pool.connection(*ARGS):
+                with lock:
+                    state['in_use'] += 1
+                    state['peak'] = max(state['peak'], state['in_use'])
+                time.sleep(0.005)
+                with lock:
+                    state['in_use'] -= 1
+        with lock:
+            state['done'] += 1
+
+    threads = [threading.Thread(target=borrow) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert state['done'] == 8
+    assert state['peak'] <= 3
+    assert len(FakeManager.created) <= 3
+    assert ch_pool._size(ch_pool.make_key(*ARGS)) == len(FakeManager.created)
@@ -0,0 +1,94 @@
+import pandas as pd
+import pytest
+
+from fakes import RecordingClient, make_manager
+from utils import clickhouse
+from utils.clickhouse import metadata_cache, preview_cache
+from utils.flatfile import FlatFileManager
+
+class PreviewClient(RecordingClient):
+    def execute(self, query, values=None, with_column_types=False, **kwargs):
+        if with_column_types:
+            self.queries.append(query)
+            return [(1,)], [('id', 'Int64')]
+        return super().execute(query, values, **kwargs)
+
+JOIN = {
+    'base_table': 'customers AS c',
+    'join_tables': ['db.events AS e'],
+    'join_conditions': ['c.id = e.customer_id'],
+}
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    preview_cache.clear()
+    metadata_cache.clear()
+    yield
+    preview_cache.clear()
+    metadata_cache.clear()
+
+def previews(manager):
+    # Each preview is cached on its first call
+    manager.preview_data('events')
+    manager.preview_data('other')
+    manager.preview_join_data(JOIN)
+    return len(manager.client.queries)
+
+def test_import_drops_only_previews_of_its_table(tmp_path):
+    path = tmp_path / 'events.csv'
+    pd.DataFrame({'id': range(30)}).to_csv(path, index=False)
+
+    importer = make_manager(PreviewClient(), user='loader')
+    reader = make_manager(PreviewClient(), user='reader')
+    elsewhere = make_manager(PreviewClient(), user='reader')
+    elsewhere.host = 'other-host'
+    for manager in (importer, reader, elsewhere):
+        assert previews(manager) == 3
+
+    importer.import_from_file(FlatFileManager(str(path)), [], 'events', batch_size=10)
+
+    # The table and the join reading it are queried again, for every user
+    assert previews(reader) == 5
+    assert reader.client.queries[3:] == ['SELECT * FROM events LIMIT 100',
+                                         reader.client.queries[2]]
+    # Previews of other servers stay cached
+    assert previews(elsewhere) == 3
+
+def test_previews_are_invalidated_once_per_import(tmp_path, monkeypatch):
+    path = tmp_path / 'events.csv'
+    pd.DataFrame({'id': range(30)}).to_csv(path, index=False)
+    calls = []
+    monkeypatch.setattr(preview_cache, 'invalidate_where', calls.append)
+
+    client = PreviewClient()
+    make_manager(client).import_from_file(FlatFileManager(str(path)), [], 'events', batch_size=10)
+    assert len(client.inserts) == 3
+    assert len(calls) == 1
+
+def test_failed_import_still_invalidates(tmp_path):
+    path = tmp_path / 'events.csv'
+    pd.DataFrame({'id': range(30)}).to_csv(path, index=False)
+    reader = make_manager(PreviewClient())
+    previews(reader)
+
+    class FailingClient(PreviewClient):
+        def execute(self, query, values=None, **kwargs):
+            if values is not None and self.inserts:
+                raise ConnectionError('insert failed')
+            return super().execute(query, values, **kwargs)
+
+    with pytest.raises(ConnectionError):
+        make_manager(FailingClient()).import_from_file(FlatFileManager(str(path)), [], 'events', batch_size=10)
+    assert previews(reader) == 5
+
+def test_join_preview_samples_an_aliased_base_table():
+    class SamplingClient(PreviewClient):
+        def execute(self, query, values=None, with_column_types=False, **kwargs):
+            if 'system.tables' in query:
+                self.queries.append((query, values))
+                return [('intHash32(id)',)] if values == {'database': 'db', 'name': 'customers'} else [('',)]
+            return super().execute(query, values, with_column_types, **kwargs)
+
+    client = SamplingClient()
+    make_manager(client).preview_join_data(JOIN, sample=0.1)
+    assert client.queries[-1].startswith('SELECT * FROM customers AS c SAMPLE 0.1 JOIN db.events AS e')
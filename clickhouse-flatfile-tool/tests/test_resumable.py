@@ -0,0 +1,124 @@
+import csv
+import re
+
+import pytest
+
+from fakes import make_manager
+from utils import clickhouse
+from utils.flatfile import FlatFileManager
+from utils.state import Checkpoint, StateStore
+
+DEDUPLICATING_TABLE = ('MergeTree', 'MergeTree ORDER BY tuple() SETTINGS non_replicated_deduplication_window = 100')
+PLAIN_TABLE = ('MergeTree', 'MergeTree ORDER BY tuple()')
+
+class InsertClient:
+    """
+    Records inserted ids, dropping a batch whose deduplication token was
+    seen before; the insert number fail_at is committed, then raises.
+    """
+    def __init__(self, table=DEDUPLICATING_TABLE, fail_at=None, stored=None, tokens=None):
+        self.table = table
+        self.fail_at = fail_at
+        self.inserts = 0
+        self.stored = stored if stored is not None else []
+        self.tokens = tokens if tokens is not None else set()
+
+    def execute(self, query, values=None, settings=None, **kwargs):
+        if 'system.tables' in query:
+            return [self.table]
+        if 'system.merge_tree_settings' in query:
+            return [('0',)]
+        if values is None:
+            return []
+
+        self.inserts += 1
+        token = settings['insert_deduplication_token']
+        if token not in self.tokens:
+            self.tokens.add(token)
+            self.stored.extend(values[0])
+        if self.inserts == self.fail_at:
+            raise ConnectionError('connection lost after commit')
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    return Checkpoint(StateStore(str(tmp_path / 'state')), 'resume-import:data')
+
+def write_ids(path, rows):
+    with open(path, 'w') as f:
+        f.write('id\n' + ''.join(f'{i}\n' for i in range(rows)))
+    return str(path)
+
+def test_import_resumes_after_a_failure_without_duplicates(tmp_path, checkpoint):
+    ff = FlatFileManager(write_ids(tmp_path / 'data.csv', 3000))
+
+    first = InsertClient(fail_at=2)
+    with pytest.raises(ConnectionError):
+        make_manager(first).import_resumable(ff, [], 't', checkpoint, batch_size=1000)
+    assert checkpoint.load()['rows'] == 1000
+
+    # The second batch was committed but not checkpointed, so it is sent again
+    second = InsertClient(stored=first.stored, tokens=first.tokens)
+    rows = make_manager(second).import_resumable(FlatFileManager(ff.filepath), [], 't', checkpoint, batch_size=1000)
+    assert rows == 2000
+    assert second.inserts == 2
+    assert sorted(second.stored) == list(range(3000))
+    assert checkpoint.load() is None
+
+def test_import_rejects_a_table_that_does_not_deduplicate(tmp_path, checkpoint):
+    ff = FlatFileManager(write_ids(tmp_path / 'data.csv', 10))
+    client = InsertClient(table=PLAIN_TABLE)
+
+    with pytest.raises(ValueError, match='non_replicated_deduplication_window'):
+        make_manager(client).import_resumable(ff, [], 't', checkpoint)
+    assert client.inserts == 0
+
+class OrderedClient:
+    """
+    Serves (id, name, key) rows in key order, above the key in the query's
+    WHERE clause; the stream breaks after fail_after blocks.
+    """
+    def __init__(self, rows, fail_after=None):
+        self.rows = rows
+        self.fail_after = fail_after
+        self.queries = []
+
+    def execute(self, query, *args, **kwargs):
+        return [], [('id', 'Int64'), ('name', 'String'), ('_resume_key', 'Int64')]
+
+    def execute_iter(self, query, settings=None, chunk_size=1):
+        self.queries.append(query)
+        above = re.search(r'WHERE `key` > (\d+)', query)
+        rows = [row for row in self.rows if above is None or row[-1] > int(above.group(1))]
+        for number, start in enumerate(range(0, len(rows), chunk_size)):
+            if number == self.fail_after:
+                raise ConnectionError('connection lost mid-stream')
+            yield rows[start:start + chunk_size]
+
+    def disconnect(self):
+        pass
+
+def test_export_resumes_after_a_failure(tmp_path, checkpoint):
+    # Keys repeat, so blocks end in the middle of a key
+    rows = [(i, f'name {i}', i // 3) for i in range(100)]
+    output_path = str(tmp_path / 'out.csv')
+
+    with pytest.raises(ConnectionError):
+        make_manager(OrderedClient(rows, fail_after=2)).export_resumable(
+            't', [], output_path, 'key', checkpoint, batch_size=10)
+    assert checkpoint.load()['key'] == 5
+
+    client = OrderedClient(rows)
+    written = make_manager(client).export_resumable('t', [], output_path, 'key', checkpoint, batch_size=10)
+    assert 'WHERE `key` > 5' in client.queries[0]
+    assert written == 82
+    with open(output_path, newline='') as f:
+        assert list(csv.reader(f)) == [['id', 'name']] + [[str(i), f'name {i}'] for i in range(100)]
+    assert checkpoint.load() is None
+
+def test_export_fails_when_too_many_rows_share_a_key(tmp_path, checkpoint, monkeypatch):
+    monkeypatch.setattr(clickhouse, 'RESUME_MAX_HELD_ROWS', 15)
+    rows = [(i, 'same', 1) for i in range(50)]
+
+    with pytest.raises(ValueError, match='more selective'):
+        make_manager(OrderedClient(rows)).export_resumable('t', [], str(tmp_path / 'out.csv'), 'key',
+                                                           checkpoint, batch_size=10)
@@ -0,0 +1,115 @@
+import pandas as pd
+import pytest
+
+from utils import rowindex
+from utils.flatfile import FlatFileManager
+from utils.rowindex import RowIndex, first_row_end
+
+@pytest.fixture(autouse=True)
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(rowindex, '_index_dir', None)
+    rowindex.set_index_dir(str(tmp_path / 'rowidx'))
+
+def write(path, text, newline='\n'):
+    with open(path, 'wb') as f:
+        f.write(text.replace('\n', newline).encode('utf-8'))
+    return str(path)
+
+def checkpoints(text, every, newline='\n'):
+    """
+    Offsets just past the header and every every-th non-empty data row
+    before the last one, found one byte at a time.
+    """
+    data = text.replace('\n', newline).encode('utf-8')
+    ends, start, quoted = [], 0, False
+    for position, byte in enumerate(data):
+        if byte == ord('"'):
+            quoted = not quoted
+        elif byte == ord('\n') and not quoted:
+            if data[start:position + 1] not in (b'\n', b'\r\n'):
+                ends.append(position + 1)
+            start = position + 1
+    return ends[:-1][::every]
+
+@pytest.mark.parametrize('newline', ['\n', '\r\n'])
+def test_offsets_point_at_every_checkpoint_row(tmp_path, newline):
+    text = 'id,name\n' + ''.join(f'{i},"row\n{i}"\n' for i in range(25))
+    path = write(tmp_path / 'quoted.csv', text, newline)
+
+    index = RowIndex.build(path, checkpoint_rows=10)
+    assert index.row_count == 25
+    assert index.offsets == checkpoints(text, 10, newline)
+    assert index.data_start == len('id,name' + newline)
+
+@pytest.mark.parametrize('newline', ['\n', '\r\n'])
+def test_empty_lines_are_not_rows(tmp_path, newline):
+    lines = ['', 'id,name'] + [f'{i},n{i}' + ('\n' if i % 3 == 0 else '') for i in range(25)] + ['']
+    text = '\n'.join(lines) + '\n'
+    path = write(tmp_path / 'blank.csv', text, newline)
+
+    index = RowIndex.build(path, checkpoint_rows=10)
+    assert index.row_count == len(pd.read_csv(path)) == 25
+    assert index.offsets == checkpoints(text, 10, newline)
+    assert first_row_end(path) == len(('\nid,name\n').replace('\n', newline))
+
+def test_unterminated_last_row_is_counted(tmp_path):
+    path = write(tmp_path / 'tail.csv', 'id\n1\n2')
+    assert RowIndex.build(path).row_count == 2
+
+def test_preview_offsets_skip_empty_lines(tmp_path):
+    text = 'id\n' + ''.join(f'{i}\n\n' if i % 4 == 0 else f'{i}\n' for i in range(2500))
+    path = write(tmp_path / 'preview.csv', text)
+
+    # Past the second checkpoint, with empty lines before and after it
+    rows = FlatFileManager(path).preview_data(offset=2003, limit=5)
+    assert [row['id'] for row in rows] == [2003, 2004, 2005, 2006, 2007]
+
+def test_sidecar_lives_in_the_index_dir(tmp_path):
+    path = write(tmp_path / 'data.csv', 'id\n1\n2\n')
+    index = RowIndex.load_or_build(path)
+
+    assert RowIndex.sidecar_path(path).startswith(str(tmp_path / 'rowidx'))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['data.csv', 'rowidx']
+    assert RowIndex.load(path).offsets == index.offsets
+
+    write(tmp_path / 'data.csv', 'id\n1\n2\n3\n')
+    assert RowIndex.load(path) is None
+
+def rows_at_checkpoints(path, index, delimiter=','):
+    """
+    The first field of the row each checkpoint offset points at, parsed by pandas.
+    """
+    firsts = []
+    with open(path, 'rb') as f:
+        for offset in index.offsets:
+            f.seek(offset)
+            firsts.append(pd.read_csv(f, sep=delimiter, header=None, nrows=1, dtype=str).iloc[0, 0])
+    return firsts
+
+@pytest.mark.parametrize('delimiter', [',', '\t'])
+def test_quotes_inside_values_are_literal(tmp_path, delimiter):
+    # Only a quote at the start of a field opens a quoted field
+    values = ['5" screen', '"a\nb"', '"say ""hi""\n"', '"x' + delimiter + '"', 'plain', '""', '12"']
+    text = f'id{delimiter}note\n' + ''.join(f'{i}{delimiter}{values[i % len(values)]}\n' for i in range(40))
+    path = write(tmp_path / 'inches.csv', text)
+
+    index = RowIndex.build(path, checkpoint_rows=3, delimiter=delimiter)
+    assert index.row_count == len(pd.read_csv(path, sep=delimiter)) == 40
+    assert rows_at_checkpoints(path, index, delimiter) == [str(row) for row in range(0, 40, 3)]
+    assert FlatFileManager(path, delimiter).count_rows() == 40
+
+def test_quote_state_carries_across_scan_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(rowindex, 'SCAN_BLOCK_SIZE', 7)
+    text = 'id,note\n' + ''.join(f'{i},{note}\n' for i, note in
+                                 enumerate(['1" pipe', '"long\nquoted, text"', '"""q"""', '"a""\n""b"'] * 10))
+    path = write(tmp_path / 'blocks.csv', text)
+
+    index = RowIndex.build(path, checkpoint_rows=4)
+    assert index.row_count == len(pd.read_csv(path)) == 40
+    assert rows_at_checkpoints(path, index) == [str(row) for row in range(0, 40, 4)]
+
+def test_index_is_rebuilt_for_another_delimiter(tmp_path):
+    path = write(tmp_path / 'data.csv', 'id;note\n1;"a;\n"\n2;b\n')
+    RowIndex.load_or_build(path)
+    assert RowIndex.load(path, ';') is None
+    assert RowIndex.load_or_build(path, delimiter=';').row_count == 2
@@ -0,0 +1,29 @@
+import pytest
+
+from utils import rowindex
+from utils.flatfile import FlatFileManager, schema_cache
+
+@pytest.fixture(autouse=True)
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(rowindex, '_index_dir', None)
+    rowindex.set_index_dir(str(tmp_path / 'rowidx'))
+    schema_cache.clear()
+
+def test_strata_start_on_record_boundaries(tmp_path):
+    # Notes span lines, and their middle line looks like a row of text
+    # values; amounts only turn fractional past the head sample
+    rows = [f'{i},"note\n{"x" * 200},more,text\nend",{i if i < 1500 else i + 0.5}\n' for i in range(4000)]
+    path = tmp_path / 'notes.csv'
+    path.write_text('id,note,amount\n' + ''.join(rows))
+
+    columns = FlatFileManager(str(path)).get_columns(sample_rows=1000, strata=4)
+    assert [(col['name'], col['type']) for col in columns] == [
+        ('id', 'Int16'), ('note', 'String'), ('amount', 'Float64')]
+
+def test_strata_read_the_rows_they_land_on(tmp_path):
+    path = tmp_path / 'rows.csv'
+    path.write_text('id,note\n' + ''.join(f'{i},"a\nb"\n' for i in range(5000)))
+
+    sample = FlatFileManager(str(path))._read_sample(sample_rows=1000, strata=4)
+    ids = sample['id'].astype(int).tolist()
+    assert ids == list(range(1000)) + [row for start in (1000, 2000, 3000, 4000) for row in range(start, start + 250)]
@@ -0,0 +1,51 @@
+import json
+import os
+
+from utils.state import Checkpoint, StateStore
+
+def test_values_round_trip_through_a_new_store(tmp_path):
+    directory = str(tmp_path / 'keys')
+    store = StateStore(directory)
+    store.set('export:h:9000/db/events:ts', {'value': '2024-05-01 12:00:00'})
+    store.set('import:h:9000/db/log.csv', {'offset': 120})
+
+    reopened = StateStore(directory)
+    assert reopened.get('export:h:9000/db/events:ts') == {'value': '2024-05-01 12:00:00'}
+    assert reopened.get('missing', 'default') == 'default'
+    assert reopened.items('import:') == [('import:h:9000/db/log.csv', {'offset': 120})]
+
+    assert reopened.delete('import:h:9000/db/log.csv')
+    assert not reopened.delete('import:h:9000/db/log.csv')
+    assert StateStore(directory).items() == [('export:h:9000/db/events:ts', {'value': '2024-05-01 12:00:00'})]
+
+def test_each_key_is_written_to_its_own_file(tmp_path):
+    directory = str(tmp_path / 'keys')
+    store = StateStore(directory)
+    store.set('a', 1)
+    before = {name: os.stat(os.path.join(directory, name)).st_mtime_ns for name in os.listdir(directory)}
+
+    store.set('b', 2)
+    after = {name: os.stat(os.path.join(directory, name)).st_mtime_ns for name in os.listdir(directory)}
+    assert len(after) == 2
+    assert all(after[name] == mtime for name, mtime in before.items())
+
+def test_legacy_single_file_store_is_migrated(tmp_path):
+    legacy_path = str(tmp_path / 'state.json')
+    with open(legacy_path, 'w') as f:
+        json.dump({'a': {'offset': 1}, 'b': 2}, f)
+
+    store = StateStore(str(tmp_path / 'keys'), legacy_path=legacy_path)
+    assert store.items() == [('a', {'offset': 1}), ('b', 2)]
+    assert not os.path.exists(legacy_path)
+
+def test_checkpoint_save_load_clear(tmp_path):
+    store = StateStore(str(tmp_path / 'keys'))
+    checkpoint = Checkpoint(store, 'resume-import:log')
+    assert checkpoint.load() is None
+
+    checkpoint.save({'offset': 10, 'rows': 3})
+    state = Checkpoint(StateStore(str(tmp_path / 'keys')), 'resume-import:log').load()
+    assert state['offset'] == 10 and state['rows'] == 3 and 'updated_at' in state
+
+    checkpoint.clear()
+    assert checkpoint.load() is None
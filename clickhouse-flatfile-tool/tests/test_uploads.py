@@ -0,0 +1,100 @@
+import hashlib
+
+import pytest
+
+from utils import rowindex
+from utils.uploads import ChunkedUploadManager
+
+# Importing the app points row indexes at its uploads directory; keep other tests' setting
+_index_dir = rowindex._index_dir
+import app as app_module
+rowindex._index_dir = _index_dir
+
+DATA = b'id,name\n' + b''.join(b'%d,name%d\n' % (i, i) for i in range(10))
+CHUNK_SIZE = 40
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    monkeypatch.setattr(app_module, 'upload_manager', ChunkedUploadManager(str(tmp_path)))
+    monkeypatch.setattr(rowindex, '_index_dir', None)
+    rowindex.set_index_dir(str(tmp_path / 'rowidx'))
+    return app_module.app.test_client()
+
+def chunk(index):
+    return DATA[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE]
+
+def start(client):
+    response = client.post('/api/upload/flatfile/chunked',
+                           json={'filename': 'people.csv', 'total_size': len(DATA), 'chunk_size': CHUNK_SIZE})
+    assert response.status_code == 200
+    assert response.json['total_chunks'] == 3
+    return response.json['upload_id']
+
+def put(client, upload_id, index, body=None, digest=None):
+    body = chunk(index) if body is None else body
+    digest = hashlib.sha256(body).hexdigest() if digest is None else digest
+    return client.put(f'/api/upload/flatfile/chunked/{upload_id}/{index}', data=body,
+                      headers={'X-Chunk-SHA256': digest})
+
+def missing(client, upload_id):
+    response = client.get(f'/api/upload/flatfile/chunked/{upload_id}')
+    assert response.status_code == 200
+    return response.json['upload']['missing_chunks']
+
+def test_upload_resumes_from_its_status(client, tmp_path):
+    upload_id = start(client)
+    assert put(client, upload_id, 2).status_code == 200
+    assert put(client, upload_id, 0).status_code == 200
+
+    # A client that lost track of its upload sends only what is missing
+    assert missing(client, upload_id) == [1]
+    assert put(client, upload_id, 1).status_code == 200
+    assert missing(client, upload_id) == []
+
+    response = client.post(f'/api/upload/flatfile/chunked/{upload_id}/finalize', json={})
+    assert response.status_code == 200
+    assert response.json['total_rows'] == 10
+    assert (tmp_path / 'people.csv').read_bytes() == DATA
+    assert client.get(f'/api/upload/flatfile/chunked/{upload_id}').status_code == 404
+
+def test_chunk_with_a_wrong_digest_is_not_marked_received(client):
+    upload_id = start(client)
+    response = put(client, upload_id, 0, digest=hashlib.sha256(b'other').hexdigest())
+    assert response.status_code == 400
+    assert 'Checksum mismatch for chunk 0' in response.json['message']
+    assert missing(client, upload_id) == [0, 1, 2]
+
+    # Sending it again with the right digest is accepted
+    response = put(client, upload_id, 0)
+    assert response.status_code == 200
+    assert response.json['sha256'] == hashlib.sha256(chunk(0)).hexdigest()
+    assert missing(client, upload_id) == [1, 2]
+
+def test_chunk_index_out_of_range_is_rejected(client):
+    upload_id = start(client)
+    response = put(client, upload_id, 3, body=b'x')
+    assert response.status_code == 400
+    assert 'out of range 0-2' in response.json['message']
+    assert missing(client, upload_id) == [0, 1, 2]
+
+def test_chunk_of_the_wrong_size_is_rejected(client):
+    upload_id = start(client)
+    assert 'larger than' in put(client, upload_id, 2, body=chunk(2) + b'x').json['message']
+    assert 'incomplete' in put(client, upload_id, 0, body=chunk(0)[:-1]).json['message']
+    assert missing(client, upload_id) == [0, 1, 2]
+
+def test_finalize_with_missing_chunks_keeps_the_upload(client, tmp_path):
+    upload_id = start(client)
+    put(client, upload_id, 0)
+    put(client, upload_id, 2)
+
+    response = client.post(f'/api/upload/flatfile/chunked/{upload_id}/finalize', json={})
+    assert response.status_code == 400
+    assert 'missing 1 chunk(s), first missing: 1' in response.json['message']
+    assert not (tmp_path / 'people.csv').exists()
+    assert missing(client, upload_id) == [1]
+
+def test_unknown_upload_id_is_not_found(client):
+    assert client.get('/api/upload/flatfile/chunked/' + '0' * 32).status_code == 404
+    assert put(client, '0' * 32, 0).status_code == 404
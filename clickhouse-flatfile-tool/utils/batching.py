@@ -0,0 +1,185 @@
+import re
+import threading
+
+import pandas as pd
+
+# In-memory size aimed at per insert batch; each insert becomes one part
+# on the server, so fewer, larger inserts mean less merge work
+TARGET_BATCH_BYTES = 32 * 1024 * 1024
+
+# Uncompressed size aimed at per block fetched by exports
+TARGET_BLOCK_BYTES = 8 * 1024 * 1024
+
+# Bounds on the rows of an insert batch or export block
+MIN_BATCH_ROWS = 1000
+MAX_BATCH_ROWS = 1000000
+
+# Insert latency band; slower inserts shrink the batches, faster ones grow them
+TARGET_INSERT_SECONDS = (0.5, 5.0)
+
+# Rows parsed at a time before being regrouped into insert batches
+PARSE_CHUNK_ROWS = 10000
+
+# Assumed size of a String or other variable-length value
+VARIABLE_WIDTH_BYTES = 32
+
+# Sizes of fixed-width ClickHouse values
+FIXED_WIDTH_BYTES = {
+    'Bool': 1,
+    'Int8': 1,
+    'UInt8': 1,
+    'Int16': 2,
+    'UInt16': 2,
+    'Date': 2,
+    'Int32': 4,
+    'UInt32': 4,
+    'Float32': 4,
+    'Date32': 4,
+    'DateTime': 4,
+    'IPv4': 4,
+    'Int64': 8,
+    'UInt64': 8,
+    'Float64': 8,
+    'DateTime64': 8,
+    'UUID': 16,
+    'IPv6': 16,
+    'Decimal': 16,
+    'Decimal32': 4,
+    'Decimal64': 8,
+    'Decimal128': 16,
+    'Decimal256': 32,
+    'Int128': 16,
+    'UInt128': 16,
+    'Int256': 32,
+    'UInt256': 32,
+}
+
+class AdaptiveBatcher:
+    def __init__(self, target_bytes=TARGET_BATCH_BYTES, min_rows=MIN_BATCH_ROWS, max_rows=MAX_BATCH_ROWS,
+                 target_seconds=TARGET_INSERT_SECONDS):
+        """
+        Regroup parsed DataFrame chunks into insert batches sized by bytes
+        rather than rows, and adjust that size to the measured insert time.
+
+        The first chunk gives the in-memory bytes per row, which sets the
+        rows per batch for target_bytes. Each insert reports its time to
+        record(): inserts slower than target_seconds halve the byte target,
+        full batches inserted faster than it grow the target by half. Batch
+        rows always stay between min_rows and max_rows.
+        """
+        self.target_bytes = target_bytes
+        self.min_rows = min_rows
+        self.max_rows = max_rows
+        self.target_seconds = target_seconds
+        self.bytes_per_row = None
+        self.batch_rows = min_rows
+        self.batches = 0
+        self.rows = 0
+        self.insert_seconds = 0.0
+        self.smallest_batch_rows = None
+        self.largest_batch_rows = None
+        self._lock = threading.Lock()
+
+    def rebatch(self, chunks):
+        """
+        Yield DataFrames of batch_rows rows (fewer for the last one) built
+        from the DataFrames in chunks.
+        """
+        pending = []
+        pending_rows = 0
+        yielded = False
+        empty = None
+        for chunk in chunks:
+            if len(chunk) == 0:
+                empty = chunk
+                continue
+            if self.bytes_per_row is None:
+                self._measure(chunk)
+            pending.append(chunk)
+            pending_rows += len(chunk)
+
+            while pending_rows >= self.batch_rows:
+                frame = pd.concat(pending, ignore_index=True) if len(pending) > 1 else pending[0]
+                rows = self.batch_rows
+                yield frame.iloc[:rows]
+                yielded = True
+                rest = frame.iloc[rows:]
+                pending = [rest] if len(rest) else []
+                pending_rows = len(rest)
+
+        if pending:
+            yield pd.concat(pending, ignore_index=True) if len(pending) > 1 else pending[0]
+        elif not yielded and empty is not None:
+            # A file without rows still tells the caller its columns
+            yield empty
+
+    def record(self, rows, seconds):
+        """
+        Account for one insert of rows that took seconds, resizing later batches.
+        """
+        with self._lock:
+            self.batches += 1
+            self.rows += rows
+            self.insert_seconds += seconds
+            self.smallest_batch_rows = min(self.smallest_batch_rows or rows, rows)
+            self.largest_batch_rows = max(self.largest_batch_rows or rows, rows)
+
+            low, high = self.target_seconds
+            if seconds > high and self.batch_rows > self.min_rows:
+                self.target_bytes /= 2
+            elif seconds < low and rows >= self.batch_rows and self.batch_rows < self.max_rows:
+                self.target_bytes *= 1.5
+            else:
+                return
+            self._resize()
+
+    def summary(self):
+        """
+        The sizes chosen over the transfer, for job results.
+        """
+        with self._lock:
+            return {
+                'adaptive': True,
+                'batch_rows': self.batch_rows,
+                'smallest_batch_rows': self.smallest_batch_rows,
+                'largest_batch_rows': self.largest_batch_rows,
+                'bytes_per_row': round(self.bytes_per_row, 1) if self.bytes_per_row else None,
+                'target_bytes': int(self.target_bytes),
+                'batches': self.batches,
+                'mean_insert_seconds': round(self.insert_seconds / self.batches, 3) if self.batches else 0,
+            }
+
+    def _measure(self, chunk):
+        self.bytes_per_row = max(float(chunk.memory_usage(index=False, deep=True).sum()) / len(chunk), 1.0)
+        self._resize()
+
+    def _resize(self):
+        if self.bytes_per_row:
+            self.batch_rows = min(max(int(self.target_bytes / self.bytes_per_row), self.min_rows), self.max_rows)
+
+def estimate_row_width(column_types):
+    """
+    Estimate the uncompressed bytes of one row from its ClickHouse column types.
+    """
+    width = 0
+    for ch_type in column_types:
+        match = re.fullmatch(r'(Nullable|LowCardinality)\((.*)\)', ch_type)
+        while match:
+            # Nullable values carry a null flag byte
+            width += 1 if match.group(1) == 'Nullable' else 0
+            ch_type = match.group(2)
+            match = re.fullmatch(r'(Nullable|LowCardinality)\((.*)\)', ch_type)
+
+        fixed = re.fullmatch(r'FixedString\((\d+)\)', ch_type)
+        if fixed:
+            width += int(fixed.group(1))
+        else:
+            width += FIXED_WIDTH_BYTES.get(ch_type.split('(')[0], VARIABLE_WIDTH_BYTES)
+    return max(width, 1)
+
+def block_rows(column_types, target_bytes=TARGET_BLOCK_BYTES, min_rows=MIN_BATCH_ROWS, max_rows=MAX_BATCH_ROWS):
+    """
+    Rows per export block for result columns of column_types, so a block
+    holds about target_bytes.
+    """
+    return min(max(target_bytes // estimate_row_width(column_types), min_rows), max_rows)
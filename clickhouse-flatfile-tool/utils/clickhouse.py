@@ -1,17 +1,146 @@
 import csv
+import datetime
+import hashlib
+import io
+import json
+import os
+import queue
+import re
+import shutil
+import threading
 import time
+import urllib.error
+import uuid
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from clickhouse_driver import Client
 
+from .batching import PARSE_CHUNK_ROWS, AdaptiveBatcher, block_rows
+from .cache import TTLCache
+from .columnar import COLUMNAR_EXPORT_FORMATS, ROW_GROUP_SIZE, ColumnarWriter, count_rows as count_columnar_rows
+from .compression import wrap_writer
+from .flatfile import FlatFileManager
+from .metrics import TransferMetrics
+
+# Map pandas dtypes to ClickHouse types
+PANDAS_TO_CLICKHOUSE_TYPES = {
+    'int64': 'Int64',
+    'int32': 'Int32',
+    'int16': 'Int16',
+    'int8': 'Int8',
+    'uint64': 'UInt64',
+    'uint32': 'UInt32',
+    'uint16': 'UInt16',
+    'uint8': 'UInt8',
+    'float64': 'Float64',
+    'float32': 'Float32',
+    'bool': 'UInt8',
+    'datetime64[ns]': 'DateTime',
+    # Parquet and Arrow timestamps keep their own resolution
+    'datetime64[us]': 'DateTime',
+    'datetime64[ms]': 'DateTime',
+    'datetime64[s]': 'DateTime',
+    'object': 'String',  # Default for string and other objects
+}
+
+# NumPy dtypes used for columnar inserts, keyed by ClickHouse type
+CLICKHOUSE_TO_NUMPY_TYPES = {
+    'Int64': 'int64',
+    'Int32': 'int32',
+    'Int16': 'int16',
+    'Int8': 'int8',
+    'UInt64': 'uint64',
+    'UInt32': 'uint32',
+    'UInt16': 'uint16',
+    'Float64': 'float64',
+    'Float32': 'float32',
+    'UInt8': 'uint8',
+    'DateTime': 'datetime64[ns]',
+}
+
+INSERT_MODES = ('python', 'numpy')
+
+# Server settings callers may pass through to imports; the async_insert
+# ones let the server buffer small inserts into larger parts
+INSERT_SETTINGS = (
+    'async_insert',
+    'wait_for_async_insert',
+    'async_insert_busy_timeout_ms',
+    'async_insert_max_data_size',
+    'min_insert_block_size_rows',
+    'min_insert_block_size_bytes',
+    'max_insert_block_size',
+    'max_insert_threads',
+)
+
+# Recent insert blocks remembered by plain MergeTree tables created for
+# resumable imports, so a resent batch with the same token is dropped
+DEDUPLICATION_WINDOW = 10000
+
+# Rows sharing one resume key that a resumable export holds in memory
+# while it waits for the key to change
+RESUME_MAX_HELD_ROWS = 1000000
+
+# Buffer size for file handles written by exports
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Table and column metadata shared by every manager in the process
+metadata_cache = TTLCache(maxsize=1024, ttl=60)
+
+# Preview rows keyed by server, source query and limit
+preview_cache = TTLCache(maxsize=256, ttl=30)
+
+# Bound the work a preview may do; with 'break' ClickHouse returns what it
+# has read so far instead of failing, so big joins still preview quickly
+PREVIEW_SETTINGS = {
+    'max_rows_to_read': 1000000,
+    'read_overflow_mode': 'break',
+    'max_rows_in_join': 1000000,
+    'join_overflow_mode': 'break',
+    'max_execution_time': 10,
+    'timeout_overflow_mode': 'break',
+}
+
+EXPORT_MODES = ('python', 'native')
+
+# Output formats ClickHouse can produce itself for native exports
+NATIVE_EXPORT_FORMATS = ('CSVWithNames', 'TSVWithNames', 'Parquet', 'Arrow')
+
+# Ways of splitting an export into disjoint partitions
+PARTITION_STRATEGIES = ('hash', 'range', 'part')
+
+# Characters TabSeparated output escapes with a backslash instead of quoting
+TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+# Largest piece of a native result copied into a streamed response at once
+STREAM_CHUNK_SIZE = 256 * 1024
+
+# Seconds an HTTP query may wait for the server on any one socket operation
+HTTP_TIMEOUT = 600
+
+# An error after the HTTP 200 header is appended to the body as this text,
+# so the end of native output is held back until it is known to be data
+STREAM_EXCEPTION = re.compile(rb'Code: \d+\. DB::Exception: ')
+EXCEPTION_TAIL_BYTES = 16 * 1024
+
+# Blocks read ahead of the insert in a table-to-table copy
+COPY_QUEUE_BLOCKS = 4
+
 class ClickHouseManager:
-    def __init__(self, host, port, database, user, jwt_token=None):
+    def __init__(self, host, port, database, user, jwt_token=None, http_port=8123, compression=None):
         """
         Initialize ClickHouse client with connection parameters.
+        compression ('lz4', 'lz4hc' or 'zstd') compresses native protocol traffic.
         """
         # Create connection settings based on auth method
         self.host = host
         self.port = port
         self.database = database
+        self.user = user
+        self.jwt_token = jwt_token
+        self.http_port = http_port
         
         # Configure client with JWT token authentication if provided
         if jwt_token:
@@ -22,6 +151,7 @@ class ClickHouseManager:
                 database=database,
                 user=user,
                 password=None,  # No password when using JWT
+                compression=compression or False,
                 settings={
                     'jwt_auth_header': {
                         'Authorization': f'Bearer {jwt_token}'
@@ -34,21 +164,35 @@ class ClickHouseManager:
                 host=host,
                 port=port,
                 database=database,
-                user=user
+                user=user,
+                compression=compression or False
             )
     
     def get_tables(self):
         """
         Get list of tables in the database.
         """
+        cache_key = self._cache_scope() + ('tables', self.database)
+        tables = metadata_cache.get(cache_key)
+        if tables is not None:
+            return tables
+        
         query = f"SHOW TABLES FROM {self.database}"
         result = self.client.execute(query)
-        return [table[0] for table in result]
+        tables = [table[0] for table in result]
+        
+        metadata_cache.set(cache_key, tables)
+        return tables
     
     def get_columns(self, table):
         """
         Get column definitions for a table.
         """
+        cache_key = self._columns_cache_key(table)
+        columns = metadata_cache.get(cache_key)
+        if columns is not None:
+            return columns
+        
         query = f"DESCRIBE TABLE {table}"
         result = self.client.execute(query)
         columns = []
@@ -61,111 +205,495 @@ class ClickHouseManager:
                 'default_expression': col[3]
             })
         
+        metadata_cache.set(cache_key, columns)
         return columns
     
-    def preview_data(self, table, columns=None, limit=100):
+    def get_columns_batch(self, tables):
         """
-        Get preview data for a table with selected columns.
+        Get column definitions for several tables with one system.columns query.
         """
-        cols = '*'
-        if columns and len(columns) > 0:
-            cols = ', '.join(f'`{col}`' for col in columns)
+        result = {}
+        missing = {}  # (database, name) -> requested table names
         
-        query = f"SELECT {cols} FROM {table} LIMIT {limit}"
-        result = self.client.execute(query, with_column_types=True)
+        for table in tables:
+            columns = metadata_cache.get(self._columns_cache_key(table))
+            if columns is not None:
+                result[table] = columns
+            else:
+                missing.setdefault(self._split_table_name(table), []).append(table)
         
-        # Process result with column names
-        column_names = [col[0] for col in result[1]]
-        data = []
+        if missing:
+            # Group by database so each condition is a plain IN over names
+            by_database = {}
+            for database, name in missing:
+                by_database.setdefault(database, []).append(name)
+            
+            conditions = []
+            params = {}
+            for i, (database, names) in enumerate(by_database.items()):
+                conditions.append(f"(database = %(db{i})s AND table IN %(tables{i})s)")
+                params[f'db{i}'] = database
+                params[f'tables{i}'] = tuple(names)
+            
+            query = (
+                "SELECT database, table, name, type, default_kind, default_expression "
+                f"FROM system.columns WHERE {' OR '.join(conditions)} "
+                "ORDER BY database, table, position"
+            )
+            fetched = {key: [] for key in missing}
+            rows = self.client.execute(query, params)
+            for database, table, name, col_type, default_kind, default_expression in rows:
+                fetched[(database, table)].append({
+                    'name': name,
+                    'type': col_type,
+                    'default_type': default_kind,
+                    'default_expression': default_expression
+                })
+            
+            for key, columns in fetched.items():
+                if not columns:
+                    raise ValueError(f"Table not found: {key[0]}.{key[1]}")
+                for table in missing[key]:
+                    metadata_cache.set(self._columns_cache_key(table), columns)
+                    result[table] = columns
         
-        for row in result[0]:
-            data_row = {}
-            for i, value in enumerate(row):
-                data_row[column_names[i]] = value
-            data.append(data_row)
+        return result
+    
+    def _split_table_name(self, table):
+        """
+        Split an optionally database-qualified table name into (database, table).
+        """
+        return _qualified_name(table, self.database)
+    
+    def _cache_scope(self):
+        """
+        Prefix of every cache key, so cached metadata and rows are only
+        shared between callers with the same server and credentials.
+        """
+        token_hash = hashlib.sha256(self.jwt_token.encode('utf-8')).hexdigest() if self.jwt_token else None
+        return (self.host, self.port, self.user, token_hash)
+    
+    def _columns_cache_key(self, table):
+        return self._cache_scope() + ('columns',) + self._split_table_name(table)
+    
+    def preview_data(self, table, columns=None, limit=100, sample=None):
+        """
+        Get preview data for a table with selected columns.
+
+        sample (e.g. 0.1) reads only that fraction of the table when it
+        has a sampling key, and is ignored otherwise.
+        """
+        _check_sample(sample)
+        if sample and not self._has_sampling_key(table):
+            sample = None
         
-        return data
+        def build_query(columns):
+            cols = '*'
+            if columns:
+                cols = ', '.join(f'`{col}`' for col in columns)
+            sample_clause = f" SAMPLE {float(sample)}" if sample else ''
+            return f"SELECT {cols} FROM {table}{sample_clause} LIMIT {limit}"
+        
+        return self._cached_preview(('table', table.strip(), sample), columns, limit, build_query)
     
-    def preview_join_data(self, join_config, columns=None, limit=100):
+    def preview_join_data(self, join_config, columns=None, limit=100, sample=None):
         """
         Get preview data for a join query with selected columns.
+
+        sample applies to the base table, as for preview_data.
         """
-        # Construct JOIN query from config
+        _check_sample(sample)
         base_table = join_config.get('base_table')
-        join_tables = join_config.get('join_tables', [])
-        join_conditions = join_config.get('join_conditions', [])
+        if sample and base_table and not self._has_sampling_key(_base_table(base_table)[0]):
+            sample = None
         
-        # Validate join configuration
-        if not base_table or not join_tables or len(join_tables) != len(join_conditions):
-            raise ValueError("Invalid join configuration")
+        def build_query(columns):
+            return self._build_join_query(join_config, columns, sample=sample) + f" LIMIT {limit}"
         
-        # Select columns
+        return self._cached_preview(('join', self._join_cache_key(join_config), sample), columns, limit, build_query)
+    
+    def _cached_preview(self, source_key, columns, limit, build_query):
+        """
+        Serve preview rows from preview_cache, querying only on a miss.
+
+        A cached preview also answers requests for any subset of its columns.
+        """
+        cache_key = self._cache_scope() + (self.database, source_key, limit)
+        columns = list(columns or [])
+        
+        cached = preview_cache.get(cache_key)
+        if cached is None or not (columns or cached['all_columns']) or not set(columns) <= set(cached['names']):
+            result = self.client.execute(build_query(columns), with_column_types=True, settings=PREVIEW_SETTINGS)
+            cached = {
+                'all_columns': not columns,
+                'names': [col[0] for col in result[1]],
+                'rows': result[0],
+            }
+            preview_cache.set(cache_key, cached)
+        
+        # Project the cached rows onto the requested columns
+        names = columns or cached['names']
+        positions = [cached['names'].index(name) for name in names]
+        return [{name: row[i] for name, i in zip(names, positions)} for row in cached['rows']]
+    
+    def _join_cache_key(self, join_config):
+        """
+        Normalize a join config so equivalent configs share preview cache entries.
+        """
+        def normalize(sql):
+            return ' '.join(str(sql).split())
+        
+        join_tables = join_config.get('join_tables', [])
+        join_types = join_config.get('join_types', ['JOIN'] * len(join_tables))
+        return (
+            normalize(join_config.get('base_table', '')),
+            tuple(normalize(table) for table in join_tables),
+            tuple(normalize(condition) for condition in join_config.get('join_conditions', [])),
+            tuple(normalize(join_type).upper() for join_type in join_types),
+        )
+    
+    def _has_sampling_key(self, table):
+        """
+        Check whether a table was created with SAMPLE BY.
+        """
+        database, name = self._split_table_name(table)
+        cache_key = self._cache_scope() + ('sampling_key', database, name)
+        sampling_key = metadata_cache.get(cache_key)
+        if sampling_key is None:
+            result = self.client.execute(
+                "SELECT sampling_key FROM system.tables WHERE database = %(database)s AND name = %(name)s",
+                {'database': database, 'name': name}
+            )
+            sampling_key = result[0][0] if result else ''
+            metadata_cache.set(cache_key, sampling_key)
+        return bool(sampling_key)
+
+    def export_to_file(self, table, columns, output_path, delimiter=',', batch_size=None,
+                       export_mode='python', output_format='CSVWithNames', progress=None, compression=None,
+                       row_group_size=ROW_GROUP_SIZE, metrics=None):
+        """
+        Export data from ClickHouse table to a flat file.
+
+        progress, if given, is notified through start(total_rows=...) and
+        advance(rows, bytes) as blocks are written. compression ('gzip',
+        'zstd' or 'lz4') compresses the output file as it is written; for
+        Parquet and Arrow output it picks the format's internal codec.
+        metrics, a TransferMetrics, collects the time spent per stage.
+        """
+        if export_mode not in EXPORT_MODES:
+            raise ValueError(f"Unsupported export mode: {export_mode}")
+        _check_delimiter(output_format, delimiter)
+        metrics = metrics or TransferMetrics('export')
+
         cols = '*'
         if columns and len(columns) > 0:
             cols = ', '.join(f'`{col}`' for col in columns)
         
-        # Build query
-        query = f"SELECT {cols} FROM {base_table}"
+        # Query for count
+        count_query = f"SELECT COUNT(*) FROM {table}"
+        with metrics.stage('count'):
+            total_count = self.client.execute(count_query)[0][0]
+        if progress:
+            progress.start(total_rows=total_count)
         
-        for i, join_table in enumerate(join_tables):
-            join_type = join_config.get('join_types', ['JOIN'])[i] if 'join_types' in join_config else 'JOIN'
-            query += f" {join_type} {join_table} ON {join_conditions[i]}"
+        # Main data query
+        query = f"SELECT {cols} FROM {table}"
         
-        query += f" LIMIT {limit}"
+        if export_mode == 'native':
+            return self._stream_native_to_file(query, output_path, metrics, output_format, delimiter, progress,
+                                               compression)
+        if output_format in COLUMNAR_EXPORT_FORMATS:
+            return self._write_query_to_columnar(query, output_path, COLUMNAR_EXPORT_FORMATS[output_format], metrics,
+                                                 batch_size, progress, compression, row_group_size)
+        return self._write_query_to_file(query, output_path, metrics, delimiter, batch_size, progress,
+                                         compression=compression, output_format=output_format)
+    
+    def export_join_to_file(self, join_config, columns, output_path, delimiter=',', batch_size=None,
+                            export_mode='python', output_format='CSVWithNames', progress=None, compression=None,
+                            row_group_size=ROW_GROUP_SIZE, metrics=None):
+        """
+        Export data from a JOIN query to a flat file.
+        """
+        if export_mode not in EXPORT_MODES:
+            raise ValueError(f"Unsupported export mode: {export_mode}")
+        _check_delimiter(output_format, delimiter)
+        metrics = metrics or TransferMetrics('export')
         
-        # Execute query
-        result = self.client.execute(query, with_column_types=True)
+        query = self._build_join_query(join_config, columns)
+        if progress:
+            with metrics.stage('count'):
+                progress.start(total_rows=self.client.execute(f"SELECT count() FROM ({query})")[0][0])
         
-        # Process result with column names
-        column_names = [col[0] for col in result[1]]
-        data = []
+        if export_mode == 'native':
+            return self._stream_native_to_file(query, output_path, metrics, output_format, delimiter, progress,
+                                               compression)
+        if output_format in COLUMNAR_EXPORT_FORMATS:
+            return self._write_query_to_columnar(query, output_path, COLUMNAR_EXPORT_FORMATS[output_format], metrics,
+                                                 batch_size, progress, compression, row_group_size)
+        return self._write_query_to_file(query, output_path, metrics, delimiter, batch_size, progress,
+                                         compression=compression, output_format=output_format)
+    
+    def export_incremental(self, table, columns, output_path, watermark_column, watermark=None, join_config=None,
+                           delimiter=',', batch_size=None, append=False, progress=None, compression=None,
+                           metrics=None):
+        """
+        Export only rows whose watermark_column is above watermark.
+
+        The upper bound is read before exporting, so rows that arrive during
+        the export are left for the next run. With append, rows are added to
+        an existing output file instead of replacing it. Returns (rows, new
+        watermark); when nothing is new, no file is written and the watermark
+        comes back unchanged.
+        """
+        metrics = metrics or TransferMetrics('export')
         
-        for row in result[0]:
-            data_row = {}
-            for i, value in enumerate(row):
-                data_row[column_names[i]] = value
-            data.append(data_row)
+        # Qualified join columns (t1.ts) are used as written
+        column = watermark_column if '.' in watermark_column or '`' in watermark_column else f'`{watermark_column}`'
+        lower = f"{column} > {_sql_literal(watermark)}" if watermark is not None else None
         
-        return data
-
-    def export_to_file(self, table, columns, output_path, delimiter=',', batch_size=10000):
+        if join_config:
+            bounds_query = self._build_join_query(join_config, select=f"max({column}), count()")
+            query = self._build_join_query(join_config, columns)
+        else:
+            cols = '*'
+            if columns and len(columns) > 0:
+                cols = ', '.join(f'`{col}`' for col in columns)
+            bounds_query = f"SELECT max({column}), count() FROM {table}"
+            query = f"SELECT {cols} FROM {table}"
+        
+        if lower:
+            bounds_query += f" WHERE {lower}"
+        upper, new_rows = self.client.execute(bounds_query)[0]
+        if new_rows == 0:
+            return 0, watermark
+        
+        predicates = [lower] if lower else []
+        predicates.append(f"{column} <= {_sql_literal(upper)}")
+        query += f" WHERE {' AND '.join(predicates)}"
+        
+        if progress:
+            progress.start(total_rows=new_rows)
+        
+        appending = append and os.path.exists(output_path) and os.path.getsize(output_path) > 0
+        rows = self._write_query_to_file(query, output_path, metrics, delimiter, batch_size, progress,
+                                         write_header=not appending, compression=compression, append=appending)
+        return rows, _watermark_value(upper)
+    
+    def export_resumable(self, table, columns, output_path, key_column, checkpoint, join_config=None,
+                         delimiter=',', batch_size=None, progress=None, metrics=None):
         """
-        Export data from ClickHouse table to a flat file.
+        Export rows in key_column order, saving checkpoint after every block
+        so an interrupted export continues where it stopped.
+
+        The checkpoint holds the last key written in full and the file size
+        at that point. On resume the file is cut back to that size, dropping
+        any partly written block, and only rows above that key are fetched.
+        Rows sharing a key never straddle a checkpoint, so the key need not
+        be unique, but more than RESUME_MAX_HELD_ROWS rows with one key fail
+        the export. Returns the rows written by this run; the checkpoint is
+        cleared once the export completes.
         """
+        metrics = metrics or TransferMetrics('export')
+        state = checkpoint.load()
+        column = key_column if '.' in key_column or '`' in key_column else f'`{key_column}`'
+        
+        # The key travels as an extra last column and is stripped on write
         cols = '*'
         if columns and len(columns) > 0:
             cols = ', '.join(f'`{col}`' for col in columns)
+        select = f"{cols}, {column} AS `_resume_key`"
+        if join_config:
+            query = self._build_join_query(join_config, select=select)
+        else:
+            query = f"SELECT {select} FROM {table}"
+        result_columns = self._query_columns(query)[:-1]
+        header = [name for name, _ in result_columns]
         
-        # Query for count
-        count_query = f"SELECT COUNT(*) FROM {table}"
-        total_count = self.client.execute(count_query)[0][0]
+        if state:
+            if not os.path.exists(output_path) or os.path.getsize(output_path) < state['offset']:
+                raise ValueError("Output file is shorter than its checkpoint; reset the checkpoint to start over")
+            query += f" WHERE {column} > {_sql_literal(state['key'])}"
         
-        # Main data query
-        query = f"SELECT {cols} FROM {table}"
+        if progress:
+            progress.start(total_rows=self.client.execute(f"SELECT count() FROM ({query})")[0][0])
+        query += f" ORDER BY {column}"
+        
+        batch_size = batch_size or self._block_rows(query, result_columns)
+        metrics.batching = {'adaptive': False, 'block_rows': batch_size}
+        total_rows = state['rows'] if state else 0
+        rows_written = 0
+        
+        with open(output_path, 'r+b' if state else 'wb', buffering=WRITE_BUFFER_SIZE) as raw:
+            if state:
+                raw.truncate(state['offset'])
+                raw.seek(state['offset'])
+            
+            with _text_writer(raw) as f:
+                writer = csv.writer(f, delimiter=delimiter)
+                if not state:
+                    writer.writerow(header)
+                f.flush()
+                position = raw.tell()
+                
+                held = []
+                try:
+                    blocks = self._iter_blocks(query, batch_size)
+                    for block in metrics.timed(blocks, 'query'):
+                        # Rows sharing the block's last key may continue in the next block
+                        rows = held + block
+                        split = len(rows)
+                        while split > 0 and rows[split - 1][-1] == rows[-1][-1]:
+                            split -= 1
+                        held = rows[split:]
+                        if len(held) > RESUME_MAX_HELD_ROWS:
+                            raise ValueError(f"More than {RESUME_MAX_HELD_ROWS} rows share the resume key "
+                                             f"{held[0][-1]!r}; choose a more selective key_column")
+                        if split == 0:
+                            continue
+                        
+                        with metrics.stage('write'):
+                            writer.writerows(row[:-1] for row in rows[:split])
+                            f.flush()
+                        rows_written += split
+                        written = raw.tell()
+                        metrics.add(split, written - position)
+                        checkpoint.save({
+                            'key': _watermark_value(rows[split - 1][-1]),
+                            'offset': written,
+                            'rows': total_rows + rows_written
+                        })
+                        if progress:
+                            progress.advance(split, written - position)
+                        position = written
+                    
+                    writer.writerows(row[:-1] for row in held)
+                    rows_written += len(held)
+                except BaseException:
+                    self.client.disconnect()
+                    raise
         
-        # Use settings to stream in batches
-        settings = {'max_block_size': batch_size}
+        # The last rows leave the write buffers as the file closes
+        metrics.add(len(held), os.path.getsize(output_path) - position)
+        checkpoint.clear()
+        return rows_written
+    
+    def stream_export(self, table, columns, join_config=None, delimiter=',', batch_size=None,
+                      export_mode='python', output_format='CSVWithNames', compression=None):
+        """
+        Generate the exported table or join as chunks of bytes, for sending
+        as an HTTP response without writing a file.
+
+        'python' mode formats CSV/TSV, Parquet or Arrow from execute_iter
+        blocks; 'native' mode relays ClickHouse's own formatted output.
+        compression compresses the stream on the fly, or for Parquet and
+        Arrow picks the format's internal codec.
+        """
+        if export_mode not in EXPORT_MODES:
+            raise ValueError(f"Unsupported export mode: {export_mode}")
+        if output_format not in NATIVE_EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {output_format}")
+        _check_delimiter(output_format, delimiter)
         
-        # Get column info for header
-        result = self.client.execute(query + " LIMIT 0", with_column_types=True, settings=settings)
-        header = [col[0] for col in result[1]]
+        if join_config:
+            query = self._build_join_query(join_config, columns)
+        else:
+            cols = '*'
+            if columns and len(columns) > 0:
+                cols = ', '.join(f'`{col}`' for col in columns)
+            query = f"SELECT {cols} FROM {table}"
         
-        # Write to CSV in batches
-        with open(output_path, 'w', newline='') as f:
-            writer = csv.writer(f, delimiter=delimiter)
-            writer.writerow(header)
+        if export_mode == 'native':
+            return self._stream_native(query, output_format, delimiter, compression)
+        if output_format in COLUMNAR_EXPORT_FORMATS:
+            return self._stream_columnar(query, COLUMNAR_EXPORT_FORMATS[output_format], batch_size, compression)
+        return self._stream_query(query, delimiter, batch_size, compression, output_format)
+    
+    def _stream_query(self, query, delimiter=',', batch_size=None, compression=None, output_format='CSVWithNames'):
+        """
+        Yield query results as CSV or TSV text, one encoded block at a time.
+        """
+        result_columns = self._query_columns(query)
+        batch_size = batch_size or self._block_rows(query, result_columns)
+        sink = _ChunkSink()
+        
+        with wrap_writer(sink, compression) as out:
+            f = io.TextIOWrapper(out, encoding='utf-8', newline='', write_through=True)
+            writer = _row_writer(f, output_format, delimiter)
             
-            # Stream data in batches to avoid memory issues
-            rows_processed = 0
-            for batch in self.client.execute_iter(query, settings=settings):
-                writer.writerow(batch)
-                rows_processed += 1
+            # Send the header right away so the first byte does not wait for data
+            writer.writerow([name for name, _ in result_columns])
+            yield sink.drain()
+            
+            try:
+                for block in self._iter_blocks(query, batch_size):
+                    writer.writerows(block)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            except BaseException:
+                # Includes GeneratorExit when the HTTP client goes away mid-stream
+                self.client.disconnect()
+                raise
+            
+            f.detach()
         
-        return rows_processed
+        # Compressed streams end with a trailer written on close
+        data = sink.drain()
+        if data:
+            yield data
     
-    def export_join_to_file(self, join_config, columns, output_path, delimiter=',', batch_size=10000):
+    def _stream_columnar(self, query, file_format, batch_size=None, compression=None,
+                         row_group_size=ROW_GROUP_SIZE):
         """
-        Export data from a JOIN query to a flat file.
+        Yield query results as a Parquet or Arrow file, one row group at a time.
+        """
+        result_columns = self._query_columns(query)
+        batch_size = batch_size or self._block_rows(query, result_columns)
+        sink = _ChunkSink()
+        
+        with ColumnarWriter(sink, result_columns, file_format, compression, row_group_size) as writer:
+            try:
+                for block in self._iter_blocks(query, batch_size):
+                    if writer.write_rows(block):
+                        yield sink.drain()
+            except BaseException:
+                self.client.disconnect()
+                raise
+        
+        # The last row group and the file footer are written on close
+        yield sink.drain()
+    
+    def _stream_native(self, query, output_format='CSVWithNames', delimiter=',', compression=None):
+        """
+        Yield ClickHouse's formatted output for a query as it arrives over HTTP.
+        """
+        if output_format in COLUMNAR_EXPORT_FORMATS and compression:
+            raise ValueError(f"{output_format} output is already compressed internally")
+        
+        settings = {}
+        if output_format == 'CSVWithNames' and delimiter != ',':
+            settings['format_csv_delimiter'] = delimiter
+        
+        response = self._http_query(f"{query} FORMAT {output_format}", settings)
+        sink = _ChunkSink()
+        
+        with response, wrap_writer(sink, compression) as out:
+            # read1 returns whatever has arrived instead of waiting for a full chunk
+            for chunk in _checked_chunks(response.read1, STREAM_CHUNK_SIZE):
+                out.write(chunk)
+                data = sink.drain()
+                if data:
+                    yield data
+        
+        data = sink.drain()
+        if data:
+            yield data
+    
+    def _build_join_query(self, join_config, columns=None, sample=None, select=None):
+        """
+        Build a SELECT query joining the tables described by join_config,
+        optionally sampling the base table. select replaces the column list
+        with a raw expression list.
         """
         # Construct JOIN query from config
         base_table = join_config.get('base_table')
@@ -180,90 +708,1284 @@ class ClickHouseManager:
         cols = '*'
         if columns and len(columns) > 0:
             cols = ', '.join(f'`{col}`' for col in columns)
+        if select:
+            cols = select
         
         # Build query
         query = f"SELECT {cols} FROM {base_table}"
+        if sample:
+            query += f" SAMPLE {float(sample)}"
         
         for i, join_table in enumerate(join_tables):
             join_type = join_config.get('join_types', ['JOIN'])[i] if 'join_types' in join_config else 'JOIN'
             query += f" {join_type} {join_table} ON {join_conditions[i]}"
         
-        # Use settings to stream in batches
-        settings = {'max_block_size': batch_size}
+        return query
+    
+    def export_parallel(self, connection_factory, table, columns, output_path, join_config=None, delimiter=',',
+                        batch_size=None, workers=4, partition_by='hash', partition_key=None,
+                        concatenate=True, progress=None, compression=None, metrics=None):
+        """
+        Export a table or JOIN over several connections at once.
+
+        Rows are split into disjoint partitions (hash of a key, ranges of an
+        integer key, or groups of the table's partitions), each pulled into its own
+        shard file over a connection from connection_factory(). With
+        concatenate, shards are merged into output_path under one header.
+        Returns the row count and the list of files written.
+        """
+        if partition_by not in PARTITION_STRATEGIES:
+            raise ValueError(f"Unsupported partitioning: {partition_by}")
+        metrics = metrics or TransferMetrics('export')
+        
+        if join_config:
+            query = self._build_join_query(join_config, columns)
+            source_table = join_config.get('base_table')
+        else:
+            cols = '*'
+            if columns and len(columns) > 0:
+                cols = ', '.join(f'`{col}`' for col in columns)
+            query = f"SELECT {cols} FROM {table}"
+            source_table = table
+        
+        if progress:
+            progress.start(total_rows=self.client.execute(f"SELECT count() FROM ({query})")[0][0])
+        
+        predicates = self._partition_predicates(source_table, partition_by, partition_key, workers,
+                                                is_join=bool(join_config))
+        
+        # Size blocks once rather than per shard
+        batch_size = batch_size or self._block_rows(query)
+        
+        base, ext = os.path.splitext(output_path)
+        shard_paths = [f"{base}.part-{i:04d}{ext}" for i in range(len(predicates))]
+        
+        def export_shard(predicate, shard_path):
+            with connection_factory() as worker:
+                return worker._write_query_to_file(f"{query} WHERE {predicate}", shard_path, metrics, delimiter,
+                                                   batch_size, progress, write_header=not concatenate,
+                                                   compression=compression)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=len(predicates)) as executor:
+                futures = [executor.submit(export_shard, predicate, shard_path)
+                           for predicate, shard_path in zip(predicates, shard_paths)]
+                rows_processed = sum(future.result() for future in futures)
+            
+            if not concatenate:
+                return rows_processed, shard_paths
+            
+            # Merge shards behind a single header; compressed frames concatenate cleanly
+            with open(output_path, 'wb') as raw, _text_writer(raw, compression) as f:
+                csv.writer(f, delimiter=delimiter).writerow(self._query_header(query))
+            with open(output_path, 'ab') as f, metrics.stage('concatenate'):
+                for shard_path in shard_paths:
+                    with open(shard_path, 'rb') as shard:
+                        shutil.copyfileobj(shard, f, WRITE_BUFFER_SIZE)
+                    os.remove(shard_path)
+        except BaseException:
+            # A failed export leaves neither shards nor a partial output file
+            for path in shard_paths + ([output_path] if concatenate else []):
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        
+        return rows_processed, [output_path]
+    
+    def copy_to_clickhouse(self, target_factory, table, columns, target_table, join_config=None, create_table=False,
+                           batch_size=None, workers=1, source_factory=None, partition_by='hash', partition_key=None,
+                           insert_settings=None, progress=None, metrics=None):
+        """
+        Copy a table or JOIN from this server into target_table on another,
+        without going through a file.
+
+        Blocks read with execute_iter are handed to a thread inserting them
+        over a connection from target_factory(), so reading and inserting
+        overlap. With workers > 1, rows are split into disjoint partitions
+        as in export_parallel, each copied over its own pair of connections
+        from source_factory() and target_factory(). With create_table, the
+        target table gets the result's column types. A failed copy leaves
+        the rows inserted so far in the target. Returns the rows copied.
+        """
+        if partition_by not in PARTITION_STRATEGIES:
+            raise ValueError(f"Unsupported partitioning: {partition_by}")
+        if workers > 1 and source_factory is None:
+            raise ValueError("Parallel copy needs a source connection factory")
+        _check_insert_settings(insert_settings)
+        metrics = metrics or TransferMetrics('copy')
+        
+        if join_config:
+            query = self._build_join_query(join_config, columns)
+            source_table = join_config.get('base_table')
+        else:
+            cols = '*'
+            if columns and len(columns) > 0:
+                cols = ', '.join(f'`{col}`' for col in columns)
+            query = f"SELECT {cols} FROM {table}"
+            source_table = table
+        
+        if progress:
+            progress.start(total_rows=self.client.execute(f"SELECT count() FROM ({query})")[0][0])
+        
+        result_columns = self._query_columns(query)
+        batch_size = batch_size or self._block_rows(query, result_columns)
+        metrics.batching = {'adaptive': False, 'block_rows': batch_size}
+        insert_query = (f"INSERT INTO {target_table} ({', '.join(f'`{name}`' for name, _ in result_columns)}) "
+                        "VALUES")
+        
+        with target_factory() as target:
+            target_server = (target.host, target.port, target.database)
+            if create_table:
+                with metrics.stage('create_table'):
+                    target._create_table_from_columns(result_columns, target_table)
+            if workers <= 1:
+                try:
+                    return self._copy_stream(target, query, insert_query, batch_size, metrics, insert_settings,
+                                             progress)
+                finally:
+                    # Previews of the target may now be stale
+                    _invalidate_previews(*target_server, target_table)
+        
+        predicates = self._partition_predicates(source_table, partition_by, partition_key, workers,
+                                                is_join=bool(join_config))
+        
+        def copy_partition(predicate):
+            with source_factory() as source, target_factory() as target:
+                return source._copy_stream(target, f"{query} WHERE {predicate}", insert_query, batch_size,
+                                           metrics, insert_settings, progress)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=len(predicates)) as executor:
+                futures = [executor.submit(copy_partition, predicate) for predicate in predicates]
+                return sum(future.result() for future in futures)
+        finally:
+            _invalidate_previews(*target_server, target_table)
+    
+    def _copy_stream(self, target, query, insert_query, batch_size, metrics, insert_settings=None, progress=None):
+        """
+        Stream query results from this connection into insert_query on target.
+
+        This thread reads blocks and queues them; a second thread inserts
+        them, so the next block is fetched while the last one is written.
+        """
+        blocks = queue.Queue(maxsize=COPY_QUEUE_BLOCKS)
+        stop = threading.Event()
+        state = {'copied': 0, 'error': None}
+        
+        def insert_worker():
+            try:
+                while not stop.is_set():
+                    try:
+                        rows = blocks.get(timeout=0.5)
+                    except queue.Empty:
+                        continue
+                    if rows is None:
+                        return
+                    
+                    with metrics.stage('insert'):
+                        target.client.execute(insert_query, rows, settings=insert_settings or None)
+                    state['copied'] += len(rows)
+                    metrics.add(len(rows))
+                    if progress:
+                        progress.advance(len(rows), 0)
+            except BaseException as e:
+                state['error'] = e
+                stop.set()
+        
+        def put(item):
+            # Block while the queue is full, unless the inserter has failed
+            while not stop.is_set():
+                try:
+                    blocks.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        thread = threading.Thread(target=insert_worker, daemon=True)
+        thread.start()
+        try:
+            blocks_iter = self._iter_blocks(query, batch_size)
+            for rows in metrics.timed(blocks_iter, 'query'):
+                # Time blocked on a full queue means the target is the bottleneck
+                with metrics.stage('queue'):
+                    queued = put(rows)
+                if not queued:
+                    # An abandoned result stream leaves the connection unusable
+                    self.client.disconnect()
+                    break
+        except BaseException:
+            stop.set()
+            self.client.disconnect()
+            raise
+        finally:
+            put(None)
+            thread.join()
+        
+        if state['error'] is not None:
+            raise state['error']
+        
+        # Bytes the source server read for the query
+        progress_info = getattr(self.client.last_query, 'progress', None)
+        metrics.add(bytes=getattr(progress_info, 'read_bytes', 0))
+        return state['copied']
+    
+    def _partition_predicates(self, source_table, partition_by, partition_key, workers, is_join=False):
+        """
+        Build WHERE predicates that split a query into disjoint partitions.
+
+        For a JOIN, source_table is the base table as written in the join
+        config, and primary key columns are qualified with its name or alias.
+        """
+        table, qualifier = _base_table(source_table) if is_join else (source_table, None)
+        database, name = self._split_table_name(table)
+        
+        if partition_by == 'part':
+            if is_join:
+                raise ValueError("Partitioning by parts is only supported for single tables")
+            
+            # Merges replace parts but never move rows between partitions,
+            # so shards are groups of partition ids rather than part names
+            partitions = [row[0] for row in self.client.execute(
+                "SELECT DISTINCT partition_id FROM system.parts "
+                "WHERE database = %(database)s AND table = %(table)s AND active ORDER BY partition_id",
+                {'database': database, 'table': name}
+            )]
+            if not partitions:
+                return ['1']
+            
+            groups = [partitions[i::workers] for i in range(min(workers, len(partitions)))]
+            return ["_partition_id IN (" + ', '.join(f"'{partition}'" for partition in group) + ")"
+                    for group in groups]
+        
+        # Default to the table's primary key
+        key = partition_key
+        if not key:
+            primary_key = self.client.execute(
+                "SELECT primary_key FROM system.tables WHERE database = %(database)s AND name = %(table)s",
+                {'database': database, 'table': name}
+            )
+            key = primary_key[0][0] if primary_key else ''
+            
+            # Joined tables may have columns of the same name
+            if key and qualifier:
+                parts = _split_top_level(key)
+                parts = parts if partition_by == 'hash' else parts[:1]
+                key = ', '.join(_qualify_column(part, qualifier) for part in parts)
+        
+        if partition_by == 'hash':
+            # Without a key, hash whole rows
+            return [f"cityHash64({key or '*'}) % {workers} = {i}" for i in range(workers)]
+        
+        # Range partitioning works on the first column of a composite key
+        key = _split_top_level(key)[0] if key else None
+        if not key:
+            raise ValueError("Range partitioning needs a partition key")
+        
+        low, high = self.client.execute(
+            f"SELECT min(toInt64({key})), max(toInt64({key})) FROM {source_table}"
+        )[0]
+        if low is None or high is None:
+            return ['1']
         
-        # Get column info for header
-        result = self.client.execute(query + " LIMIT 0", with_column_types=True, settings=settings)
-        header = [col[0] for col in result[1]]
+        step = (high - low) // workers + 1
+        return [
+            f"toInt64({key}) >= {low + i * step} AND toInt64({key}) < {low + (i + 1) * step}"
+            for i in range(workers)
+        ]
+    
+    def _iter_blocks(self, query, batch_size):
+        """
+        Fetch query results as lists of at most batch_size rows.
+        """
+        blocks = self.client.execute_iter(query, settings={'max_block_size': batch_size}, chunk_size=batch_size)
+        if batch_size == 1:
+            # With chunk_size=1 the driver yields bare rows, not one-row lists
+            return ([row] for row in blocks)
+        return blocks
+    
+    def _query_header(self, query):
+        """
+        Get the result column names of a query without reading any rows.
+        """
+        return [col[0] for col in self._query_columns(query)]
+    
+    def _query_columns(self, query):
+        """
+        Get the result (name, type) pairs of a query without reading any rows.
+        """
+        return self.client.execute(query + " LIMIT 0", with_column_types=True)[1]
+    
+    def _block_rows(self, query, result_columns=None):
+        """
+        Rows per fetched block, sized from the estimated width of the query's result rows.
+        """
+        result_columns = result_columns or self._query_columns(query)
+        return block_rows([ch_type for _, ch_type in result_columns])
+    
+    def _write_query_to_file(self, query, output_path, metrics, delimiter=',', batch_size=None, progress=None,
+                             write_header=True, compression=None, append=False, output_format='CSVWithNames'):
+        """
+        Stream query results to a CSV or TSV file one block at a time, or
+        add them to the end of the file with append. Without batch_size,
+        blocks are sized from the result's row width.
+        """
+        result_columns = self._query_columns(query) if write_header or not batch_size else None
+        batch_size = batch_size or self._block_rows(query, result_columns)
+        metrics.batching = {'adaptive': False, 'block_rows': batch_size}
         
-        # Write to CSV in batches
-        with open(output_path, 'w', newline='') as f:
-            writer = csv.writer(f, delimiter=delimiter)
-            writer.writerow(header)
+        # Write whole blocks through a large buffered file handle
+        # Compressed output appends a new gzip member / zstd or lz4 frame,
+        # which readers decode as one continuous stream
+        mode = 'ab' if append else 'wb'
+        with open(output_path, mode, buffering=WRITE_BUFFER_SIZE) as raw, _text_writer(raw, compression) as f:
+            writer = _row_writer(f, output_format, delimiter)
+            if write_header:
+                writer.writerow([name for name, _ in result_columns])
             
-            # Stream data in batches to avoid memory issues
+            # Row count comes from block sizes rather than a per-row counter
             rows_processed = 0
-            for batch in self.client.execute_iter(query, settings=settings):
-                writer.writerow(batch)
-                rows_processed += 1
+            position = raw.tell()
+            try:
+                blocks = self._iter_blocks(query, batch_size)
+                for block in metrics.timed(blocks, 'query'):
+                    with metrics.stage('write'):
+                        writer.writerows(block)
+                    rows_processed += len(block)
+                    written = raw.tell()
+                    metrics.add(len(block), written - position)
+                    if progress:
+                        progress.advance(len(block), written - position)
+                    position = written
+            except BaseException:
+                # An abandoned result stream leaves the connection unusable
+                self.client.disconnect()
+                raise
         
+        # The last rows leave the write buffers as the file closes
+        metrics.add(bytes=os.path.getsize(output_path) - position)
         return rows_processed
     
-    def import_from_file(self, flat_file_manager, columns, target_table, create_table=False):
+    def _write_query_to_columnar(self, query, output_path, file_format, metrics, batch_size=None, progress=None,
+                                 compression=None, row_group_size=ROW_GROUP_SIZE):
+        """
+        Stream query results into a Parquet or Arrow file, one row group at a time.
+        """
+        result_columns = self._query_columns(query)
+        batch_size = batch_size or self._block_rows(query, result_columns)
+        metrics.batching = {'adaptive': False, 'block_rows': batch_size}
+        
+        rows_processed = 0
+        with open(output_path, 'wb') as raw:
+            with ColumnarWriter(raw, result_columns, file_format, compression, row_group_size) as writer:
+                position = raw.tell()
+                try:
+                    blocks = self._iter_blocks(query, batch_size)
+                    for block in metrics.timed(blocks, 'query'):
+                        # Arrow conversion and encoding happen as row groups are flushed
+                        with metrics.stage('write'):
+                            writer.write_rows(block)
+                        rows_processed += len(block)
+                        # Bytes only move when a row group is flushed
+                        written = raw.tell()
+                        metrics.add(len(block), written - position)
+                        if progress:
+                            progress.advance(len(block), written - position)
+                        position = written
+                except BaseException:
+                    self.client.disconnect()
+                    raise
+        
+        # The final row group and file footer are written on close
+        metrics.add(bytes=os.path.getsize(output_path) - position)
+        return rows_processed
+    
+    def _stream_native_to_file(self, query, output_path, metrics, output_format='CSVWithNames', delimiter=',',
+                               progress=None, compression=None):
+        """
+        Let ClickHouse format query results and copy the raw bytes to disk.
+
+        The native TCP protocol always returns decoded blocks, so the query is
+        sent to the HTTP interface, which streams the formatted output as-is.
+        """
+        if output_format not in NATIVE_EXPORT_FORMATS:
+            raise ValueError(f"Unsupported native export format: {output_format}")
+        if output_format in COLUMNAR_EXPORT_FORMATS and compression:
+            raise ValueError(f"{output_format} output is already compressed internally")
+        
+        settings = {}
+        if output_format == 'CSVWithNames' and delimiter != ',':
+            settings['format_csv_delimiter'] = delimiter
+        
+        with metrics.stage('query'):
+            response = self._http_query(f"{query} FORMAT {output_format}", settings)
+        
+        # Copy bytes as they arrive, counting records for text formats
+        counter = _RecordCounter(quoted=output_format == 'CSVWithNames')
+        
+        def read(size):
+            with metrics.stage('query'):
+                return response.read(size)
+        
+        try:
+            with response, open(output_path, 'wb') as raw, wrap_writer(raw, compression) as f:
+                for chunk in _checked_chunks(read, WRITE_BUFFER_SIZE):
+                    with metrics.stage('write'):
+                        f.write(chunk)
+                    records = counter.records
+                    with metrics.stage('count_records'):
+                        counter.feed(chunk)
+                    metrics.add(counter.records - records, len(chunk))
+                    if progress:
+                        progress.advance(counter.records - records, len(chunk))
+        except BaseException:
+            # Leave no partial file that looks like a finished export
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+        
+        if output_format in COLUMNAR_EXPORT_FORMATS:
+            return self._columnar_row_count(output_path, COLUMNAR_EXPORT_FORMATS[output_format])
+        
+        # Subtract 1 for header
+        return max(counter.records - 1, 0)
+    
+    def _http_query(self, query, settings=None, body=None, headers=None):
+        """
+        Send a query to the ClickHouse HTTP interface and return the open response.
+
+        With body (bytes or a readable file object), the query moves to the
+        URL and body is sent as the data of an INSERT.
+        """
+        params = {'database': self.database}
+        params.update(settings or {})
+        if body is not None:
+            params['query'] = query
+        url = f"http://{self.host}:{self.http_port}/?{urllib.parse.urlencode(params)}"
+        
+        # Mirror the native client's authentication
+        request_headers = {'X-ClickHouse-User': self.user or 'default'}
+        if self.jwt_token:
+            request_headers['Authorization'] = f'Bearer {self.jwt_token}'
+        request_headers.update(headers or {})
+        
+        data = body if body is not None else query.encode('utf-8')
+        request = urllib.request.Request(url, data=data, headers=request_headers, method='POST')
+        try:
+            return urllib.request.urlopen(request, timeout=HTTP_TIMEOUT)
+        except urllib.error.HTTPError as e:
+            raise ValueError(f"ClickHouse HTTP query failed: {e.read().decode('utf-8', 'replace').strip()}")
+    
+    def _columnar_row_count(self, path, file_format):
+        """
+        Read the row count from a Parquet or Arrow file's metadata, if pyarrow is available.
+        """
+        try:
+            return count_columnar_rows(path, file_format)
+        except ValueError:
+            return None
+    
+    def import_from_file(self, flat_file_manager, columns, target_table, create_table=False, batch_size=None,
+                         insert_mode='python', progress=None, byte_range=None, metrics=None, insert_settings=None):
         """
         Import data from a flat file to ClickHouse.
+
+        insert_mode 'python' sends columns as Python lists, 'numpy' sends
+        NumPy arrays through clickhouse-driver's NumPy insert support.
+        Without batch_size, an AdaptiveBatcher sizes batches by bytes and
+        insert time. progress, if given, is notified through
+        start(total_bytes=...) and advance(rows, bytes) after each inserted
+        batch. byte_range limits the import to the rows between two offsets
+        of the file. metrics, a TransferMetrics, collects the time spent per
+        stage and the batch sizes used. insert_settings are passed to every
+        INSERT (see INSERT_SETTINGS).
+        """
+        if insert_mode not in INSERT_MODES:
+            raise ValueError(f"Unsupported insert mode: {insert_mode}")
+        _check_insert_settings(insert_settings)
+        metrics = metrics or TransferMetrics('import')
+        
+        if progress and byte_range:
+            progress.start(total_bytes=byte_range[1] - byte_range[0])
+        elif progress:
+            # An existing row index also gives the row total for free
+            index = flat_file_manager.row_index(build=False)
+            progress.start(total_rows=index.row_count if index else None,
+                           total_bytes=os.path.getsize(flat_file_manager.filepath))
+        bytes_read = 0
+
+        total_inserted = 0
+        table_ready = not create_table
+
+        # Stream the file chunk by chunk so memory is bounded by batch_size;
+        # parse time includes reading and decompressing the file
+        batcher = AdaptiveBatcher() if batch_size is None else None
+        chunks = flat_file_manager.iter_chunks(columns, batch_size or PARSE_CHUNK_ROWS, byte_range=byte_range)
+        if batcher:
+            chunks = batcher.rebatch(chunks)
+        try:
+            for batch_df in metrics.timed(chunks, 'parse'):
+                # Create table from the first chunk's schema if needed
+                if not table_ready:
+                    with metrics.stage('create_table'):
+                        self._create_table_from_dataframe(batch_df, target_table,
+                                                          column_types=flat_file_manager.table_types(columns))
+                    table_ready = True
+
+                if len(batch_df) == 0:  # Make sure we have data to insert
+                    continue
+
+                start = time.perf_counter()
+                self._insert_dataframe(batch_df, target_table, metrics, insert_mode, insert_settings=insert_settings)
+                if batcher:
+                    batcher.record(len(batch_df), time.perf_counter() - start)
+                total_inserted += len(batch_df)
+                
+                metrics.add(len(batch_df), flat_file_manager.bytes_read - bytes_read)
+                if progress:
+                    progress.advance(len(batch_df), flat_file_manager.bytes_read - bytes_read)
+                bytes_read = flat_file_manager.bytes_read
+        finally:
+            # Previews of the target may now be stale
+            _invalidate_previews(self.host, self.port, self.database, target_table)
+
+        metrics.batching = batcher.summary() if batcher else {'adaptive': False, 'batch_rows': batch_size}
+        return total_inserted
+    
+    def import_server_side(self, flat_file_manager, columns, target_table, create_table=False, server_path=None,
+                           batch_size=None, fallback_mode='python', progress=None, metrics=None,
+                           insert_settings=None):
+        """
+        Import a flat file with ClickHouse doing all of the parsing.
+
+        Without server_path, the file's bytes are streamed unchanged to the
+        HTTP interface as INSERT ... FORMAT; compressed files keep their
+        compression and are sent with a matching Content-Encoding. With
+        server_path, where the server sees the same file, the server reads
+        it itself through INSERT ... SELECT FROM file(). File columns are
+        matched to the selected columns by header name.
+
+        Files with a multi-character delimiter, which the server cannot
+        parse, go through import_from_file with fallback_mode instead.
+        Errors raised by the server are not retried in Python, as part of
+        the file may already be inserted.
         """
-        # Get data as DataFrame
-        df = flat_file_manager.get_data(columns)
+        _check_insert_settings(insert_settings)
+        metrics = metrics or TransferMetrics('import')
+        source = _server_insert_source(flat_file_manager)
+        if source is None:
+            return self.import_from_file(flat_file_manager, columns, target_table, create_table, batch_size,
+                                         insert_mode=fallback_mode, progress=progress, metrics=metrics,
+                                         insert_settings=insert_settings)
+        input_format, settings = source
+        settings.update(insert_settings or {})
         
-        # Create table if needed
         if create_table:
-            self._create_table_from_dataframe(df, target_table)
+            # Create the same schema the Python path would, from the first batch
+            with metrics.stage('create_table'):
+                sample_manager = FlatFileManager(flat_file_manager.filepath, flat_file_manager.delimiter,
+                                                 flat_file_manager.codec, flat_file_manager.file_format,
+                                                 compact=flat_file_manager.compact)
+                chunks = sample_manager.iter_chunks(columns, batch_size or PARSE_CHUNK_ROWS)
+                try:
+                    first = next(chunks, None)
+                finally:
+                    chunks.close()
+                if first is not None:
+                    self._create_table_from_dataframe(first, target_table,
+                                                      column_types=flat_file_manager.table_types(columns))
         
-        # Insert data in batches
-        batch_size = 10000
-        total_rows = len(df)
-        total_inserted = 0
+        names = columns if columns and len(columns) > 0 else [col['name'] for col in flat_file_manager.get_columns()]
+        column_list = ', '.join(f'`{col}`' for col in names)
+        size = os.path.getsize(flat_file_manager.filepath)
+        if progress:
+            progress.start(total_bytes=size)
         
-        for i in range(0, total_rows, batch_size):
-            batch_df = df.iloc[i:min(i+batch_size, total_rows)]
-            batch_data = batch_df.to_dict('records')
-            
-            # Convert dict to tuple list for clickhouse-driver
-            column_names = batch_df.columns.tolist()
-            values = [[row[col] for col in column_names] for row in batch_data]
-            
-            if values:  # Make sure we have data to insert
-                self.client.execute(
-                    f"INSERT INTO {target_table} ({', '.join(f'`{col}`' for col in column_names)}) VALUES",
-                    values
-                )
-                total_inserted += len(values)
+        try:
+            if server_path:
+                with metrics.stage('server_insert'):
+                    self.client.execute(
+                        f"INSERT INTO {target_table} ({column_list}) SELECT {column_list} "
+                        f"FROM file({_sql_literal(server_path)}, '{input_format}')",
+                        settings=settings
+                    )
+                rows = self.client.last_query.progress.written_rows
+                if progress:
+                    progress.advance(rows, size)
+            else:
+                headers = {'Content-Length': str(size)}
+                if flat_file_manager.codec:
+                    # ClickHouse names these encodings the same way
+                    headers['Content-Encoding'] = flat_file_manager.codec
+                
+                # Header names pick the columns; other file columns are skipped
+                settings['input_format_skip_unknown_fields'] = 1
+                with open(flat_file_manager.filepath, 'rb') as raw, metrics.stage('server_insert'):
+                    response = self._http_query(f"INSERT INTO {target_table} ({column_list}) FORMAT {input_format}",
+                                                settings, body=_ProgressReader(raw, progress), headers=headers)
+                    with response:
+                        response.read()
+                        summary = json.loads(response.headers.get('X-ClickHouse-Summary') or '{}')
+                rows = int(summary.get('written_rows', 0))
+                if progress:
+                    progress.advance(rows, 0)
+        finally:
+            # Previews of the target may now be stale
+            _invalidate_previews(self.host, self.port, self.database, target_table)
         
-        return total_inserted
+        metrics.add(rows, size)
+        return rows
+    
+    def import_resumable(self, flat_file_manager, columns, target_table, checkpoint, create_table=False,
+                         batch_size=10000, insert_mode='python', progress=None, metrics=None):
+        """
+        Import a flat file, saving checkpoint after every committed batch so
+        an interrupted import resumes instead of starting over.
+
+        Uncompressed delimited files are cut into batches at row index
+        offsets and resume by seeking to the saved offset; other files
+        resume by skipping the batches already committed. Each batch carries
+        an insert_deduplication_token fixed by its position in the file, so
+        a batch committed just before a crash but not yet checkpointed is
+        dropped by ClickHouse when it is sent again. Tables created here
+        enable this for plain MergeTree; an existing table without
+        non_replicated_deduplication_window or a Replicated engine is
+        rejected before anything is inserted.
+
+        Returns the rows inserted by this run; the checkpoint is cleared
+        once the import completes.
+        """
+        if insert_mode not in INSERT_MODES:
+            raise ValueError(f"Unsupported insert mode: {insert_mode}")
+        metrics = metrics or TransferMetrics('import')
+        
+        stat = os.stat(flat_file_manager.filepath)
+        state = checkpoint.load()
+        if state is None:
+            # A new run id keeps tokens of a deliberate re-import distinct
+            state = {
+                'run_id': uuid.uuid4().hex,
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'batch_size': batch_size,
+                'offset': None,
+                'batches': 0,
+                'rows': 0
+            }
+        elif state['size'] != stat.st_size or state['mtime_ns'] != stat.st_mtime_ns:
+            raise ValueError("File changed since the import checkpoint; reset the checkpoint to start over")
+        else:
+            # Batch boundaries, and so tokens, must match the interrupted run
+            batch_size = state['batch_size']
+        
+        table_ready = False
+        rows_inserted = 0
+        
+        def insert(batch_df, batch_id):
+            nonlocal table_ready, rows_inserted
+            if not table_ready:
+                if create_table:
+                    settings = {'non_replicated_deduplication_window': DEDUPLICATION_WINDOW}
+                    self._create_table_from_dataframe(batch_df, target_table, settings=settings,
+                                                      column_types=flat_file_manager.table_types(columns))
+                # An existing table keeps its own settings
+                self._check_deduplication(target_table)
+                table_ready = True
+            if len(batch_df) == 0:
+                return
+            self._insert_dataframe(batch_df, target_table, metrics, insert_mode,
+                                   dedup_token=f"{state['run_id']}:{batch_id}")
+            rows_inserted += len(batch_df)
+        
+        try:
+            index = flat_file_manager.row_index()
+            if index is not None:
+                # Batches span whole index checkpoints so every boundary is a known offset
+                step = max(batch_size // index.checkpoint_rows, 1)
+                bounds = index.offsets[::step] + [index.size]
+                start = state['offset'] if state['offset'] is not None else index.data_start
+                if start not in bounds:
+                    raise ValueError("Import checkpoint is not on a batch boundary; "
+                                     "reset the checkpoint to start over")
+                if progress:
+                    progress.start(total_bytes=index.size - start)
+                
+                # Dtypes settled over the whole file type every range alike
+                flat_file_manager.chunk_dtypes(columns)
+                for range_start, range_end in zip(bounds, bounds[1:]):
+                    if range_start < start or range_start >= range_end:
+                        continue
+                    rows = rows_inserted
+                    chunks = flat_file_manager.iter_chunks(columns, batch_size, byte_range=(range_start, range_end))
+                    for i, batch_df in enumerate(metrics.timed(chunks, 'parse')):
+                        insert(batch_df, f'{range_start}-{range_end}:{i}')
+                    with metrics.stage('checkpoint'):
+                        state.update(offset=range_end, rows=state['rows'] + rows_inserted - rows)
+                        checkpoint.save(state)
+                    metrics.add(rows_inserted - rows, range_end - range_start)
+                    if progress:
+                        progress.advance(rows_inserted - rows, range_end - range_start)
+            else:
+                if progress:
+                    progress.start(total_bytes=stat.st_size)
+                bytes_read = 0
+                chunks = flat_file_manager.iter_chunks(columns, batch_size)
+                for number, batch_df in enumerate(metrics.timed(chunks, 'parse')):
+                    rows = rows_inserted
+                    if number >= state['batches']:
+                        insert(batch_df, f'batch-{number}')
+                        with metrics.stage('checkpoint'):
+                            state.update(batches=number + 1, rows=state['rows'] + rows_inserted - rows)
+                            checkpoint.save(state)
+                    metrics.add(rows_inserted - rows, flat_file_manager.bytes_read - bytes_read)
+                    if progress:
+                        # Batches committed by the earlier run are still read past
+                        progress.advance(rows_inserted - rows, flat_file_manager.bytes_read - bytes_read)
+                        bytes_read = flat_file_manager.bytes_read
+        finally:
+            # Previews of the target may now be stale
+            _invalidate_previews(self.host, self.port, self.database, target_table)
+        
+        checkpoint.clear()
+        return rows_inserted
     
-    def _create_table_from_dataframe(self, df, table_name):
+    def import_parallel(self, connection_factory, flat_file_managers, columns, target_table, create_table=False,
+                        batch_size=None, workers=4, insert_mode='python', preserve_order=False, progress=None,
+                        metrics=None, insert_settings=None):
         """
-        Create a table based on DataFrame schema.
+        Import one or more flat files through a pipeline of concurrent inserts.
+
+        This thread parses chunks from each file in turn and feeds a bounded
+        queue, so parsing blocks when the inserters fall behind. Each of the
+        `workers` insert threads uses its own connection from
+        connection_factory(). With preserve_order, batches are committed in
+        input order; otherwise they are inserted as soon as a worker is free.
+        Without batch_size, batches are sized adaptively as in import_from_file.
         """
-        # Map pandas dtypes to ClickHouse types
-        type_mapping = {
-            'int64': 'Int64',
-            'int32': 'Int32',
-            'float64': 'Float64',
-            'float32': 'Float32',
-            'bool': 'UInt8',
-            'datetime64[ns]': 'DateTime',
-            'object': 'String',  # Default for string and other objects
-        }
+        if insert_mode not in INSERT_MODES:
+            raise ValueError(f"Unsupported insert mode: {insert_mode}")
+        _check_insert_settings(insert_settings)
+        metrics = metrics or TransferMetrics('import')
+        
+        if progress:
+            indexes = [ff.row_index(build=False) for ff in flat_file_managers]
+            total_rows = sum(index.row_count for index in indexes) if all(indexes) else None
+            progress.start(total_rows=total_rows,
+                           total_bytes=sum(os.path.getsize(ff.filepath) for ff in flat_file_managers))
+        
+        batcher = AdaptiveBatcher() if batch_size is None else None
+        batches = queue.Queue(maxsize=workers * 2)
+        stop = threading.Event()
+        turn = threading.Condition()
+        state = {'next_seq': 0, 'inserted': 0, 'error': None}
+        
+        def insert_worker():
+            try:
+                with connection_factory() as worker:
+                    while not stop.is_set():
+                        try:
+                            item = batches.get(timeout=0.5)
+                        except queue.Empty:
+                            continue
+                        if item is None:
+                            return
+                        seq, batch_df, bytes_read = item
+                        
+                        if preserve_order:
+                            # Wait until every earlier batch has been committed
+                            with turn, metrics.stage('wait'):
+                                turn.wait_for(lambda: state['next_seq'] == seq or stop.is_set())
+                            if stop.is_set():
+                                return
+                        
+                        start = time.perf_counter()
+                        worker._insert_dataframe(batch_df, target_table, metrics, insert_mode,
+                                                 insert_settings=insert_settings)
+                        if batcher:
+                            batcher.record(len(batch_df), time.perf_counter() - start)
+                        metrics.add(len(batch_df), bytes_read)
+                        
+                        with turn:
+                            state['inserted'] += len(batch_df)
+                            state['next_seq'] += 1
+                            turn.notify_all()
+                        if progress:
+                            progress.advance(len(batch_df), bytes_read)
+            except BaseException as e:
+                with turn:
+                    if state['error'] is None:
+                        state['error'] = e
+                    stop.set()
+                    turn.notify_all()
+        
+        def put(item):
+            # Block while the queue is full, unless the workers have failed
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        threads = [threading.Thread(target=insert_worker, daemon=True) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        
+        table_ready = not create_table
+        seq = 0
+        try:
+            for flat_file_manager in flat_file_managers:
+                bytes_read = 0
+                chunks = flat_file_manager.iter_chunks(columns, batch_size or PARSE_CHUNK_ROWS)
+                if batcher:
+                    chunks = batcher.rebatch(chunks)
+                for batch_df in metrics.timed(chunks, 'parse'):
+                    # Create table from the first chunk's schema if needed
+                    if not table_ready:
+                        with metrics.stage('create_table'):
+                            self._create_table_from_dataframe(batch_df, target_table,
+                                                              column_types=flat_file_manager.table_types(columns))
+                        table_ready = True
+                    
+                    if len(batch_df) == 0:
+                        continue
+                    
+                    # Time blocked on a full queue means the inserters are the bottleneck
+                    with metrics.stage('queue'):
+                        queued = put((seq, batch_df, flat_file_manager.bytes_read - bytes_read))
+                    if not queued:
+                        break
+                    bytes_read = flat_file_manager.bytes_read
+                    seq += 1
+                
+                if stop.is_set():
+                    break
+        except BaseException:
+            stop.set()
+            with turn:
+                turn.notify_all()
+            raise
+        finally:
+            for _ in threads:
+                put(None)
+            for thread in threads:
+                thread.join()
+            # Previews of the target may now be stale
+            _invalidate_previews(self.host, self.port, self.database, target_table)
         
+        if state['error'] is not None:
+            raise state['error']
+        
+        metrics.batching = batcher.summary() if batcher else {'adaptive': False, 'batch_rows': batch_size}
+        return state['inserted']
+    
+    def _check_deduplication(self, table):
+        """
+        Reject a table that would not drop a resent batch by its
+        insert_deduplication_token.
+        """
+        database, name = self._split_table_name(table)
+        result = self.client.execute(
+            "SELECT engine, engine_full FROM system.tables WHERE database = %(database)s AND name = %(table)s",
+            {'database': database, 'table': name}
+        )
+        if not result:
+            raise ValueError(f"Table not found: {database}.{name}")
+        engine, engine_full = result[0]
+        
+        # Replicated and shared tables deduplicate unless the window is off
+        if engine.startswith(('Replicated', 'Shared')):
+            setting = 'replicated_deduplication_window'
+        elif engine.endswith('MergeTree'):
+            setting = 'non_replicated_deduplication_window'
+        else:
+            raise ValueError(f"Resumable import needs a MergeTree table to deduplicate batches; {table} is {engine}")
+        
+        window = re.search(rf"\b{setting} = (\d+)", engine_full)
+        if window is None:
+            # Not set on the table, so the server's default applies
+            default = self.client.execute(
+                "SELECT value FROM system.merge_tree_settings WHERE name = %(name)s", {'name': setting}
+            )
+            window = int(default[0][0]) if default else 0
+        else:
+            window = int(window.group(1))
+        if window <= 0:
+            raise ValueError(f"Resumable import needs {setting} > 0 on {table} so resent batches are dropped; "
+                             f"set it with ALTER TABLE {table} MODIFY SETTING {setting} = {DEDUPLICATION_WINDOW}")
+    
+    def _insert_dataframe(self, df, target_table, metrics, insert_mode='python', dedup_token=None,
+                          insert_settings=None):
+        """
+        Insert one DataFrame batch, sending whole columns rather than rows.
+
+        dedup_token makes a repeated insert of the same batch a no-op on
+        tables with insert deduplication enabled.
+        """
+        column_names = df.columns.tolist()
+        settings = dict(insert_settings or {})
+        with metrics.stage('convert'):
+            if insert_mode == 'numpy':
+                values = self._dataframe_to_numpy_columns(df)
+                settings['use_numpy'] = True
+            else:
+                values = [_column_values(df[col]) for col in column_names]
+        if dedup_token:
+            settings['insert_deduplication_token'] = dedup_token
+        
+        # Serializing and sending the block; the server acknowledges once written
+        with metrics.stage('insert'):
+            self.client.execute(
+                f"INSERT INTO {target_table} ({', '.join(f'`{col}`' for col in column_names)}) VALUES",
+                values,
+                columnar=True,
+                settings=settings or None
+            )
+    
+    def _dataframe_to_numpy_columns(self, df):
+        """
+        Convert DataFrame columns to NumPy arrays matching the ClickHouse types
+        chosen by _create_table_from_dataframe.
+        """
+        values = []
+        for col_name, dtype in df.dtypes.items():
+            ch_type = PANDAS_TO_CLICKHOUSE_TYPES.get(str(dtype), 'String')
+            np_type = CLICKHOUSE_TO_NUMPY_TYPES.get(ch_type)
+
+            if np_type:
+                values.append(df[col_name].to_numpy(dtype=np_type))
+            elif dtype.kind in 'iufb' and getattr(dtype, 'na_value', None) is pd.NA:
+                # Nullable numbers and booleans; the driver sends None as NULL
+                values.append(df[col_name].to_numpy(dtype=object, na_value=None))
+            else:
+                # Strings go as object arrays; missing values become ''
+                column = df[col_name].to_numpy(dtype=object)
+                nulls = pd.isna(column)
+                column = column.astype(str).astype(object)
+                column[nulls] = ''
+                values.append(column)
+
+        return values
+
+    def _create_table_from_dataframe(self, df, table_name, settings=None, column_types=None):
+        """
+        Create a table based on DataFrame schema, with optional MergeTree settings.
+        column_types, {column: ClickHouse type}, overrides the types derived
+        from the DataFrame's dtypes.
+        """
         # Create column definitions
         columns = []
         for col_name, dtype in df.dtypes.items():
-            ch_type = type_mapping.get(str(dtype), 'String')
-            columns.append(f"`{col_name}` {ch_type}")
+            ch_type = (column_types or {}).get(col_name) or PANDAS_TO_CLICKHOUSE_TYPES.get(str(dtype), 'String')
+            columns.append((col_name, ch_type))
+        
+        self._create_table_from_columns(columns, table_name, settings)
+    
+    def _create_table_from_columns(self, columns, table_name, settings=None):
+        """
+        Create a MergeTree table from (name, ClickHouse type) pairs, with optional settings.
+        """
+        definitions = ', '.join(f"`{col_name}` {ch_type}" for col_name, ch_type in columns)
         
         # Create table query
-        create_query = f"CREATE TABLE IF NOT EXISTS {table_name} ({', '.join(columns)}) ENGINE = MergeTree() ORDER BY tuple()"
+        create_query = f"CREATE TABLE IF NOT EXISTS {table_name} ({definitions}) ENGINE = MergeTree() ORDER BY tuple()"
+        if settings:
+            create_query += " SETTINGS " + ', '.join(f"{name} = {value}" for name, value in settings.items())
         
         # Execute query
-        self.client.execute(create_query)
\ No newline at end of file
+        self.client.execute(create_query)
+        
+        # Make the new table visible to cached metadata lookups of every user
+        stale = {('tables', self.database), ('columns',) + self._split_table_name(table_name)}
+        metadata_cache.invalidate_where(lambda key: key[:2] == (self.host, self.port) and key[4:] in stale)
+
+
+def _check_delimiter(output_format, delimiter):
+    """
+    Reject a delimiter the output format cannot use.
+    """
+    if output_format == 'TSVWithNames' and delimiter != '\t':
+        raise ValueError(f"TSVWithNames output is tab-delimited; got delimiter {delimiter!r}")
+
+
+def _checked_chunks(read, size):
+    """
+    Yield an HTTP response body in chunks from read(size), holding back the
+    last EXCEPTION_TAIL_BYTES until the body ends.
+
+    Raises ValueError instead of yielding an exception ClickHouse appended
+    to the body after the query had started sending data.
+    """
+    tail = b''
+    while True:
+        chunk = read(size)
+        if not chunk:
+            break
+        tail += chunk
+        if len(tail) > EXCEPTION_TAIL_BYTES:
+            yield tail[:-EXCEPTION_TAIL_BYTES]
+            tail = tail[-EXCEPTION_TAIL_BYTES:]
+    
+    errors = list(STREAM_EXCEPTION.finditer(tail))
+    if errors:
+        message = tail[errors[-1].start():].decode('utf-8', 'replace').strip()
+        raise ValueError(f"ClickHouse query failed mid-stream: {message}")
+    if tail:
+        yield tail
+
+
+def _row_writer(f, output_format='CSVWithNames', delimiter=','):
+    """
+    Get a csv.writer-like writer of rows in output_format to the text file f.
+    """
+    if output_format == 'TSVWithNames':
+        return _TSVWriter(f)
+    return csv.writer(f, delimiter=delimiter)
+
+
+class _TSVWriter:
+    """
+    Writer of rows as ClickHouse TabSeparated text: tabs, newlines and
+    backslashes in values are escaped rather than quoted, and None is
+    written as \\N.
+    """
+    def __init__(self, f):
+        self.f = f
+    
+    def writerow(self, row):
+        self.f.write(self._line(row))
+    
+    def writerows(self, rows):
+        self.f.write(''.join(self._line(row) for row in rows))
+    
+    @staticmethod
+    def _line(row):
+        return '\t'.join('\\N' if value is None else str(value).translate(TSV_ESCAPES) for value in row) + '\n'
+
+
+def _text_writer(raw, compression=None):
+    """
+    Wrap a binary file in a UTF-8 text writer, compressing if requested.
+    """
+    return io.TextIOWrapper(wrap_writer(raw, compression), encoding='utf-8', newline='')
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only binary stream that collects bytes until they are drained,
+    letting writer-based encoders feed a response generator.
+    """
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._position
+    
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class _RecordCounter:
+    """
+    Count newline-terminated records in a byte stream, optionally skipping
+    newlines that fall inside double-quoted CSV fields.
+    """
+    def __init__(self, quoted=True):
+        self.quoted = quoted
+        self.in_quotes = False
+        self.records = 0
+    
+    def feed(self, chunk):
+        if not self.quoted or (not self.in_quotes and b'"' not in chunk):
+            self.records += chunk.count(b'\n')
+            return
+        
+        # Escaped quotes ("") flip parity twice, so parity tracks field state
+        lines = chunk.split(b'\n')
+        for line in lines[:-1]:
+            if line.count(b'"') % 2:
+                self.in_quotes = not self.in_quotes
+            if not self.in_quotes:
+                self.records += 1
+        if lines[-1].count(b'"') % 2:
+            self.in_quotes = not self.in_quotes
+
+
+class _ProgressReader(io.RawIOBase):
+    """
+    Readable wrapper reporting bytes as they are read from a file being uploaded.
+    """
+    # Bytes accumulated between progress updates
+    REPORT_BYTES = 1024 * 1024
+
+    def __init__(self, raw, progress=None):
+        super().__init__()
+        self._raw = raw
+        self._progress = progress
+        self._unreported = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        data = self._raw.read(size)
+        self._unreported += len(data)
+        if self._progress and (not data or self._unreported >= self.REPORT_BYTES):
+            self._progress.advance(0, self._unreported)
+            self._unreported = 0
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _server_insert_source(flat_file_manager):
+    """
+    ClickHouse input format and settings for parsing the file on the
+    server, or None when only the Python reader can handle it.
+    """
+    if flat_file_manager.file_format == 'parquet':
+        return 'Parquet', {}
+    if flat_file_manager.file_format == 'arrow':
+        # Arrow IPC files start with a magic string; IPC streams do not
+        with open(flat_file_manager.filepath, 'rb') as f:
+            return ('Arrow' if f.read(6) == b'ARROW1' else 'ArrowStream'), {}
+    
+    # format_csv_delimiter takes a single character
+    if len(flat_file_manager.delimiter) != 1:
+        return None
+    return 'CSVWithNames', {'format_csv_delimiter': flat_file_manager.delimiter}
+
+
+def _column_values(series):
+    """
+    Get a column as a list for insert, with the missing values of nullable,
+    categorical and datetime columns as None.
+    """
+    dtype = series.dtype
+    if (getattr(dtype, 'na_value', None) is pd.NA or isinstance(dtype, pd.CategoricalDtype)
+            or pd.api.types.is_datetime64_any_dtype(dtype)):
+        return series.astype(object).where(series.notna(), None).tolist()
+    return series.tolist()
+
+
+def _check_insert_settings(insert_settings):
+    unknown = sorted(set(insert_settings or {}) - set(INSERT_SETTINGS))
+    if unknown:
+        raise ValueError(f"Unsupported insert settings: {', '.join(unknown)}")
+
+
+def _sql_literal(value):
+    """
+    Render a watermark value as a ClickHouse literal.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        value = _watermark_value(value)
+    return "'" + str(value).replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+def _watermark_value(value):
+    """
+    Convert a column value into a JSON-serializable watermark that
+    _sql_literal turns back into an equivalent literal.
+    """
+    if isinstance(value, datetime.datetime):
+        text = value.strftime('%Y-%m-%d %H:%M:%S')
+        return text + f'.{value.microsecond:06d}' if value.microsecond else text
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return str(value)
+
+
+def _check_sample(sample):
+    """
+    Reject SAMPLE values other than a fraction of the table.
+    """
+    if sample is not None and not 0 < float(sample) <= 1:
+        raise ValueError(f"sample must be a fraction between 0 and 1, got {sample}")
+
+
+def _qualified_name(table, database):
+    """
+    Split an optionally database-qualified table name into (database,
+    table), defaulting to database.
+    """
+    table_database, _, name = table.rpartition('.')
+    return (table_database or database).strip('`'), name.strip('`')
+
+
+def _invalidate_previews(host, port, database, table):
+    """
+    Drop every user's cached previews of host:port that read table, which
+    is qualified with database unless it names its own.
+    """
+    target = _qualified_name(table, database)
+    
+    def reads_target(key):
+        if key[:2] != (host, port):
+            return False
+        # Keys end with (database, source_key, limit); see _cached_preview
+        key_database, (kind, source, _) = key[-3], key[-2]
+        tables = [source] if kind == 'table' else [source[0], *source[1]]
+        return any(_qualified_name(_base_table(name)[0], key_database) == target for name in tables)
+    
+    preview_cache.invalidate_where(reads_target)
+
+
+def _base_table(base_table):
+    """
+    Split a JOIN's base table, e.g. 'db.orders AS o', into the table and
+    the name its columns are qualified with.
+    """
+    parts = base_table.split()
+    return parts[0], parts[-1] if len(parts) > 1 else parts[0]
+
+
+def _qualify_column(expression, qualifier):
+    """
+    Prefix a primary key element with qualifier if it is a bare column name.
+    """
+    if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*|`[^`]+`', expression):
+        raise ValueError(f"Cannot qualify primary key expression {expression} with the base table; "
+                         "set partition_key")
+    return f"{qualifier}.{expression}"
+
+
+def _split_top_level(expression):
+    """
+    Split a comma-separated SQL expression list, ignoring commas in parentheses.
+    """
+    parts = []
+    depth = 0
+    current = ''
+    for char in expression:
+        if char == ',' and depth == 0:
+            parts.append(current.strip())
+            current = ''
+            continue
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        current += char
+    parts.append(current.strip())
+    return [part for part in parts if part]
\ No newline at end of file
@@ -0,0 +1,334 @@
+import os
+import re
+
+import pandas as pd
+
+# Optional; Parquet and Arrow files are only supported when pyarrow is installed
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pa_ipc = pq = None
+
+FILE_FORMATS = ('csv', 'parquet', 'arrow')
+
+FORMAT_EXTENSIONS = {
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+}
+
+FORMAT_MAGIC = {
+    b'PAR1': 'parquet',
+    b'ARROW1': 'arrow',
+}
+
+# ClickHouse export format names for the columnar file formats
+COLUMNAR_EXPORT_FORMATS = {
+    'Parquet': 'parquet',
+    'Arrow': 'arrow',
+}
+
+# Rows per Parquet row group / Arrow record batch written by exports
+ROW_GROUP_SIZE = 100000
+
+# ClickHouse types with a direct Arrow equivalent; everything else is
+# written as strings
+CLICKHOUSE_TO_ARROW_TYPES = {
+    'Int8': 'int8',
+    'Int16': 'int16',
+    'Int32': 'int32',
+    'Int64': 'int64',
+    'UInt8': 'uint8',
+    'UInt16': 'uint16',
+    'UInt32': 'uint32',
+    'UInt64': 'uint64',
+    'Float32': 'float32',
+    'Float64': 'float64',
+    'Bool': 'bool',
+    'String': 'string',
+    'Date': 'date32',
+    'Date32': 'date32',
+}
+
+# Arrow types named the way get_columns reports ClickHouse types
+ARROW_TO_CLICKHOUSE_TYPES = {
+    'int8': 'Int8',
+    'int16': 'Int16',
+    'int32': 'Int32',
+    'int64': 'Int64',
+    'uint8': 'UInt8',
+    'uint16': 'UInt16',
+    'uint32': 'UInt32',
+    'uint64': 'UInt64',
+    'float': 'Float32',
+    'double': 'Float64',
+    'bool': 'Bool',
+    'string': 'String',
+    'large_string': 'String',
+    'date32[day]': 'Date',
+}
+
+def _require():
+    if pa is None:
+        raise ValueError("Parquet and Arrow files require the pyarrow package")
+
+def detect_format(path):
+    """
+    Detect whether a file is delimited text, Parquet or Arrow IPC from its
+    extension or magic bytes.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in FORMAT_EXTENSIONS:
+        return FORMAT_EXTENSIONS[ext]
+
+    with open(path, 'rb') as f:
+        head = f.read(6)
+    for magic, file_format in FORMAT_MAGIC.items():
+        if head.startswith(magic):
+            return file_format
+    return 'csv'
+
+def _open_arrow(path):
+    """
+    Open an Arrow IPC file (random access) or stream through a memory map.
+    """
+    source = pa.memory_map(path, 'r')
+    try:
+        return pa_ipc.open_file(source)
+    except pa.ArrowInvalid:
+        return pa_ipc.open_stream(pa.memory_map(path, 'r'))
+
+def read_schema(path, file_format):
+    """
+    Return [{'name', 'type', 'nullable'}] for a columnar file, with ClickHouse
+    type names as get_columns reports them for delimited files.
+    """
+    _require()
+    if file_format == 'parquet':
+        parquet_file = pq.ParquetFile(path)
+        schema = parquet_file.schema_arrow
+        null_counts = _parquet_null_counts(parquet_file)
+    else:
+        schema = _open_arrow(path).schema
+        null_counts = {}
+
+    columns = []
+    for field in schema:
+        ch_type = arrow_to_clickhouse_type(field.type)
+        # Prefer real null counts from Parquet statistics over the schema flag
+        nullable = null_counts.get(field.name, 1 if field.nullable else 0) > 0
+        if nullable and ch_type.startswith('LowCardinality('):
+            # ClickHouse only nests Nullable inside LowCardinality
+            ch_type = f"LowCardinality(Nullable({ch_type[len('LowCardinality('):-1]}))"
+        elif nullable:
+            ch_type = f'Nullable({ch_type})'
+        columns.append({
+            'name': field.name,
+            'type': ch_type,
+            'nullable': nullable
+        })
+    return columns
+
+def _parquet_null_counts(parquet_file):
+    """
+    Sum per-column null counts over all row groups, where statistics exist.
+    """
+    metadata = parquet_file.metadata
+    counts = {}
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        for j in range(row_group.num_columns):
+            column = row_group.column(j)
+            name = column.path_in_schema
+            stats = column.statistics
+            if stats is None or not stats.has_null_count:
+                # Unknown in one row group means unknown for the file
+                counts[name] = None
+            elif counts.get(name, 0) is not None:
+                counts[name] = counts.get(name, 0) + stats.null_count
+    return {name: count for name, count in counts.items() if count is not None}
+
+def arrow_to_clickhouse_type(arrow_type):
+    if pa.types.is_timestamp(arrow_type):
+        return 'DateTime'
+    if pa.types.is_dictionary(arrow_type):
+        return f'LowCardinality({arrow_to_clickhouse_type(arrow_type.value_type)})'
+    return ARROW_TO_CLICKHOUSE_TYPES.get(str(arrow_type), 'String')
+
+def clickhouse_to_arrow_field(name, ch_type):
+    """
+    Build the Arrow field a ClickHouse result column is written as.
+    """
+    nullable = False
+    match = re.fullmatch(r'(Nullable|LowCardinality)\((.*)\)', ch_type)
+    while match:
+        nullable = nullable or match.group(1) == 'Nullable'
+        ch_type = match.group(2)
+        match = re.fullmatch(r'(Nullable|LowCardinality)\((.*)\)', ch_type)
+
+    precision = re.match(r'DateTime64\((\d+)', ch_type)
+    if precision:
+        digits = int(precision.group(1))
+        arrow_type = pa.timestamp('ms' if digits <= 3 else 'us' if digits <= 6 else 'ns')
+    elif ch_type.startswith('DateTime'):
+        # DateTime and DateTime('timezone')
+        arrow_type = pa.timestamp('s')
+    else:
+        arrow_type = pa.type_for_alias(CLICKHOUSE_TO_ARROW_TYPES.get(ch_type, 'string'))
+    return pa.field(name, arrow_type, nullable=nullable)
+
+def count_rows(path, file_format):
+    """
+    Row count from Parquet metadata or Arrow batch headers, without reading data.
+    """
+    _require()
+    if file_format == 'parquet':
+        return pq.ParquetFile(path).metadata.num_rows
+
+    reader = _open_arrow(path)
+    if isinstance(reader, pa_ipc.RecordBatchFileReader):
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    return sum(batch.num_rows for batch in reader)
+
+def read_slice(path, file_format, columns=None, offset=0, limit=100):
+    """
+    Read limit rows starting at row offset as a DataFrame, touching only the
+    Parquet row groups or Arrow batches that hold them.
+    """
+    _require()
+    columns = columns if columns and len(columns) > 0 else None
+
+    if file_format == 'parquet':
+        parquet_file = pq.ParquetFile(path)
+        groups = [parquet_file.metadata.row_group(i).num_rows
+                  for i in range(parquet_file.metadata.num_row_groups)]
+        tables = []
+        start = 0
+        for i, num_rows in enumerate(groups):
+            if start + num_rows > offset and start < offset + limit:
+                table = parquet_file.read_row_group(i, columns=columns)
+                # slice takes a length, so clip the page to this row group
+                first = max(offset, start)
+                tables.append(table.slice(first - start, min(offset + limit, start + num_rows) - first))
+            start += num_rows
+        if not tables:
+            return _empty_frame(parquet_file.schema_arrow, columns)
+        return pa.concat_tables(tables).to_pandas()
+
+    frames = []
+    rows = 0
+    for df, _ in iter_batches(path, file_format, columns, batch_size=offset + limit):
+        frames.append(df)
+        rows += len(df)
+        if rows >= offset + limit:
+            break
+    if not frames:
+        return _empty_frame(_open_arrow(path).schema, columns)
+    return pd.concat(frames, ignore_index=True).iloc[offset:offset + limit].reset_index(drop=True)
+
+def _empty_frame(schema, columns=None):
+    if columns:
+        schema = pa.schema([schema.field(name) for name in columns])
+    return schema.empty_table().to_pandas()
+
+def iter_batches(path, file_format, columns=None, batch_size=10000):
+    """
+    Yield (DataFrame, fraction of the file read) for at most batch_size rows
+    at a time, reading only the requested columns.
+
+    Parquet is read row group by row group and Arrow through a memory map,
+    so memory stays bounded by the batch size.
+    """
+    _require()
+    columns = columns if columns and len(columns) > 0 else None
+
+    if file_format == 'parquet':
+        parquet_file = pq.ParquetFile(path)
+        total_rows = parquet_file.metadata.num_rows or 1
+        rows_read = 0
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            rows_read += batch.num_rows
+            yield batch.to_pandas(), rows_read / total_rows
+        return
+
+    reader = _open_arrow(path)
+    if isinstance(reader, pa_ipc.RecordBatchFileReader):
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        batch_count = reader.num_record_batches or 1
+    else:
+        batches = iter(reader)
+        batch_count = None
+
+    for i, batch in enumerate(batches):
+        if columns:
+            batch = batch.select(columns)
+        # Arrow batches can be larger than batch_size; slicing is zero-copy
+        for offset in range(0, batch.num_rows, batch_size):
+            fraction = (i + 1) / batch_count if batch_count else None
+            yield batch.slice(offset, batch_size).to_pandas(), fraction
+
+class ColumnarWriter:
+    def __init__(self, sink, columns, file_format, compression=None, row_group_size=ROW_GROUP_SIZE):
+        """
+        Write ClickHouse result rows to a Parquet or Arrow IPC file.
+
+        columns is [(name, ClickHouse type)] as returned with_column_types;
+        rows are buffered and written as row groups (record batches) of
+        row_group_size rows. compression selects the format's internal codec.
+        """
+        _require()
+        self.schema = pa.schema([clickhouse_to_arrow_field(name, ch_type) for name, ch_type in columns])
+        self.row_group_size = row_group_size
+        self._rows = []
+
+        if file_format == 'parquet':
+            self._writer = pq.ParquetWriter(sink, self.schema, compression=compression or 'snappy')
+        elif file_format == 'arrow':
+            options = pa_ipc.IpcWriteOptions(compression=compression) if compression else None
+            self._writer = pa_ipc.new_file(sink, self.schema, options=options)
+        else:
+            raise ValueError(f"Unsupported columnar format: {file_format}")
+
+    def write_rows(self, rows):
+        """
+        Buffer rows, flushing every full row group; returns True if one was written.
+        """
+        self._rows.extend(rows)
+        if len(self._rows) < self.row_group_size:
+            return False
+
+        while len(self._rows) >= self.row_group_size:
+            self._write_group(self._rows[:self.row_group_size])
+            self._rows = self._rows[self.row_group_size:]
+        return True
+
+    def close(self):
+        if self._rows:
+            self._write_group(self._rows)
+            self._rows = []
+        self._writer.close()
+
+    def _write_group(self, rows):
+        arrays = []
+        for field, values in zip(self.schema, zip(*rows)):
+            if pa.types.is_string(field.type):
+                # Types without an Arrow mapping (UUID, Decimal, arrays...) go as text
+                values = [value if value is None or isinstance(value, str) else str(value)
+                          for value in values]
+            arrays.append(pa.array(values, type=field.type))
+
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        if isinstance(self._writer, pq.ParquetWriter):
+            self._writer.write_batch(batch, row_group_size=len(rows))
+        else:
+            self._writer.write_batch(batch)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
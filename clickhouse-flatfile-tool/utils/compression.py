@@ -0,0 +1,106 @@
+import gzip
+import io
+import os
+
+# Optional codecs; gzip is always available
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+CODECS = ('gzip', 'zstd', 'lz4')
+
+# File name suffix written for each codec
+CODEC_SUFFIXES = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+    'lz4': '.lz4',
+}
+
+CODEC_EXTENSIONS = {
+    '.gz': 'gzip',
+    '.gzip': 'gzip',
+    '.zst': 'zstd',
+    '.zstd': 'zstd',
+    '.lz4': 'lz4',
+}
+
+CODEC_MAGIC = {
+    b'\x1f\x8b': 'gzip',
+    b'\x28\xb5\x2f\xfd': 'zstd',
+    b'\x04\x22\x4d\x18': 'lz4',
+}
+
+def detect_codec(path):
+    """
+    Detect the compression codec of a file from its extension or magic bytes.
+    Returns None for uncompressed files.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in CODEC_EXTENSIONS:
+        return CODEC_EXTENSIONS[ext]
+
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    for magic, codec in CODEC_MAGIC.items():
+        if head.startswith(magic):
+            return codec
+    return None
+
+def _require(codec):
+    if codec not in CODECS:
+        raise ValueError(f"Unsupported compression codec: {codec}")
+    if codec == 'zstd' and zstandard is None:
+        raise ValueError("zstd compression requires the zstandard package")
+    if codec == 'lz4' and lz4_frame is None:
+        raise ValueError("lz4 compression requires the lz4 package")
+
+def wrap_reader(raw, codec):
+    """
+    Wrap a binary file object so reads return decompressed bytes.
+
+    The raw file keeps its own position, so raw.tell() reports how much
+    compressed input has been consumed.
+    """
+    if not codec:
+        return raw
+
+    _require(codec)
+    if codec == 'gzip':
+        return gzip.GzipFile(fileobj=raw, mode='rb')
+    if codec == 'zstd':
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=False))
+    return lz4_frame.LZ4FrameFile(raw, mode='rb')
+
+def wrap_writer(raw, codec, level=None):
+    """
+    Wrap a binary file object so writes are compressed on the way out.
+    """
+    if not codec:
+        return raw
+
+    _require(codec)
+    if codec == 'gzip':
+        return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=level or 6)
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=level or 3).stream_writer(raw, closefd=False)
+    return lz4_frame.LZ4FrameFile(raw, mode='wb', compression_level=level or 0)
+
+def open_text(path, codec=None, encoding='utf-8'):
+    """
+    Open a possibly compressed file for reading as text.
+    """
+    if not codec:
+        return open(path, 'r', encoding=encoding, newline='')
+
+    _require(codec)
+    if codec == 'gzip':
+        return gzip.open(path, 'rt', encoding=encoding, newline='')
+    if codec == 'zstd':
+        return zstandard.open(path, 'rt', encoding=encoding, newline='')
+    return lz4_frame.open(path, 'rt', encoding=encoding, newline='')
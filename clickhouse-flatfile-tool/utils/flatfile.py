@@ -1,71 +1,328 @@
 import csv
+import hashlib
+import io
+import math
+import multiprocessing
 import pandas as pd
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from . import columnar
+from .cache import TTLCache
+from .compression import detect_codec, open_text, wrap_reader
+from .rowindex import INDEX_SUFFIX, RowIndex, first_row_end, last_row_end
+
+# Rows read from the head of the file, and the number of extra evenly
+# spaced blocks (sharing the same row budget) read from further in
+SAMPLE_ROWS = 1000
+SAMPLE_STRATA = 4
+
+# Leading bytes hashed to recognise a file again when it has only grown
+FINGERPRINT_BYTES = 64 * 1024
+
+# Uncompressed files at least this large are parsed by a process pool when
+# parse_workers > 1; below it, starting the pool costs more than it saves
+PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+
+# Approximate bytes of the file parsed per task handed to a worker
+PARALLEL_RANGE_BYTES = 16 * 1024 * 1024
+
+# Rows per chunk when get_data assembles a whole file from parallel ranges
+PARALLEL_CHUNK_ROWS = 100000
+
+# Inferred schemas keyed by (path, mtime, size, delimiter, sampling)
+schema_cache = TTLCache(maxsize=256, ttl=3600)
+
+# Integer types from narrowest to widest, with their value ranges
+INTEGER_TYPES = [
+    ('Int8', -2 ** 7, 2 ** 7 - 1),
+    ('Int16', -2 ** 15, 2 ** 15 - 1),
+    ('Int32', -2 ** 31, 2 ** 31 - 1),
+    ('Int64', -2 ** 63, 2 ** 63 - 1),
+]
+
+INTEGER_RANGES = {name: (min_value, max_value) for name, min_value, max_value in INTEGER_TYPES}
+
+INTEGER_PATTERN = r'[+-]?\d+'
+FLOAT_PATTERN = r'[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?|[+-]?(inf|nan)'
+DATE_PATTERN = r'\d{4}-\d{2}-\d{2}'
+DATETIME_PATTERN = r'\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?'
+BOOL_VALUES = {'true', 'false'}
+
+# A sampled string column is low-cardinality when its distinct values are
+# at most this share of its non-null values
+LOW_CARDINALITY_RATIO = 0.1
+
+# pandas dtypes of inferred types for compact reads; nullable integers and
+# booleans hold missing values without widening to float or object
+COMPACT_DTYPES = {
+    'Bool': 'boolean',
+    'Int8': 'Int8',
+    'Int16': 'Int16',
+    'Int32': 'Int32',
+    'Int64': 'Int64',
+    'Float64': 'float64',
+    'Date': 'datetime64[s]',
+    'DateTime': 'datetime64[s]',
+}
+
+# pandas dtypes holding the missing values of Nullable numeric and Bool
+# columns of Parquet and Arrow files, which would otherwise be NaN or objects
+NULLABLE_DTYPES = {
+    'Bool': 'boolean',
+    **{name: name for name in ('Int8', 'Int16', 'Int32', 'Int64', 'UInt8', 'UInt16', 'UInt32', 'UInt64',
+                               'Float32', 'Float64')},
+}
+
+# Formats date and datetime columns are parsed with
+DATETIME_FORMATS = {
+    'Date': '%Y-%m-%d',
+    'DateTime': 'ISO8601',
+}
+
+# Rows per chunk of the full pass that checks a compact schema
+COMPACT_SCAN_ROWS = 100000
+
+# Rows per chunk of the full pass that settles the dtypes of chunked reads
+DTYPE_SCAN_ROWS = 100000
+
+def list_input_files(paths):
+    """
+    Expand a list of file and directory paths into the files to import.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            # Import a directory's regular files in name order
+            for name in sorted(os.listdir(path)):
+                child = os.path.join(path, name)
+                if (os.path.isfile(child) and not name.startswith('.')
+                        and not name.endswith((INDEX_SUFFIX, INDEX_SUFFIX + '.tmp'))):
+                    files.append(child)
+        else:
+            files.append(path)
+    return files
+
+def infer_column_type(values):
+    """
+    Infer the ClickHouse type of one column from a sample of string values.
+    """
+    nullable = bool(values.isna().any())
+    values = values.dropna().str.strip()
+
+    dtype = 'String'
+    if len(values) > 0:
+        if values.str.lower().isin(BOOL_VALUES).all():
+            dtype = 'Bool'
+        elif values.str.fullmatch(INTEGER_PATTERN).all():
+            numbers = pd.to_numeric(values, errors='coerce')
+            if numbers.notna().all():
+                low, high = int(numbers.min()), int(numbers.max())
+                dtype = next((name for name, min_value, max_value in INTEGER_TYPES
+                              if min_value <= low and high <= max_value), 'String')
+        elif values.str.fullmatch(FLOAT_PATTERN, case=False).all():
+            dtype = 'Float64'
+        elif values.str.fullmatch(DATE_PATTERN).all():
+            if pd.to_datetime(values, format='%Y-%m-%d', errors='coerce').notna().all():
+                dtype = 'Date'
+        elif values.str.fullmatch(DATETIME_PATTERN).all():
+            if pd.to_datetime(values, format='ISO8601', errors='coerce').notna().all():
+                dtype = 'DateTime'
+
+    low_cardinality = (dtype == 'String' and len(values) > 0
+                       and values.nunique() <= LOW_CARDINALITY_RATIO * len(values))
+
+    return {
+        'name': values.name,
+        'type': f'Nullable({dtype})' if nullable else dtype,
+        'nullable': nullable,
+        'low_cardinality': bool(low_cardinality)
+    }
+
+def base_type(column):
+    """
+    Get a column's ClickHouse type without its Nullable wrapper.
+    """
+    return column['type'][len('Nullable('):-1] if column['nullable'] else column['type']
+
+def compact_type(column, stats):
+    """
+    Map one column from get_columns to its compact pandas dtype and the
+    ClickHouse type a table created for it gets.
+
+    stats, from a full pass over the file, decides nullability and integer
+    width; the sample only decides the kind of each column.
+    """
+    base = base_type(column)
+    nullable = stats['nulls']
+    if base in INTEGER_RANGES and stats['min'] is not None:
+        base = next(name for name, min_value, max_value in INTEGER_TYPES
+                    if min_value <= stats['min'] and stats['max'] <= max_value)
+    ch_type = f'Nullable({base})' if nullable else base
+    
+    if base == 'String' and column.get('low_cardinality'):
+        return {
+            'dtype': 'category',
+            'type': 'LowCardinality(Nullable(String))' if nullable else 'LowCardinality(String)'
+        }
+    
+    if base == 'Float64' and nullable:
+        # A masked float keeps missing values apart from NaN, so they insert as NULL
+        return {'dtype': 'Float64', 'type': ch_type}
+    
+    # Remaining strings are Arrow-backed when pyarrow is installed
+    string_dtype = pd.StringDtype('pyarrow' if columnar.pa is not None else 'python')
+    return {'dtype': COMPACT_DTYPES.get(base, string_dtype), 'type': ch_type}
 
 class FlatFileManager:
-    def __init__(self, filepath, delimiter=','):
+    def __init__(self, filepath, delimiter=',', compression=None, file_format=None, parse_workers=1,
+                 compact=False):
         """
         Initialize a flat file manager with file path and delimiter.
+        The compression codec and the file format ('csv', 'parquet' or
+        'arrow') are detected from the file when not given. With
+        parse_workers > 1, large uncompressed delimited files are parsed by
+        that many worker processes in get_data and iter_chunks. With
+        compact, delimited files are read with the dtypes of
+        compact_schema() rather than pandas' defaults.
         """
         self.filepath = filepath
         self.delimiter = delimiter
+        self.parse_workers = parse_workers
+        self.compact = compact
+        
+        # Bytes consumed so far by iter_chunks, for progress reporting
+        self.bytes_read = 0
+        
+        # Dtypes settled by chunk_dtypes, keyed by (columns, byte range)
+        self._chunk_dtypes = {}
+        
+        # Every column's compact schema, resolved once by compact_schema
+        self._compact_columns = None
         
         # Validate file existence
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"File not found: {filepath}")
+        
+        self.file_format = file_format or columnar.detect_format(filepath)
+        if self.file_format not in columnar.FILE_FORMATS:
+            raise ValueError(f"Unsupported file format: {self.file_format}")
+        
+        # Parquet and Arrow compress internally
+        self.codec = None if self.is_columnar else compression or detect_codec(filepath)
     
-    def get_columns(self):
+    @property
+    def is_columnar(self):
+        return self.file_format != 'csv'
+    
+    def get_columns(self, sample_rows=SAMPLE_ROWS, strata=SAMPLE_STRATA):
         """
-        Get column names from the file header.
+        Get column names and inferred ClickHouse types from the file.
+
+        Types come from one sampled pass over the file and are cached per
+        path, mtime and size, so preview and import reuse them.
         """
+        if self.is_columnar:
+            # Column types come straight from the file's schema
+            return columnar.read_schema(self.filepath, self.file_format)
+        
         try:
-            # Try pandas for more robust handling
-            df = pd.read_csv(self.filepath, delimiter=self.delimiter, nrows=0)
-            columns = []
-            
-            for col in df.columns:
-                # Get data type from first few rows if possible
-                dtype = 'String'  # Default
-                try:
-                    sample_df = pd.read_csv(self.filepath, delimiter=self.delimiter, usecols=[col], nrows=10)
-                    if pd.api.types.is_numeric_dtype(sample_df[col]):
-                        if pd.api.types.is_integer_dtype(sample_df[col]):
-                            dtype = 'Int64'
-                        else:
-                            dtype = 'Float64'
-                    elif pd.api.types.is_datetime64_dtype(sample_df[col]):
-                        dtype = 'DateTime'
-                    elif pd.api.types.is_bool_dtype(sample_df[col]):
-                        dtype = 'Boolean'
-                except:
-                    # If error occurs, keep the default
-                    pass
-                
-                columns.append({
-                    'name': col,
-                    'type': dtype
-                })
+            stat = os.stat(self.filepath)
+            key = (os.path.abspath(self.filepath), stat.st_mtime_ns, stat.st_size,
+                   self.delimiter, sample_rows, strata)
+            columns = schema_cache.get(key)
+            if columns is None:
+                sample = self._read_sample(sample_rows, strata)
+                columns = [infer_column_type(sample[col]) for col in sample.columns]
+                schema_cache.set(key, columns)
             
-            return columns
+            # Hand out copies so callers cannot alter the cached schema
+            return [dict(column) for column in columns]
         except Exception as e:
             # Fallback to CSV module
-            with open(self.filepath, 'r', newline='') as f:
+            with open_text(self.filepath, self.codec) as f:
                 reader = csv.reader(f, delimiter=self.delimiter)
                 header = next(reader)
                 
-                return [{'name': col, 'type': 'String'} for col in header]
+                return [{'name': col, 'type': 'String', 'nullable': False} for col in header]
+    
+    def compact_schema(self, columns=None):
+        """
+        Get [{'name', 'type', 'dtype'}] for the selected columns: the
+        pandas dtype each is parsed as by compact reads, and its ClickHouse
+        type for CREATE TABLE.
+
+        The sample picks each column's kind; one full pass over the file
+        (cached like the schema) then finds which columns hold missing
+        values and the range of each integer column, so the narrowest
+        integer width and Nullable hold for every row. Values that do not
+        parse as their sampled kind fail here, before any table is created.
+        Strings with few distinct values in the sample become categoricals
+        and LowCardinality columns.
+
+        The schema is resolved once per manager, so every chunk read by it
+        gets the same dtypes even after the cached scan expires or the
+        file changes.
+        """
+        if self._compact_columns is None:
+            stats = self._scan_compact()
+            self._compact_columns = [{'name': column['name'], **compact_type(column, stats[column['name']])}
+                                     for column in self.get_columns()]
+        
+        selected = set(columns) if columns and len(columns) > 0 else None
+        return [dict(column) for column in self._compact_columns if selected is None or column['name'] in selected]
+    
+    def table_types(self, columns=None):
+        """
+        Get {column: ClickHouse type} for creating the import table of a
+        compact read or a Parquet or Arrow file, or None when the types
+        should follow the DataFrame.
+
+        Parquet and Arrow tables get the types get_columns reports.
+        """
+        if self.is_columnar:
+            selected = set(columns) if columns and len(columns) > 0 else None
+            return {column['name']: column['type'] for column in self.get_columns()
+                    if selected is None or column['name'] in selected}
+        if not self.compact:
+            return None
+        return {column['name']: column['type'] for column in self.compact_schema(columns)}
     
-    def preview_data(self, columns=None, limit=100):
+    def preview_data(self, columns=None, limit=100, offset=0):
         """
-        Get preview data for selected columns.
+        Get a page of preview data for selected columns, starting at data row offset.
         """
         try:
             # Use only selected columns if specified
             usecols = columns if columns and len(columns) > 0 else None
             
-            # Read data with pandas
-            df = pd.read_csv(self.filepath, delimiter=self.delimiter, 
-                             nrows=limit, usecols=usecols)
+            if self.is_columnar:
+                df = columnar.read_slice(self.filepath, self.file_format, usecols, offset, limit)
+                return df.to_dict('records')
+            
+            index = self.row_index() if offset > 0 else None
+            
+            if offset <= 0:
+                # Read data with pandas
+                with self._open() as f:
+                    df = pd.read_csv(f, delimiter=self.delimiter, 
+                                     nrows=limit, usecols=usecols)
+            elif index is not None:
+                # Jump to the nearest checkpoint and parse only from there;
+                # skiprows would also count the empty lines pandas skips
+                start, skip = index.locate(offset)
+                with open(self.filepath, 'rb') as f:
+                    f.seek(start)
+                    df = pd.read_csv(f, delimiter=self.delimiter, header=None, names=self._header(),
+                                     nrows=skip + limit, usecols=usecols)
+                df = df.iloc[skip:]
+            else:
+                # Compressed files cannot seek, so parse past the skipped rows
+                with self._open() as f:
+                    df = pd.read_csv(f, delimiter=self.delimiter, skiprows=range(1, offset + 1),
+                                     nrows=limit, usecols=usecols)
             
             # Convert to dictionary format for JSON response
             return df.to_dict('records')
@@ -80,20 +337,518 @@ class FlatFileManager:
             # Use only selected columns if specified
             usecols = columns if columns and len(columns) > 0 else None
             
+            if self.is_columnar:
+                frames = [df for df, _ in columnar.iter_batches(self.filepath, self.file_format, usecols)]
+                return pd.concat(frames, ignore_index=True)
+            
+            if self._parallel():
+                return self._finish_compact(self._get_data_parallel(usecols))
+            
             # Read data with pandas
-            df = pd.read_csv(self.filepath, delimiter=self.delimiter, usecols=usecols)
+            with self._open() as f:
+                df = pd.read_csv(f, delimiter=self.delimiter, usecols=usecols, dtype=self._read_dtypes(usecols))
             
-            return df
+            return self._finish_compact(df)
         except Exception as e:
             raise ValueError(f"Failed to get data: {str(e)}")
+
+    def iter_chunks(self, columns=None, chunk_size=10000, byte_range=None):
+        """
+        Yield data as pandas DataFrames of at most chunk_size rows.
+
+        byte_range, a (start, end) pair of row boundaries in an uncompressed
+        delimited file, limits parsing to the rows between them. Every chunk
+        is read with the dtypes of chunk_dtypes().
+        """
+        # Use only selected columns if specified
+        usecols = columns if columns and len(columns) > 0 else None
+
+        self.bytes_read = 0
+        dtype = self.chunk_dtypes(usecols, byte_range)
+        if byte_range is not None:
+            yield from self._iter_range_chunks(usecols, chunk_size, *byte_range, dtype=dtype)
+            return
+        
+        if self._parallel():
+            for chunks in self._iter_parallel_ranges(usecols, chunk_size, dtype=dtype):
+                for chunk in chunks:
+                    yield self._finish_compact(chunk)
+            return
+        
+        if self.is_columnar:
+            # Nullable columns of the schema keep their missing values apart
+            nullable = {column['name']: NULLABLE_DTYPES.get(base_type(column)) for column in self.get_columns()
+                        if column['nullable']}
+            
+            # Row groups are read one at a time; progress is the share of rows read
+            size = os.path.getsize(self.filepath)
+            for chunk, fraction in columnar.iter_batches(self.filepath, self.file_format, usecols, chunk_size):
+                if fraction is not None:
+                    self.bytes_read = int(size * fraction)
+                yield chunk.astype({name: dtype for name, dtype in nullable.items()
+                                    if dtype and name in chunk.columns})
+            return
+        
+        with open(self.filepath, 'rb') as raw, wrap_reader(raw, self.codec) as f:
+            try:
+                # Let pandas stream the file so only one chunk is held in memory
+                reader = pd.read_csv(f, delimiter=self.delimiter, usecols=usecols,
+                                     chunksize=chunk_size, dtype=dtype)
+            except Exception as e:
+                raise ValueError(f"Failed to get data: {str(e)}")
+
+            with reader:
+                for chunk in reader:
+                    # Position in the (possibly compressed) file on disk;
+                    # the parser reads ahead, so this is approximate
+                    self.bytes_read = raw.tell()
+                    yield self._finish_compact(chunk)
+
+    def chunk_dtypes(self, columns=None, byte_range=None):
+        """
+        Get the dtype argument of read_csv that iter_chunks reads with.
+
+        Compact reads use their compact dtypes. Otherwise one pass over the
+        file (or the rows of byte_range) finds the dtype pandas gives each
+        column when it reads all the rows at once, so a column whose blanks,
+        decimals or text come after the first chunk is typed for them from
+        the first chunk on, and a table created from that chunk fits the
+        rest. The result is kept for later reads by this manager; once the
+        whole file has been scanned, it also covers every byte range.
+        """
+        if self.compact or self.is_columnar:
+            return self._read_dtypes(columns)
+        
+        usecols = tuple(columns) if columns and len(columns) > 0 else None
+        for key in ((usecols, None), (usecols, byte_range)):
+            if key in self._chunk_dtypes:
+                return self._chunk_dtypes[key]
+        
+        usecols_list = list(usecols) if usecols else None
+        if byte_range is not None:
+            dtypes = _scan_range_dtypes(self.filepath, self.delimiter, self._header(), usecols_list, *byte_range)
+        elif self._parallel():
+            ranges = self._parallel_ranges(PARALLEL_CHUNK_ROWS)
+            header = self._header()
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=context) as executor:
+                futures = [executor.submit(_scan_range_dtypes, self.filepath, self.delimiter, header, usecols_list,
+                                           start, end) for start, end, _ in ranges]
+                dtypes = None
+                for future in futures:
+                    dtypes = _widen_dtypes(dtypes, future.result())
+        else:
+            with self._open() as f, pd.read_csv(f, delimiter=self.delimiter, usecols=usecols_list,
+                                                chunksize=DTYPE_SCAN_ROWS) as reader:
+                dtypes = None
+                for chunk in reader:
+                    dtypes = _widen_dtypes(dtypes, _frame_dtypes(chunk))
+        
+        self._chunk_dtypes[(usecols, byte_range)] = dtypes
+        return dtypes
     
     def count_rows(self):
         """
         Count the total number of rows in the file (excluding header).
         """
         try:
+            if self.is_columnar:
+                return columnar.count_rows(self.filepath, self.file_format)
+            
+            # Uncompressed files answer from the persisted row index
+            index = self.row_index()
+            if index is not None:
+                return index.row_count
+            
             # Fast way to count rows
-            with open(self.filepath, 'r') as f:
+            with self._open() as f:
                 return sum(1 for _ in f) - 1  # Subtract 1 for header
         except Exception as e:
-            raise ValueError(f"Failed to count rows: {str(e)}")
\ No newline at end of file
+            raise ValueError(f"Failed to count rows: {str(e)}")
+    
+    def appended_range(self, checkpoint=None):
+        """
+        Get the byte range of complete rows added since checkpoint, plus the
+        checkpoint to save once they have been imported.
+
+        checkpoint is a dict previously returned by this method, or None to
+        start from the first data row. A checkpoint that no longer matches the
+        file (truncated, or its leading bytes changed) also starts over;
+        the returned reset flag tells the caller that happened.
+        """
+        if self.codec or self.is_columnar:
+            raise ValueError("Incremental import needs an uncompressed delimited file")
+        
+        start = None
+        reset = False
+        size = os.path.getsize(self.filepath)
+        if checkpoint:
+            valid = (checkpoint['offset'] <= size and
+                     self._fingerprint(checkpoint['fingerprint_bytes']) == checkpoint['fingerprint'])
+            if valid:
+                start = checkpoint['offset']
+            else:
+                reset = True
+        if start is None:
+            start = first_row_end(self.filepath, self.delimiter)
+        
+        # Stop before a trailing row that is still being written
+        end = last_row_end(self.filepath, start, self.delimiter)
+        
+        fingerprint_bytes = min(end, FINGERPRINT_BYTES)
+        new_checkpoint = {
+            'offset': end,
+            'fingerprint': self._fingerprint(fingerprint_bytes),
+            'fingerprint_bytes': fingerprint_bytes,
+        }
+        return (start, end), new_checkpoint, reset
+    
+    def row_index(self, build=True):
+        """
+        Get the sidecar row index of an uncompressed file, building it if needed.
+
+        Returns None for compressed and columnar files, or when build is
+        False and no up-to-date index has been saved yet.
+        """
+        if self.codec or self.is_columnar:
+            return None
+        if build:
+            return RowIndex.load_or_build(self.filepath, delimiter=self.delimiter)
+        return RowIndex.load(self.filepath, self.delimiter)
+    
+    def _iter_range_chunks(self, usecols, chunk_size, start, end, dtype=None):
+        if self.codec or self.is_columnar:
+            raise ValueError("Byte ranges need an uncompressed delimited file")
+        if start >= end:
+            return
+        
+        header = self._header()
+        with open(self.filepath, 'rb') as raw:
+            raw.seek(start)
+            f = io.BufferedReader(_ByteRange(raw, end - start))
+            reader = pd.read_csv(f, delimiter=self.delimiter, header=None, names=header,
+                                 usecols=usecols, chunksize=chunk_size, dtype=dtype)
+            with reader:
+                for chunk in reader:
+                    self.bytes_read = raw.tell() - start
+                    yield self._finish_compact(chunk)
+    
+    def _parallel(self):
+        return (self.parse_workers > 1 and not self.codec and not self.is_columnar
+                and os.path.getsize(self.filepath) >= PARALLEL_MIN_BYTES)
+    
+    def _parallel_ranges(self, chunk_size):
+        """
+        Cut the data rows into (start, end, first_row) byte ranges of about
+        PARALLEL_RANGE_BYTES, each starting on a multiple of chunk_size rows,
+        so a range parses into exactly the chunks the serial reader yields.
+        """
+        index = self.row_index()
+        
+        # Ranges may only start on index checkpoints that are also chunk starts
+        aligned_rows = chunk_size * index.checkpoint_rows // math.gcd(chunk_size, index.checkpoint_rows)
+        step = aligned_rows // index.checkpoint_rows
+        
+        bytes_per_step = (index.size - index.data_start) / max(index.row_count, 1) * aligned_rows
+        step *= max(int(PARALLEL_RANGE_BYTES // max(bytes_per_step, 1)), 1)
+        
+        ranges = []
+        for first in range(0, len(index.offsets), step):
+            end = index.offsets[first + step] if first + step < len(index.offsets) else index.size
+            ranges.append((index.offsets[first], end, first * index.checkpoint_rows))
+        return ranges
+    
+    def _iter_parallel_ranges(self, usecols, chunk_size, ranges=None, dtype=None):
+        """
+        Parse byte ranges in a process pool and yield each range's list of
+        chunks in file order, keeping at most two ranges per worker in flight.
+        """
+        header = self._header()
+        ranges = iter(ranges if ranges is not None else self._parallel_ranges(chunk_size))
+        
+        # Spawned workers do not inherit the locks of a threaded web server
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=context) as executor:
+            pending = deque()
+            
+            def submit_next():
+                for start, end, first_row in ranges:
+                    pending.append((end, executor.submit(_parse_range, self.filepath, self.delimiter, header, usecols,
+                                                         chunk_size, start, end, first_row, dtype)))
+                    return
+            
+            for _ in range(self.parse_workers * 2):
+                submit_next()
+            try:
+                while pending:
+                    end, future = pending.popleft()
+                    chunks = future.result()
+                    submit_next()
+                    self.bytes_read = end
+                    yield chunks
+            finally:
+                for _, future in pending:
+                    future.cancel()
+    
+    def _get_data_parallel(self, usecols):
+        """
+        Read the whole file through the process pool.
+
+        Ranges infer their column types independently. Numeric columns
+        widen on concat, as one serial pass would; a column that is text in
+        any range is re-read as text wherever a range parsed it as numbers
+        or booleans, so values keep their original spelling.
+        """
+        ranges = self._parallel_ranges(PARALLEL_CHUNK_ROWS)
+        dtype = self._read_dtypes(usecols)
+        parts = [pd.concat(chunks) if chunks else None
+                 for chunks in self._iter_parallel_ranges(usecols, PARALLEL_CHUNK_ROWS, ranges, dtype)]
+        if dtype is not None:
+            # Explicit dtypes leave no per-range type conflicts to resolve
+            parts = [part for part in parts if part is not None]
+            if not parts:
+                with self._open() as f:
+                    return pd.read_csv(f, delimiter=self.delimiter, usecols=usecols, dtype=dtype)
+            return pd.concat(parts, ignore_index=True)
+        
+        def is_text(series):
+            # Booleans with blanks are object columns too, but are not text
+            return pd.api.types.infer_dtype(series, skipna=True) in ('string', 'mixed')
+        
+        text_columns = {col for part in parts if part is not None for col in part.columns if is_text(part[col])}
+        for i, part in enumerate(parts):
+            if part is None:
+                continue
+            conflicts = [col for col in text_columns if not is_text(part[col]) and part[col].notna().any()]
+            if conflicts:
+                start, end, first_row = ranges[i]
+                chunks = _parse_range(self.filepath, self.delimiter, self._header(), usecols, PARALLEL_CHUNK_ROWS,
+                                      start, end, first_row, {col: str for col in conflicts})
+                parts[i] = pd.concat(chunks)
+        
+        parts = [part for part in parts if part is not None]
+        if not parts:
+            with self._open() as f:
+                return pd.read_csv(f, delimiter=self.delimiter, usecols=usecols)
+        return pd.concat(parts, ignore_index=True)
+    
+    def _read_dtypes(self, usecols):
+        """
+        Get the dtype argument of read_csv for a compact read, or None.
+        Dates are read as text and integers as Int64, then narrowed by
+        _finish_compact; pandas would wrap integers that overflow silently.
+        """
+        if not self.compact or self.is_columnar:
+            return None
+        
+        dtypes = {}
+        for column in self.compact_schema(usecols):
+            if column['type'].startswith(('Date', 'Nullable(Date')):
+                dtypes[column['name']] = str
+            elif column['dtype'] in INTEGER_RANGES:
+                dtypes[column['name']] = 'Int64'
+            else:
+                dtypes[column['name']] = column['dtype']
+        return dtypes
+    
+    def _finish_compact(self, df):
+        """
+        Parse the date columns of a compact read, narrow its integers, and
+        restore categoricals that concatenating chunks turned into objects.
+        """
+        if not self.compact or self.is_columnar:
+            return df
+        for column in self.compact_schema(list(df.columns)):
+            name = column['name']
+            base = column['type'].replace('Nullable(', '').rstrip(')')
+            if column['dtype'] in INTEGER_RANGES and str(df[name].dtype) != column['dtype']:
+                low, high = INTEGER_RANGES[column['dtype']]
+                if df[name].notna().any() and (df[name].min() < low or df[name].max() > high):
+                    # Only possible when the file changed after it was scanned
+                    raise ValueError(f"Column {name} has values outside the {column['dtype']} range found "
+                                     f"when the file was scanned")
+                df[name] = df[name].astype(column['dtype'])
+            elif base in DATETIME_FORMATS and not pd.api.types.is_datetime64_any_dtype(df[name]):
+                df[name] = pd.to_datetime(df[name], format=DATETIME_FORMATS[base]).astype(column['dtype'])
+            elif column['dtype'] == 'category' and not isinstance(df[name].dtype, pd.CategoricalDtype):
+                df[name] = df[name].astype('category')
+        return df
+    
+    def _scan_compact(self):
+        """
+        Read the whole file once with wide nullable dtypes and return
+        {column: {'nulls', 'min', 'max'}}, min and max for integer columns.
+        """
+        stat = os.stat(self.filepath)
+        key = (os.path.abspath(self.filepath), stat.st_mtime_ns, stat.st_size, self.delimiter, 'compact')
+        stats = schema_cache.get(key)
+        if stats is not None:
+            return stats
+        
+        columns = self.get_columns()
+        wide_dtypes = {'Bool': 'boolean', 'Float64': 'Float64', **{name: 'Int64' for name in INTEGER_RANGES}}
+        dtypes = {column['name']: wide_dtypes.get(base_type(column), str) for column in columns}
+        stats = {column['name']: {'nulls': False, 'min': None, 'max': None} for column in columns}
+        
+        try:
+            with self._open() as f, pd.read_csv(f, delimiter=self.delimiter, dtype=dtypes,
+                                                chunksize=COMPACT_SCAN_ROWS) as reader:
+                for chunk in reader:
+                    for column in columns:
+                        name, base = column['name'], base_type(column)
+                        values = chunk[name]
+                        column_stats = stats[name]
+                        column_stats['nulls'] = column_stats['nulls'] or bool(values.isna().any())
+                        values = values.dropna()
+                        if len(values) == 0:
+                            continue
+                        if base in INTEGER_RANGES:
+                            low, high = int(values.min()), int(values.max())
+                            if column_stats['min'] is not None:
+                                low = min(column_stats['min'], low)
+                                high = max(column_stats['max'], high)
+                            column_stats['min'], column_stats['max'] = low, high
+                        elif base in DATETIME_FORMATS:
+                            pd.to_datetime(values, format=DATETIME_FORMATS[base])
+        except (ValueError, TypeError, OverflowError) as e:
+            raise ValueError(f"File does not fit its sampled column types: {str(e)}; "
+                             f"import it without compact dtypes")
+        
+        schema_cache.set(key, stats)
+        return stats
+    
+    def _header(self):
+        """
+        Get the column names from the header row.
+        """
+        with self._open() as f:
+            return list(pd.read_csv(f, delimiter=self.delimiter, nrows=0).columns)
+    
+    def _fingerprint(self, nbytes):
+        with open(self.filepath, 'rb') as f:
+            return hashlib.sha256(f.read(nbytes)).hexdigest()
+    
+    def _read_sample(self, sample_rows, strata):
+        """
+        Read the head of the file plus, for uncompressed files, evenly spaced
+        blocks further in, every value as a string.
+
+        Blocks start from row index checkpoints, so a block never begins
+        inside a quoted field that spans lines.
+        """
+        with self._open() as f:
+            head = pd.read_csv(f, delimiter=self.delimiter, nrows=sample_rows,
+                               dtype=str, keep_default_na=True)
+
+        # Compressed streams cannot seek, so they are sampled from the head only
+        if self.codec or strata <= 0 or len(head) < sample_rows:
+            return head
+
+        index = self.row_index()
+        blocks = [head]
+        rows_per_stratum = max(sample_rows // strata, 1)
+        with open(self.filepath, 'rb') as f:
+            for i in range(1, strata + 1):
+                row = index.row_count * i // (strata + 1)
+                if row < sample_rows:
+                    # Already in the head sample
+                    continue
+                offset, skip = index.locate(row)
+                f.seek(offset)
+                block = pd.read_csv(f, delimiter=self.delimiter, header=None, names=list(head.columns),
+                                    nrows=skip + rows_per_stratum, dtype=str, keep_default_na=True,
+                                    on_bad_lines='skip')
+                blocks.append(block.iloc[skip:])
+
+        return pd.concat(blocks, ignore_index=True)
+    
+    @contextmanager
+    def _open(self):
+        """
+        Open the file as a binary stream, decompressing it on the fly if needed.
+        """
+        with open(self.filepath, 'rb') as raw, wrap_reader(raw, self.codec) as f:
+            yield f
+
+class _ByteRange(io.RawIOBase):
+    """
+    Read-only view of the next `length` bytes of a binary file.
+    """
+    def __init__(self, raw, length):
+        super().__init__()
+        self._raw = raw
+        self._remaining = length
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        data = self._raw.read(size)
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+def _parse_range(filepath, delimiter, header, usecols, chunk_size, start, end, first_row, dtype=None):
+    """
+    Parse rows between two byte offsets into chunks of chunk_size rows,
+    indexed by their row number in the file; runs in a worker process.
+    """
+    chunks = []
+    if start >= end:
+        return chunks
+    
+    with open(filepath, 'rb') as raw:
+        raw.seek(start)
+        f = io.BufferedReader(_ByteRange(raw, end - start))
+        reader = pd.read_csv(f, delimiter=delimiter, header=None, names=header,
+                             usecols=usecols, chunksize=chunk_size, dtype=dtype)
+        with reader:
+            for chunk in reader:
+                chunk.index = pd.RangeIndex(first_row, first_row + len(chunk))
+                first_row += len(chunk)
+                chunks.append(chunk)
+    return chunks
+
+def _scan_range_dtypes(filepath, delimiter, header, usecols, start, end):
+    """
+    Get the dtypes pandas gives the columns of the rows between two byte
+    offsets read at once, or None when there are none; runs in a worker
+    process for parallel scans.
+    """
+    if start >= end:
+        return None
+    
+    dtypes = None
+    with open(filepath, 'rb') as raw:
+        raw.seek(start)
+        f = io.BufferedReader(_ByteRange(raw, end - start))
+        with pd.read_csv(f, delimiter=delimiter, header=None, names=header, usecols=usecols,
+                         chunksize=DTYPE_SCAN_ROWS) as reader:
+            for chunk in reader:
+                dtypes = _widen_dtypes(dtypes, _frame_dtypes(chunk))
+    return dtypes
+
+def _frame_dtypes(df):
+    return {name: str(dtype) for name, dtype in df.dtypes.items()}
+
+def _widen_dtypes(dtypes, other):
+    """
+    Combine the {column: dtype} of two parts of a file the way one read of
+    both would type them: integers with floats become floats, and any
+    other mix becomes object.
+    """
+    if dtypes is None or other is None:
+        return other if dtypes is None else dtypes
+    
+    widened = {}
+    for name, dtype in dtypes.items():
+        if dtype == other[name]:
+            widened[name] = dtype
+        elif {dtype, other[name]} <= {'int64', 'float64'}:
+            widened[name] = 'float64'
+        else:
+            widened[name] = 'object'
+    return widened
@@ -0,0 +1,168 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+class JobCancelled(Exception):
+    """
+    Raised inside a running transfer when its job has been cancelled.
+    """
+
+class Job:
+    def __init__(self, kind):
+        """
+        Track the progress and outcome of one background transfer.
+        """
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = 'pending'
+        self.rows_processed = 0
+        self.bytes_processed = 0
+        self.total_rows = None
+        self.total_bytes = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+
+    def start(self, total_rows=None, total_bytes=None):
+        """
+        Record the expected size of the transfer, when it is known.
+        """
+        with self._lock:
+            if total_rows is not None:
+                self.total_rows = total_rows
+            if total_bytes is not None:
+                self.total_bytes = total_bytes
+
+    def advance(self, rows=0, bytes=0):
+        """
+        Add processed rows and bytes; raises JobCancelled once cancelled.
+        """
+        if self._cancel_event.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+        with self._lock:
+            self.rows_processed += rows
+            self.bytes_processed += bytes
+
+    def cancel(self):
+        """
+        Ask the running transfer to stop at its next progress update.
+        """
+        self._cancel_event.set()
+        with self._lock:
+            if self.status == 'pending':
+                self.status = 'cancelled'
+                self.finished_at = time.time()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.status in ('completed', 'failed', 'cancelled')
+
+    def to_dict(self):
+        """
+        Snapshot of the job state for JSON responses.
+        """
+        with self._lock:
+            end = self.finished_at or time.time()
+            elapsed = end - self.started_at if self.started_at else 0
+            rows_per_sec = self.rows_processed / elapsed if elapsed > 0 else 0
+            bytes_per_sec = self.bytes_processed / elapsed if elapsed > 0 else 0
+
+            # Estimate remaining time from whichever total is known
+            eta = None
+            if self.status == 'running':
+                if self.total_rows and rows_per_sec > 0:
+                    eta = max(self.total_rows - self.rows_processed, 0) / rows_per_sec
+                elif self.total_bytes and bytes_per_sec > 0:
+                    eta = max(self.total_bytes - self.bytes_processed, 0) / bytes_per_sec
+
+            return {
+                'job_id': self.id,
+                'kind': self.kind,
+                'status': self.status,
+                'rows_processed': self.rows_processed,
+                'bytes_processed': self.bytes_processed,
+                'total_rows': self.total_rows,
+                'total_bytes': self.total_bytes,
+                'elapsed_seconds': round(elapsed, 3),
+                'rows_per_second': round(rows_per_sec, 1),
+                'bytes_per_second': round(bytes_per_sec, 1),
+                'eta_seconds': round(eta, 1) if eta is not None else None,
+                'result': self.result,
+                'error': self.error,
+            }
+
+class JobManager:
+    def __init__(self, max_workers=4, max_finished_jobs=100):
+        """
+        Run transfers on a thread pool and keep their progress for polling.
+        """
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ingest-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, func):
+        """
+        Schedule func(job) in the background and return the new Job.
+        """
+        job = Job(kind)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+
+        self._executor.submit(self._run, job, func)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """
+        Cancel a job; returns None when the job id is unknown.
+        """
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def _run(self, job, func):
+        if job.cancelled:
+            return
+
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.result = func(job)
+            job.status = 'completed'
+        except JobCancelled:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self):
+        """
+        Forget the oldest finished jobs beyond max_finished_jobs.
+        """
+        finished = [job for job in self._jobs.values() if job.finished]
+        excess = len(finished) - self.max_finished_jobs
+        for job in sorted(finished, key=lambda j: j.created_at)[:max(excess, 0)]:
+            del self._jobs[job.id]
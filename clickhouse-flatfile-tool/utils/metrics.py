@@ -0,0 +1,163 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+# Functions listed in a per-transfer profile summary
+PROFILE_TOP_FUNCTIONS = 25
+
+class TransferMetrics:
+    def __init__(self, kind):
+        """
+        Time spent per stage, plus rows and bytes moved, for one transfer.
+
+        Stages are named by the code that times them ('parse', 'convert',
+        'insert', 'query', 'write'...); time outside any stage shows up as
+        'other' in to_dict(). Parallel transfers add up stage time over all
+        their threads, so stages can sum to more than the wall time.
+        """
+        self.kind = kind
+        self.rows = 0
+        self.bytes = 0
+        self.stages = {}
+        self.started_at = None
+        self.elapsed = 0.0
+        self.profile = None
+        self.batching = None  # batch or block sizes chosen by the transfer
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Add the time spent inside the block to stage name.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def timed(self, iterable, name):
+        """
+        Iterate over iterable, counting the time spent producing each item
+        (not consuming it) as stage name.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def add(self, rows=0, bytes=0):
+        with self._lock:
+            self.rows += rows
+            self.bytes += bytes
+
+    @contextmanager
+    def track(self, registry=None, profile=False):
+        """
+        Measure the whole transfer, then record it in registry with its
+        outcome. With profile, the transfer runs under cProfile and a text
+        summary of the slowest functions is kept in self.profile.
+        """
+        profiler = cProfile.Profile() if profile else None
+        self.started_at = time.time()
+        start = time.perf_counter()
+        status = 'failed'
+        if profiler:
+            profiler.enable()
+        try:
+            yield self
+            status = 'completed'
+        finally:
+            if profiler:
+                profiler.disable()
+                out = io.StringIO()
+                pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+                self.profile = out.getvalue()
+            self.elapsed = time.perf_counter() - start
+            if registry is not None:
+                registry.observe(self, status)
+
+    def to_dict(self):
+        """
+        Throughput and the time split per stage, for API responses.
+        """
+        stages = dict(self.stages)
+        stages['other'] = max(self.elapsed - sum(stages.values()), 0.0)
+        return {
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows / self.elapsed, 1) if self.elapsed > 0 else 0,
+            'mb_per_second': round(self.bytes / self.elapsed / (1024 * 1024), 2) if self.elapsed > 0 else 0,
+            'stage_seconds': {name: round(seconds, 3) for name, seconds in stages.items()},
+            'stage_share': {name: round(seconds / self.elapsed, 3) if self.elapsed > 0 else 0
+                            for name, seconds in stages.items()},
+            **({'batching': self.batching} if self.batching else {}),
+        }
+
+class MetricsRegistry:
+    def __init__(self, prefix='flatfile'):
+        """
+        Process-wide counters summed over finished transfers, rendered in
+        the Prometheus text exposition format.
+        """
+        self.prefix = prefix
+        self._transfers = {}  # (kind, status) -> count
+        self._rows = {}       # kind -> rows
+        self._bytes = {}      # kind -> bytes
+        self._seconds = {}    # kind -> seconds
+        self._stages = {}     # (kind, stage) -> seconds
+        self._lock = threading.Lock()
+
+    def observe(self, metrics, status):
+        """
+        Add one finished transfer's totals.
+        """
+        kind = metrics.kind
+        with self._lock:
+            self._transfers[(kind, status)] = self._transfers.get((kind, status), 0) + 1
+            self._rows[kind] = self._rows.get(kind, 0) + metrics.rows
+            self._bytes[kind] = self._bytes.get(kind, 0) + metrics.bytes
+            self._seconds[kind] = self._seconds.get(kind, 0.0) + metrics.elapsed
+            for stage, seconds in metrics.stages.items():
+                self._stages[(kind, stage)] = self._stages.get((kind, stage), 0.0) + seconds
+
+    def render(self):
+        """
+        Return all counters as Prometheus exposition text.
+        """
+        with self._lock:
+            families = [
+                ('transfers_total', 'Finished transfers by kind and outcome.',
+                 {(('kind', kind), ('status', status)): value for (kind, status), value in self._transfers.items()}),
+                ('rows_total', 'Rows moved by finished transfers.',
+                 {(('kind', kind),): value for kind, value in self._rows.items()}),
+                ('bytes_total', 'File bytes read or written by finished transfers.',
+                 {(('kind', kind),): value for kind, value in self._bytes.items()}),
+                ('transfer_seconds_total', 'Wall time spent in finished transfers.',
+                 {(('kind', kind),): value for kind, value in self._seconds.items()}),
+                ('stage_seconds_total', 'Time spent per transfer stage.',
+                 {(('kind', kind), ('stage', stage)): value for (kind, stage), value in self._stages.items()}),
+            ]
+
+        lines = []
+        for name, help_text, samples in families:
+            metric = f'{self.prefix}_{name}'
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} counter')
+            for labels, value in sorted(samples.items()):
+                label_text = ','.join(f'{key}="{_escape_label(val)}"' for key, val in labels)
+                lines.append(f'{metric}{{{label_text}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
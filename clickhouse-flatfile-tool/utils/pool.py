@@ -0,0 +1,158 @@
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+
+from clickhouse_driver import errors
+
+from .clickhouse import ClickHouseManager
+
+# Errors after which a pooled connection is not trusted any more
+CONNECTION_ERRORS = (errors.NetworkError, errors.SocketTimeoutError, EOFError, OSError)
+
+class ClickHousePool:
+    def __init__(self, max_size=8, idle_timeout=300, health_check_interval=30, acquire_timeout=30):
+        """
+        Initialize a thread-safe pool of ClickHouseManager connections.
+
+        Connections are grouped by (host, port, database, user, token hash);
+        max_size limits how many connections each group may hold at once.
+        """
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+
+        self._lock = threading.Condition()
+        self._idle = {}     # key -> list of (manager, last_used)
+        self._in_use = {}   # key -> number of borrowed managers
+        self._keys = {}     # id(manager) -> key
+
+    @staticmethod
+    def make_key(host, port, database, user, jwt_token=None, **options):
+        """
+        Build the pool key for a set of connection parameters.
+        """
+        # Never keep raw tokens around as dictionary keys
+        token_hash = hashlib.sha256(jwt_token.encode('utf-8')).hexdigest() if jwt_token else None
+        return (host, port, database, user, token_hash) + tuple(sorted(options.items()))
+
+    @contextmanager
+    def connection(self, host, port, database, user, jwt_token=None, **options):
+        """
+        Borrow a ClickHouseManager for the duration of a with block.
+        """
+        manager = self.acquire(host, port, database, user, jwt_token, **options)
+        discard = False
+        try:
+            yield manager
+        except CONNECTION_ERRORS:
+            # Drop connections that failed mid-request instead of reusing them
+            discard = True
+            raise
+        finally:
+            self.release(manager, discard=discard)
+
+    def acquire(self, host, port, database, user, jwt_token=None, **options):
+        """
+        Take an idle connection from the pool or open a new one.
+        """
+        key = self.make_key(host, port, database, user, jwt_token, **options)
+        deadline = time.monotonic() + self.acquire_timeout
+
+        with self._lock:
+            while True:
+                self._evict_idle()
+                idle = self._idle.get(key)
+                if idle:
+                    manager, last_used = idle.pop()
+                    break
+                if self._size(key) < self.max_size:
+                    manager, last_used = None, None
+                    break
+
+                # Wait for another request to hand a connection back
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No ClickHouse connection available for {host}:{port}")
+                self._lock.wait(remaining)
+
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+
+        # Connect and health-check outside the lock
+        try:
+            if manager is not None and time.monotonic() - last_used > self.health_check_interval:
+                if not self._is_healthy(manager):
+                    self._disconnect(manager)
+                    manager = None
+
+            if manager is None:
+                manager = ClickHouseManager(host, port, database, user, jwt_token, **options)
+        except Exception:
+            with self._lock:
+                self._in_use[key] -= 1
+                self._lock.notify()
+            raise
+
+        with self._lock:
+            self._keys[id(manager)] = key
+
+        return manager
+
+    def release(self, manager, discard=False):
+        """
+        Return a borrowed connection to the pool.
+        """
+        with self._lock:
+            key = self._keys.pop(id(manager))
+            self._in_use[key] -= 1
+            if not discard:
+                self._idle.setdefault(key, []).append((manager, time.monotonic()))
+            self._lock.notify()
+
+        if discard:
+            self._disconnect(manager)
+
+    def close_all(self):
+        """
+        Disconnect every idle connection.
+        """
+        with self._lock:
+            idle = [manager for managers in self._idle.values() for manager, _ in managers]
+            self._idle.clear()
+
+        for manager in idle:
+            self._disconnect(manager)
+
+    def _size(self, key):
+        return self._in_use.get(key, 0) + len(self._idle.get(key, []))
+
+    def _evict_idle(self):
+        """
+        Disconnect connections that have been idle longer than idle_timeout.
+        """
+        now = time.monotonic()
+        for key, managers in list(self._idle.items()):
+            keep = []
+            for manager, last_used in managers:
+                if now - last_used > self.idle_timeout:
+                    self._disconnect(manager)
+                else:
+                    keep.append((manager, last_used))
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+
+    def _is_healthy(self, manager):
+        try:
+            manager.client.execute('SELECT 1')
+            return True
+        except Exception:
+            return False
+
+    def _disconnect(self, manager):
+        try:
+            manager.client.disconnect()
+        except Exception:
+            pass
@@ -0,0 +1,287 @@
+import hashlib
+import json
+import mmap
+import os
+
+import numpy as np
+
+# Sidecar file written to the index directory, or next to the indexed
+# file when none is set
+INDEX_SUFFIX = '.rowidx.json'
+INDEX_VERSION = 3
+
+# Record one row offset every CHECKPOINT_ROWS rows
+CHECKPOINT_ROWS = 1000
+
+# Bytes scanned per step while building the index
+SCAN_BLOCK_SIZE = 4 * 1024 * 1024
+
+QUOTE = ord('"')
+NEWLINE = ord('\n')
+CARRIAGE_RETURN = ord('\r')
+
+# Directory holding sidecar indexes, set by set_index_dir
+_index_dir = None
+
+def set_index_dir(path):
+    """
+    Keep sidecar indexes in path instead of next to the indexed files.
+    """
+    global _index_dir
+    os.makedirs(path, exist_ok=True)
+    _index_dir = path
+
+def iter_row_ends(buffer, start=0, end=None, delimiter=','):
+    """
+    Yield arrays of the offsets just past each row terminator in
+    buffer[start:end], one array per non-empty scanned block.
+
+    start must be a row boundary. As in pandas, a quote opens a quoted
+    field only at the start of a field, right after the delimiter or a
+    row terminator; anywhere else it is part of the value. Newlines inside
+    quoted fields do not end a row, and escaped quotes ("") cancel out.
+    """
+    end = len(buffer) if end is None else end
+    separator = delimiter.encode('utf-8')[-1]
+    in_quotes = False
+    block_start = start
+    while block_start < end:
+        block_end = min(block_start + SCAN_BLOCK_SIZE, end)
+        # Blocks never split a run of quotes
+        while block_end < end and buffer[block_end - 1] == QUOTE:
+            block_end += 1
+        block = np.frombuffer(buffer[block_start:block_end], dtype=np.uint8)
+        previous = buffer[block_start - 1] if block_start > start else NEWLINE
+
+        newlines = np.flatnonzero(block == NEWLINE)
+        quoted, in_quotes = _quoted(block, newlines, in_quotes, previous, separator)
+        ends = newlines[~quoted] + block_start + 1
+        if len(ends):
+            yield ends
+        block_start = block_end
+
+def _quoted(block, positions, in_quotes, previous, separator):
+    """
+    Mask the positions of block that fall inside a quoted field, and return
+    it with the quote state at the end of the block.
+
+    in_quotes is the state before the block and previous the byte before
+    it. A run of quotes changes the state only when its length is odd: at
+    a field start it toggles the state; elsewhere it closes a quoted field
+    or, outside one, is a literal value, so either way the state after it
+    is unquoted.
+    """
+    quotes = np.flatnonzero(block == QUOTE)
+    if len(quotes) == 0:
+        return np.full(len(positions), in_quotes), in_quotes
+
+    run_first = np.ones(len(quotes), dtype=bool)
+    run_first[1:] = np.diff(quotes) != 1
+    run_starts = quotes[run_first]
+    odd = np.diff(np.append(np.flatnonzero(run_first), len(quotes))) % 2 == 1
+
+    before = np.where(run_starts > 0, block[run_starts - 1], previous)
+    field_start = (before == separator) | (before == NEWLINE)
+    toggles = np.cumsum(odd & field_start)
+    resets = odd & ~field_start
+
+    # State after each run: toggles since the last reset, or since the block start
+    runs = np.arange(len(run_starts))
+    last_reset = np.maximum.accumulate(np.where(resets, runs, -1))
+    state = (toggles - np.where(last_reset >= 0, toggles[last_reset], 0)) & 1
+    state = np.where(last_reset >= 0, state, state ^ in_quotes).astype(bool)
+
+    # A position takes the state after the last run before it
+    run = np.searchsorted(run_starts, positions) - 1
+    quoted = np.where(run >= 0, state[run], in_quotes)
+    return quoted, bool(state[-1])
+
+def blank_rows(data, ends, start):
+    """
+    Mask the rows ending at ends, the first starting at start, that are
+    empty lines; pandas skips these rather than reading them as rows.
+    """
+    starts = np.concatenate(([start], ends[:-1]))
+    lengths = ends - starts
+    blank = lengths == 1
+    crlf = np.flatnonzero(lengths == 2)
+    blank[crlf] = data[starts[crlf]] == CARRIAGE_RETURN
+    return blank
+
+def first_row_end(filepath, delimiter=','):
+    """
+    Return the offset just past the first non-empty row (the header), or
+    the file size when no such row has been terminated yet.
+    """
+    size = os.path.getsize(filepath)
+    if size == 0:
+        return 0
+
+    with open(filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        data = np.frombuffer(mm, dtype=np.uint8)
+        try:
+            start = 0
+            for ends in iter_row_ends(mm, delimiter=delimiter):
+                rows = ends[~blank_rows(data, ends, start)]
+                if len(rows):
+                    return int(rows[0])
+                start = int(ends[-1])
+        finally:
+            # The mmap cannot close while an array still views it
+            del data
+    return size
+
+def last_row_end(filepath, start=0, delimiter=','):
+    """
+    Return the offset just past the last complete row at or after start,
+    or start when no row has been completed since.
+    """
+    size = os.path.getsize(filepath)
+    if size <= start:
+        return start
+
+    last_end = start
+    with open(filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for ends in iter_row_ends(mm, start, size, delimiter):
+            last_end = int(ends[-1])
+    return last_end
+
+class RowIndex:
+    def __init__(self, filepath, size, mtime_ns, data_start, row_count, checkpoint_rows, offsets, delimiter=','):
+        """
+        Byte offsets of every checkpoint_rows-th data row of an uncompressed flat file.
+
+        offsets[k] is where data row k * checkpoint_rows starts; data_start is
+        where the first row after the header starts. Rows are found with
+        delimiter, which decides where quoted fields may start.
+        """
+        self.filepath = filepath
+        self.delimiter = delimiter
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.data_start = data_start
+        self.row_count = row_count
+        self.checkpoint_rows = checkpoint_rows
+        self.offsets = offsets
+
+    @staticmethod
+    def sidecar_path(filepath):
+        if _index_dir is None:
+            return filepath + INDEX_SUFFIX
+        name = hashlib.sha256(os.path.abspath(filepath).encode('utf-8')).hexdigest()
+        return os.path.join(_index_dir, name + INDEX_SUFFIX)
+
+    @classmethod
+    def build(cls, filepath, checkpoint_rows=CHECKPOINT_ROWS, delimiter=','):
+        """
+        Scan the file once through mmap and record row checkpoints.
+
+        Empty lines are not counted as rows, as pandas skips them.
+        """
+        stat = os.stat(filepath)
+        offsets = []
+        terminators = 0
+        data_start = None
+        last_end = 0
+        trailing_row = False
+
+        with open(filepath, 'rb') as f:
+            if stat.st_size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    data = np.frombuffer(mm, dtype=np.uint8)
+                    try:
+                        for ends in iter_row_ends(mm, delimiter=delimiter):
+                            blank = blank_rows(data, ends, last_end)
+                            last_end = int(ends[-1])
+                            ends = ends[~blank]
+
+                            if data_start is None and len(ends):
+                                # The first row terminator closes the header
+                                data_start = int(ends[0])
+                                offsets.append(data_start)
+                                ends = ends[1:]
+
+                            # Terminator t ends data row t, so data row t + 1 starts after it
+                            offsets.extend(ends[-(terminators + 1) % checkpoint_rows::checkpoint_rows].tolist())
+                            terminators += len(ends)
+
+                        # A final unterminated line is a row unless it is empty
+                        tail = stat.st_size - last_end
+                        trailing_row = tail > 1 or (tail == 1 and data[last_end] != CARRIAGE_RETURN)
+                    finally:
+                        # The mmap cannot close while an array still views it
+                        del data
+
+        if data_start is None:
+            # Header only, or an empty file
+            data_start = stat.st_size
+            offsets = [data_start]
+            trailing_row = False
+
+        # Rows are the terminated lines plus a final unterminated one, if any
+        row_count = terminators + (1 if trailing_row else 0)
+
+        # A checkpoint right after the final terminator points at no row
+        offsets = offsets[:max((row_count + checkpoint_rows - 1) // checkpoint_rows, 1)]
+
+        return cls(filepath, stat.st_size, stat.st_mtime_ns, data_start, row_count, checkpoint_rows, offsets,
+                   delimiter)
+
+    @classmethod
+    def load(cls, filepath, delimiter=','):
+        """
+        Load the sidecar index, or return None if it is missing, stale or
+        built for another delimiter.
+        """
+        try:
+            with open(cls.sidecar_path(filepath), 'r') as f:
+                state = json.load(f)
+            stat = os.stat(filepath)
+        except (OSError, ValueError):
+            return None
+
+        if (state.get('version') != INDEX_VERSION or state['filepath'] != os.path.abspath(filepath)
+                or state['delimiter'] != delimiter
+                or state['size'] != stat.st_size or state['mtime_ns'] != stat.st_mtime_ns):
+            return None
+
+        return cls(filepath, state['size'], state['mtime_ns'], state['data_start'],
+                   state['row_count'], state['checkpoint_rows'], state['offsets'], delimiter)
+
+    @classmethod
+    def load_or_build(cls, filepath, checkpoint_rows=CHECKPOINT_ROWS, delimiter=','):
+        """
+        Return the persisted index, rebuilding and saving it when the file changed.
+        """
+        index = cls.load(filepath, delimiter)
+        if index is None:
+            index = cls.build(filepath, checkpoint_rows, delimiter)
+            index.save()
+        return index
+
+    def save(self):
+        """
+        Persist the index to its sidecar file, replacing it atomically.
+        """
+        path = self.sidecar_path(self.filepath)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'version': INDEX_VERSION,
+                'filepath': os.path.abspath(self.filepath),
+                'delimiter': self.delimiter,
+                'size': self.size,
+                'mtime_ns': self.mtime_ns,
+                'data_start': self.data_start,
+                'row_count': self.row_count,
+                'checkpoint_rows': self.checkpoint_rows,
+                'offsets': self.offsets,
+            }, f)
+        os.replace(tmp_path, path)
+
+    def locate(self, row):
+        """
+        Return (byte offset, rows to skip) for reaching data row number row.
+        """
+        checkpoint = min(row // self.checkpoint_rows, len(self.offsets) - 1)
+        return self.offsets[checkpoint], row - checkpoint * self.checkpoint_rows
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+class StateStore:
+    def __init__(self, directory, legacy_path=None):
+        """
+        Persist small JSON-serializable values (watermarks, checkpoints) by key.
+
+        Each key is its own JSON file in directory, rewritten atomically on
+        change, so a checkpoint costs one small write however many keys are
+        stored, and a crash never leaves a torn file. Keys of an older
+        single-file store at legacy_path are moved in once.
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        if legacy_path and os.path.exists(legacy_path):
+            self._migrate(legacy_path)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._load(self._path(key))
+            return entry['value'] if entry else default
+
+    def set(self, key, value):
+        with self._lock:
+            self._save(self._path(key), {'key': key, 'value': value})
+
+    def delete(self, key):
+        """
+        Drop a key; returns False when it was not stored.
+        """
+        with self._lock:
+            try:
+                os.remove(self._path(key))
+                return True
+            except FileNotFoundError:
+                return False
+
+    def items(self, prefix=''):
+        """
+        List (key, value) pairs whose key starts with prefix.
+        """
+        with self._lock:
+            entries = [self._load(os.path.join(self.directory, name))
+                       for name in os.listdir(self.directory) if name.endswith('.json')]
+            return sorted((entry['key'], entry['value']) for entry in entries
+                          if entry and entry['key'].startswith(prefix))
+
+    def _path(self, key):
+        # Keys hold hosts, paths and table names, so files are named by hash
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _load(self, path):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _save(self, path, entry):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def _migrate(self, legacy_path):
+        with open(legacy_path, 'r') as f:
+            state = json.load(f)
+        for key, value in state.items():
+            if not os.path.exists(self._path(key)):
+                self._save(self._path(key), {'key': key, 'value': value})
+        os.replace(legacy_path, legacy_path + '.migrated')
+
+class Checkpoint:
+    def __init__(self, store, key):
+        """
+        The resume point of one long-running transfer, saved in a StateStore.
+
+        Transfers call save() after every committed batch and clear() once
+        they complete; a transfer that finds a saved state picks up from it.
+        """
+        self.store = store
+        self.key = key
+
+    def load(self):
+        return self.store.get(self.key)
+
+    def save(self, state):
+        self.store.set(self.key, {**state, 'updated_at': time.time()})
+
+    def clear(self):
+        self.store.delete(self.key)
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+
+# Largest chunk accepted in one PUT; must stay below MAX_CONTENT_LENGTH
+MAX_CHUNK_SIZE = 32 * 1024 * 1024
+
+# Bytes copied from the request stream to disk per read
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# In-progress uploads untouched for this long are removed
+STALE_UPLOAD_SECONDS = 24 * 3600
+
+UPLOAD_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+class ChunkedUploadManager:
+    def __init__(self, upload_dir, max_chunk_size=MAX_CHUNK_SIZE, stale_after=STALE_UPLOAD_SECONDS):
+        """
+        Track resumable uploads that arrive as independently sent, fixed-size chunks.
+
+        Each upload owns a directory under upload_dir/.chunked holding its
+        state, a preallocated data file that chunks are written into at their
+        own offsets, and one marker file per verified chunk. Because every
+        piece of state lives on disk, uploads survive server restarts and
+        chunks may arrive in any order and in parallel.
+        """
+        self.upload_dir = upload_dir
+        self.max_chunk_size = max_chunk_size
+        self.stale_after = stale_after
+        self.chunk_root = os.path.join(upload_dir, '.chunked')
+        os.makedirs(self.chunk_root, exist_ok=True)
+
+    def init(self, filename, total_size, chunk_size):
+        """
+        Start an upload and return its state, including the upload id.
+        """
+        if total_size < 0:
+            raise ValueError("total_size must not be negative")
+        if not 0 < chunk_size <= self.max_chunk_size:
+            raise ValueError(f"chunk_size must be between 1 and {self.max_chunk_size} bytes")
+
+        self.expire_stale()
+
+        upload_id = uuid.uuid4().hex
+        upload_path = os.path.join(self.chunk_root, upload_id)
+        os.makedirs(upload_path)
+
+        state = {
+            'upload_id': upload_id,
+            'filename': filename,
+            'total_size': total_size,
+            'chunk_size': chunk_size,
+            'total_chunks': max((total_size + chunk_size - 1) // chunk_size, 1),
+            'created_at': time.time(),
+        }
+
+        # Reserve the full size up front (sparse where supported) so chunks
+        # can be written straight to their final offsets
+        with open(os.path.join(upload_path, 'data.part'), 'wb') as f:
+            f.truncate(total_size)
+        with open(os.path.join(upload_path, 'state.json'), 'w') as f:
+            json.dump(state, f)
+
+        return state
+
+    def write_chunk(self, upload_id, index, stream, checksum=None):
+        """
+        Stream one chunk from a file-like object into place and mark it received.
+
+        checksum, if given, is the expected SHA-256 hex digest of the chunk;
+        on mismatch the chunk is not marked and must be sent again.
+        """
+        state = self._load_state(upload_id)
+        if not 0 <= index < state['total_chunks']:
+            raise ValueError(f"Chunk index {index} out of range 0-{state['total_chunks'] - 1}")
+
+        offset = index * state['chunk_size']
+        expected_size = min(state['chunk_size'], state['total_size'] - offset)
+        upload_path = self._upload_path(upload_id)
+
+        # A resent chunk is unverified until it has been fully received again
+        marker = os.path.join(upload_path, f'{index:08d}.done')
+        if os.path.exists(marker):
+            os.remove(marker)
+
+        digest = hashlib.sha256()
+        received = 0
+        with open(os.path.join(upload_path, 'data.part'), 'r+b') as f:
+            f.seek(offset)
+            while True:
+                # Read at most one byte past the chunk so oversized bodies are caught
+                block = stream.read(min(COPY_BUFFER_SIZE, expected_size - received + 1))
+                if not block:
+                    break
+                received += len(block)
+                if received > expected_size:
+                    raise ValueError(f"Chunk {index} is larger than {expected_size} bytes")
+                digest.update(block)
+                f.write(block)
+
+        if received != expected_size:
+            raise ValueError(f"Chunk {index} is incomplete: got {received} of {expected_size} bytes")
+
+        sha256 = digest.hexdigest()
+        if checksum and checksum.lower() != sha256:
+            raise ValueError(f"Checksum mismatch for chunk {index}")
+
+        with open(marker + '.tmp', 'w') as f:
+            json.dump({'size': received, 'sha256': sha256}, f)
+        os.replace(marker + '.tmp', marker)
+
+        return {'index': index, 'size': received, 'sha256': sha256}
+
+    def status(self, upload_id):
+        """
+        Report which chunks have been received and which are still missing.
+        """
+        state = self._load_state(upload_id)
+        received = self._received_chunks(upload_id)
+        missing = [i for i in range(state['total_chunks']) if i not in received]
+
+        return {
+            **state,
+            'received_chunks': len(received),
+            'missing_chunks': missing,
+            'complete': not missing,
+        }
+
+    def finalize(self, upload_id, target_path):
+        """
+        Move a fully received upload to target_path and forget its chunk state.
+        """
+        status = self.status(upload_id)
+        if not status['complete']:
+            missing = status['missing_chunks']
+            raise ValueError(f"Upload is missing {len(missing)} chunk(s), first missing: {missing[0]}")
+
+        upload_path = self._upload_path(upload_id)
+        os.replace(os.path.join(upload_path, 'data.part'), target_path)
+        shutil.rmtree(upload_path, ignore_errors=True)
+
+        return status
+
+    def abort(self, upload_id):
+        """
+        Discard an upload and everything received for it.
+        """
+        self._load_state(upload_id)
+        shutil.rmtree(self._upload_path(upload_id), ignore_errors=True)
+
+    def expire_stale(self):
+        """
+        Remove uploads whose files have not been touched for stale_after seconds.
+        """
+        cutoff = time.time() - self.stale_after
+        for name in os.listdir(self.chunk_root):
+            path = os.path.join(self.chunk_root, name)
+            try:
+                last_touched = max(os.path.getmtime(os.path.join(path, child))
+                                   for child in os.listdir(path))
+            except (OSError, ValueError):
+                continue
+            if last_touched < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _upload_path(self, upload_id):
+        # Upload ids come from URLs; only accept ids we could have issued
+        if not UPLOAD_ID_PATTERN.fullmatch(upload_id or ''):
+            raise ValueError(f"Invalid upload id: {upload_id}")
+        return os.path.join(self.chunk_root, upload_id)
+
+    def _load_state(self, upload_id):
+        try:
+            with open(os.path.join(self._upload_path(upload_id), 'state.json'), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Unknown upload id: {upload_id}")
+
+    def _received_chunks(self, upload_id):
+        return {int(name.split('.')[0]) for name in os.listdir(self._upload_path(upload_id))
+                if name.endswith('.done')}